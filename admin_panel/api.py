@@ -0,0 +1,384 @@
+import json
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from .availability import get_matrix, in_horizon
+from .availability_calendar import CALENDAR_DAYS, calendar_grid
+from . import chess_cache, chess_export, chess_tiles, live_updates
+from .forms import BookingMoveForm, GroupBookingForm, SearchForm
+from .models import Booking, Room
+from .reservations import ReservationConflict, VersionConflict, move_booking, reserve_group
+from .pricing import CENTS, RateTable
+from .room_search import attach_prices, paginate_rooms, serialize_room
+
+MAX_AVAILABILITY_QUERIES = 200
+
+
+def _parse_availability_query(raw):
+    """Проверяет один запрос вида {check_in, check_out, room_type, capacity}"""
+    try:
+        check_in = date.fromisoformat(raw['check_in'])
+        check_out = date.fromisoformat(raw['check_out'])
+        room_type = int(raw['room_type']) if raw.get('room_type') else None
+        capacity = int(raw['capacity']) if raw.get('capacity') else None
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Некорректные параметры запроса')
+    if check_in >= check_out:
+        raise ValueError('Дата выезда должна быть позже даты заезда')
+    return check_in, check_out, room_type, capacity
+
+
+def _free_rooms_lookup(span_start, span_end, room_ids):
+    """
+    Функция «какие из room_ids свободны на [check_in, check_out)» для всего окна запросов.
+    Внутри горизонта отвечает матрица занятости, иначе — один запрос к бронированиям
+    """
+    if in_horizon(span_start, span_end):
+        matrix = get_matrix()
+
+        def free_ids(check_in, check_out):
+            return set(matrix.free_room_ids(check_in, check_out, only_available=False))
+        return free_ids
+
+    busy = defaultdict(list)
+    bookings = Booking.objects.filter(
+        status__in=Booking.ACTIVE_STATUSES
+    ).overlapping(span_start, span_end).values_list('room_id', 'check_in_date', 'check_out_date')
+    for room_id, check_in, check_out in bookings:
+        busy[room_id].append((check_in, check_out))
+
+    def free_ids(check_in, check_out):
+        return {
+            room_id for room_id in room_ids
+            if not any(b_in < check_out and b_out > check_in for b_in, b_out in busy.get(room_id, ()))
+        }
+    return free_ids
+
+
+@require_POST
+def availability_batch(request):
+    """
+    Свободные номера и стоимость проживания сразу для многих периодов.
+    Тело запроса: {"queries": [{"check_in", "check_out", "room_type", "capacity"}, ...]}.
+    Число SQL-запросов не зависит от количества периодов
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        raw_queries = payload['queries']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Ожидается JSON с полем queries'}, status=400)
+    if not isinstance(raw_queries, list) or not raw_queries:
+        return JsonResponse({'error': 'Список queries пуст'}, status=400)
+    if len(raw_queries) > MAX_AVAILABILITY_QUERIES:
+        return JsonResponse({'error': f'Не более {MAX_AVAILABILITY_QUERIES} периодов за запрос'}, status=400)
+
+    parsed = []
+    for raw in raw_queries:
+        try:
+            parsed.append(_parse_availability_query(raw if isinstance(raw, dict) else {}))
+        except ValueError as e:
+            parsed.append(e)
+
+    valid = [q for q in parsed if not isinstance(q, ValueError)]
+    rooms = []
+    free_ids = None
+    if valid:
+        rooms = list(Room.objects.filter(status='available').select_related('room_type').order_by('room_number'))
+        span_start = min(q[0] for q in valid)
+        span_end = max(q[1] for q in valid)
+        free_ids = _free_rooms_lookup(span_start, span_end, [r.id for r in rooms])
+        # Цены всех периодов считаются по одной загрузке календаря цен
+        rates = RateTable({r.room_type_id for r in rooms}, span_start, span_end) if rooms else None
+
+    results = []
+    for raw, query in zip(raw_queries, parsed):
+        if isinstance(query, ValueError):
+            results.append({'query': raw, 'error': str(query)})
+            continue
+        check_in, check_out, room_type, capacity = query
+        nights = (check_out - check_in).days
+        free = free_ids(check_in, check_out)
+        totals = {}
+        offers = []
+        for room in rooms:
+            if room.id not in free:
+                continue
+            if room_type and room.room_type_id != room_type:
+                continue
+            if capacity and room.room_type.capacity < capacity:
+                continue
+            if room.room_type_id not in totals:
+                totals[room.room_type_id] = rates.price(room.room_type_id, check_in, check_out)
+            total_price = totals[room.room_type_id]
+            offers.append({
+                'id': room.id,
+                'room_number': room.room_number,
+                'room_type': room.room_type.name,
+                'capacity': room.room_type.capacity,
+                'price_per_night': str((total_price / nights).quantize(CENTS)),
+                'total_price': str(total_price),
+            })
+        results.append({
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'room_type': room_type,
+            'capacity': capacity,
+            'nights': nights,
+            'available_count': len(offers),
+            'rooms': offers,
+        })
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def availability_calendar_export(request):
+    """Календарь свободных номеров по типам в JSON (для продаж и каналов бронирования)"""
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else timezone.localdate()
+        days = min(int(request.GET.get('days', CALENDAR_DAYS)), CALENDAR_DAYS)
+    except ValueError:
+        return JsonResponse({'error': 'Некорректные параметры start/days'}, status=400)
+
+    dates, types = calendar_grid(start, max(days, 1))
+    return JsonResponse({
+        'dates': [d.isoformat() for d in dates],
+        'room_types': types,
+    })
+
+
+@require_POST
+def group_booking_create(request):
+    """
+    Групповое бронирование через JSON:
+    {"customer_id", "check_in", "check_out", "room_ids": [...]} или {..., "room_type", "count"}
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Ожидается JSON-объект'}, status=400)
+
+    form = GroupBookingForm({
+        'customer': payload.get('customer_id'),
+        'check_in': payload.get('check_in'),
+        'check_out': payload.get('check_out'),
+        'room_type': payload.get('room_type'),
+        'rooms_count': payload.get('count'),
+        'rooms': payload.get('room_ids') or [],
+        'status': payload.get('status', 'awaiting_payment'),
+        'special_requests': payload.get('special_requests', ''),
+    })
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    data = form.cleaned_data
+    try:
+        bookings = reserve_group(
+            customer=data['customer'],
+            check_in=data['check_in'],
+            check_out=data['check_out'],
+            rooms=list(data['rooms']) or None,
+            room_type=data['room_type'],
+            count=data['rooms_count'],
+            status=data['status'],
+            special_requests=data['special_requests'],
+        )
+    except ReservationConflict as e:
+        return JsonResponse({'error': str(e)}, status=409)
+
+    return JsonResponse({
+        'bookings': [
+            {'id': b.pk, 'room_number': b.room.room_number, 'total_price': str(b.total_price)}
+            for b in bookings
+        ],
+        'total_price': str(sum(b.total_price for b in bookings)),
+    }, status=201)
+
+
+@require_GET
+def room_search_results(request):
+    """
+    Ранжированный поиск свободных номеров:
+    ?check_in=&check_out=&room_type=&capacity=&floor=&features=&page=
+    """
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    nights = form.nights()
+    page = paginate_rooms(form.search().select_related('room_type'), request.GET.get('page'))
+    attach_prices(page, form.cleaned_data['check_in'], form.cleaned_data['check_out'])
+    return JsonResponse({
+        'check_in': form.cleaned_data['check_in'].isoformat(),
+        'check_out': form.cleaned_data['check_out'].isoformat(),
+        'nights': nights,
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'rooms': [serialize_room(room) for room in page],
+    })
+
+
+def _chess_filters(request):
+    return {
+        'room_type_id': request.GET.get('room_type', ''),
+        'floor': request.GET.get('floor', ''),
+        'status': request.GET.get('status', ''),
+    }
+
+
+def _chess_tile_params(request):
+    """Параметры плитки шахматки; ValueError при некорректных значениях"""
+    try:
+        params = {
+            'filters': _chess_filters(request),
+            'offset': int(request.GET.get('offset', 0)),
+            'limit': int(request.GET.get('limit', chess_tiles.TILE_ROOMS)),
+            'start': date.fromisoformat(request.GET['start']),
+            'days': int(request.GET.get('days', chess_tiles.TILE_DAYS)),
+        }
+    except (KeyError, ValueError):
+        raise ValueError('Ожидаются параметры start=ГГГГ-ММ-ДД, days, offset, limit')
+    if params['offset'] < 0 or not 0 < params['limit'] <= chess_tiles.MAX_TILE_ROOMS:
+        raise ValueError(f'limit от 1 до {chess_tiles.MAX_TILE_ROOMS}')
+    if not 0 < params['days'] <= chess_tiles.MAX_TILE_DAYS:
+        raise ValueError(f'days от 1 до {chess_tiles.MAX_TILE_DAYS}')
+    return params
+
+
+def _chess_etag(kind, params_func):
+    def etag(request, *args, **kwargs):
+        try:
+            params = params_func(request)
+        except ValueError:
+            return None
+        return chess_tiles.cache_key(kind, params)
+    return etag
+
+
+def _cached_chess_response(kind, params, build):
+    key = chess_tiles.cache_key(kind, params)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, chess_tiles.TILE_CACHE_TIMEOUT)
+    response = JsonResponse(payload)
+    # Браузер хранит плитку, но перед использованием сверяет ETag — ответ 304 без тела
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+@condition(etag_func=_chess_etag('rooms', _chess_filters))
+def chess_rooms(request):
+    """Строки шахматки (номера по фильтрам) для виртуализированной сетки"""
+    filters = _chess_filters(request)
+    return _cached_chess_response('rooms', filters, lambda: chess_tiles.rooms_index(filters))
+
+
+@require_GET
+@condition(etag_func=_chess_etag('tile', _chess_tile_params))
+def chess_tile(request):
+    """Плитка шахматки: сегменты бронирований окна «строки × дни» в компактном JSON"""
+    try:
+        params = _chess_tile_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _cached_chess_response('tile', params, lambda: chess_tiles.tile(**params))
+
+
+@require_GET
+def chess_export_status(request, job_id):
+    """Статус фоновой задачи экспорта шахматки: running, done (с ссылкой на файл) или failed"""
+    job = chess_export.get_job(job_id)
+    if job is None:
+        return JsonResponse({'status': 'missing', 'error': 'Задача экспорта не найдена'}, status=404)
+    data = {'status': job['status'], 'filename': job.get('filename')}
+    if job['status'] == 'done':
+        data['download_url'] = reverse('chess_export_download', args=[job_id])
+    elif job['status'] == 'failed':
+        data['error'] = job.get('error', '')
+    return JsonResponse(data)
+
+
+@require_GET
+def chess_cache_stats(request):
+    """Счетчики попаданий и промахов кэша фрагментов шахматки — для мониторинга"""
+    return JsonResponse(chess_cache.stats())
+
+
+@require_GET
+def chess_version(request):
+    """Версия данных шахматки — для опроса, когда живые обновления выключены"""
+    response = JsonResponse({'version': chess_tiles.current_version()})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+async def chess_events(request):
+    """
+    Server-Sent Events с диффами бронирований для открытых шахматок.
+    Соединение держится долго, поэтому представление асинхронное и требует запуска через ASGI;
+    без settings.CHESS_LIVE_UPDATES поток не открывается, чтобы не занимать воркер WSGI
+    """
+    if not settings.CHESS_LIVE_UPDATES:
+        return JsonResponse({'error': 'Живые обновления выключены'}, status=404)
+    response = StreamingHttpResponse(
+        live_updates.stream(live_updates.broker.subscribe()),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Отключает буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_POST
+def booking_move(request, pk):
+    """
+    Перенос или изменение длины бронирования перетаскиванием на шахматке:
+    {"room_id", "check_in", "check_out", "version"}. 409 — номер занят или бронирование
+    уже изменено кем-то другим (version не совпала)
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Ожидается JSON-объект'}, status=400)
+
+    form = BookingMoveForm({
+        'room': payload.get('room_id'),
+        'check_in': payload.get('check_in'),
+        'check_out': payload.get('check_out'),
+        'version': payload.get('version'),
+    })
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    booking = Booking.objects.select_related('customer', 'room').filter(pk=pk).first()
+    if booking is None:
+        return JsonResponse({'error': 'Бронирование не найдено'}, status=404)
+
+    data = form.cleaned_data
+    try:
+        booking = move_booking(booking, data['room'], data['check_in'], data['check_out'], data['version'])
+    except VersionConflict as e:
+        return JsonResponse({'error': str(e), 'code': 'version'}, status=409)
+    except ReservationConflict as e:
+        return JsonResponse({'error': str(e), 'code': 'overlap'}, status=409)
+
+    return JsonResponse({
+        'booking': live_updates.booking_payload(booking),
+        'total_price': str(booking.total_price),
+    })
@@ -0,0 +1,247 @@
+import threading
+from datetime import timedelta
+from functools import partial
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .inventory import occupied_rooms_filter
+from .models import Booking, Room
+
+# Горизонт матрицы относительно сегодняшнего дня
+HORIZON_PAST_DAYS = 30
+HORIZON_FUTURE_DAYS = 540
+
+# Счетчик версий в общем кэше (settings.CACHES, см. checks.shared_cache_check):
+# по нему другие процессы узнают, что их матрица устарела
+VERSION_CACHE_KEY = 'availability_matrix_version'
+
+
+class AvailabilityMatrix:
+    """
+    Матрица занятости «номер × день» в памяти процесса.
+    В ячейке хранится число активных бронирований, номер занят в день, если ячейка > 0
+    """
+
+    def __init__(self, origin, days):
+        self.origin = origin
+        self.days = days
+
+        rooms = list(Room.objects.order_by('id').values_list(
+            'id', 'room_type_id', 'room_type__capacity', 'status'
+        ))
+        self.room_ids = np.array([r[0] for r in rooms], dtype=np.int64)
+        self.room_types = np.array([r[1] for r in rooms], dtype=np.int64)
+        self.capacities = np.array([r[2] for r in rooms], dtype=np.int64)
+        statuses = np.array([r[3] for r in rooms], dtype=object)
+        self.available = statuses == 'available'
+        self.in_service = statuses != 'maintenance'
+        self.room_index = {room_id: row for row, room_id in enumerate(self.room_ids.tolist())}
+
+        self.counts = np.zeros((len(rooms), days), dtype=np.uint8)
+        # booking_id -> (строка, начало, конец) для точечного снятия бронирования
+        self.spans = {}
+
+        bookings = Booking.objects.filter(
+            status__in=Booking.ACTIVE_STATUSES,
+            check_in_date__lt=origin + timedelta(days=days),
+            check_out_date__gt=origin,
+        ).values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+        for booking_id, room_id, check_in, check_out in bookings.iterator():
+            self._add(booking_id, room_id, check_in, check_out)
+
+    @property
+    def end(self):
+        return self.origin + timedelta(days=self.days)
+
+    def covers(self, check_in, check_out):
+        return self.origin <= check_in and check_out <= self.end
+
+    def _clip(self, check_in, check_out):
+        start = max((check_in - self.origin).days, 0)
+        end = min((check_out - self.origin).days, self.days)
+        return start, max(start, end)
+
+    def _add(self, booking_id, room_id, check_in, check_out):
+        row = self.room_index.get(room_id)
+        if row is None:
+            return
+        start, end = self._clip(check_in, check_out)
+        if start == end:
+            return
+        self.counts[row, start:end] += 1
+        self.spans[booking_id] = (row, start, end)
+
+    def remove_booking(self, booking_id):
+        span = self.spans.pop(booking_id, None)
+        if span:
+            row, start, end = span
+            self.counts[row, start:end] -= 1
+
+    def apply_booking(self, booking_id, room_id, check_in, check_out, status):
+        """Точечно обновляет матрицу по сохраненному бронированию"""
+        self.remove_booking(booking_id)
+        if status in Booking.ACTIVE_STATUSES and check_in and check_out:
+            self._add(booking_id, room_id, check_in, check_out)
+
+    def apply_room_status(self, room_id, status):
+        """Обновляет статус номера; False, если номера нет в матрице"""
+        row = self.room_index.get(room_id)
+        if row is None:
+            return False
+        self.available[row] = status == 'available'
+        self.in_service[row] = status != 'maintenance'
+        return True
+
+    def _free(self, start, end):
+        return self.counts[:, start:end] == 0
+
+    def free_room_ids(self, check_in, check_out, room_type_id=None, capacity=None, only_available=True):
+        """id номеров, свободных все ночи [check_in, check_out)"""
+        start, end = self._clip(check_in, check_out)
+        mask = self._free(start, end).all(axis=1)
+        if only_available:
+            mask &= self.available
+        else:
+            mask &= self.in_service
+        if room_type_id:
+            mask &= self.room_types == int(room_type_id)
+        if capacity:
+            mask &= self.capacities >= int(capacity)
+        return self.room_ids[mask].tolist()
+
+    def free_count_by_type(self, start_date, end_date):
+        """{room_type_id: [свободно номеров в каждый день]} для дней start_date..end_date"""
+        start, end = self._clip(start_date, end_date + timedelta(days=1))
+        free = self._free(start, end) & self.in_service[:, None]
+        return {
+            int(type_id): free[self.room_types == type_id].sum(axis=0).tolist()
+            for type_id in np.unique(self.room_types)
+        }
+
+    def longest_free_run(self, start_date, end_date):
+        """{room_id: самый длинный непрерывный свободный отрезок в днях} для дней start_date..end_date"""
+        start, end = self._clip(start_date, end_date + timedelta(days=1))
+        width = end - start
+        if width == 0 or not len(self.room_ids):
+            return {int(room_id): 0 for room_id in self.room_ids}
+        occupied = ~self._free(start, end)
+        idx = np.arange(width)
+        # Индекс последнего занятого дня слева (включительно), -1 если такого нет
+        last_occupied = np.maximum.accumulate(np.where(occupied, idx, -1), axis=1)
+        longest = (idx - last_occupied).max(axis=1)
+        return dict(zip(self.room_ids.tolist(), longest.tolist()))
+
+
+_lock = threading.Lock()
+_matrix = None
+_matrix_version = None
+
+
+def _horizon_origin():
+    return timezone.localdate() - timedelta(days=HORIZON_PAST_DAYS)
+
+
+def in_horizon(check_in, check_out):
+    origin = _horizon_origin()
+    return origin <= check_in and check_out <= origin + timedelta(days=HORIZON_PAST_DAYS + HORIZON_FUTURE_DAYS)
+
+
+def get_matrix():
+    """Матрица текущего процесса; строится лениво и пересобирается при смене дня или версии"""
+    global _matrix, _matrix_version
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    origin = _horizon_origin()
+    with _lock:
+        if _matrix is None or _matrix_version != version or _matrix.origin != origin:
+            _matrix = AvailabilityMatrix(origin, HORIZON_PAST_DAYS + HORIZON_FUTURE_DAYS)
+            _matrix_version = version
+        return _matrix
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        return 1
+
+
+def _patch(apply):
+    """
+    Новая версия в общем кэше и правка матрицы процесса функцией apply(matrix).
+    apply возвращает False, если точечная правка невозможна, — тогда матрица сбрасывается
+    """
+    global _matrix, _matrix_version
+    version = _bump_version()
+    with _lock:
+        if _matrix is None:
+            return
+        if apply(_matrix) is False:
+            _matrix = None
+            return
+        # Если до изменения матрица была актуальной, она актуальна и после него
+        if _matrix_version == version - 1:
+            _matrix_version = version
+
+
+def _apply_booking_change(booking_id, room_id, check_in, check_out, status, deleted, matrix):
+    if deleted:
+        matrix.remove_booking(booking_id)
+    else:
+        matrix.apply_booking(booking_id, room_id, check_in, check_out, status)
+
+
+def patch_booking(booking, deleted=False):
+    """
+    Применяет изменение бронирования к матрице процесса и сообщает остальным процессам.
+    Только после фиксации транзакции: иначе другой процесс пересобрал бы матрицу без этого
+    изменения под новой версией, а откат оставил бы здесь несуществующее бронирование
+    """
+    # Значения фиксируются сейчас: после удаления у объекта уже не будет pk
+    change = partial(
+        _apply_booking_change, booking.pk, booking.room_id, booking.check_in_date, booking.check_out_date,
+        booking.status, deleted,
+    )
+    transaction.on_commit(partial(_patch, change))
+
+
+def patch_room(room):
+    """Изменился статус номера (свободен, занят, обслуживание) — правка строки матрицы после фиксации"""
+    room_id, status = room.pk, room.status
+    transaction.on_commit(partial(_patch, lambda matrix: matrix.apply_room_status(room_id, status)))
+
+
+def _reset():
+    global _matrix
+    _bump_version()
+    with _lock:
+        _matrix = None
+
+
+def invalidate():
+    """Сбрасывает матрицу после фиксации транзакции: изменился состав или тип номеров"""
+    transaction.on_commit(_reset)
+
+
+def find_available_rooms(check_in, check_out, room_type=None, capacity=None):
+    """Свободные номера на [check_in, check_out) с фильтром по типу и вместимости"""
+    if in_horizon(check_in, check_out):
+        room_ids = get_matrix().free_room_ids(
+            check_in, check_out,
+            room_type_id=getattr(room_type, 'pk', room_type),
+            capacity=capacity,
+        )
+        return Room.objects.filter(id__in=room_ids).select_related('room_type')
+
+    # За горизонтом матрицы — индексный запрос к журналу ночей
+    rooms = Room.objects.filter(status='available').exclude(
+        occupied_rooms_filter(check_in, check_out)
+    ).select_related('room_type')
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    if capacity:
+        rooms = rooms.filter(room_type__capacity__gte=capacity)
+    return rooms
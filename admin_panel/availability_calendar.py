@@ -0,0 +1,101 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .inventory import iter_nights
+from .models import Room, RoomNight, RoomType, RoomTypeAvailability
+
+CALENDAR_DAYS = 365
+
+
+def calendar_window():
+    """Окно календаря [сегодня, сегодня + CALENDAR_DAYS)"""
+    today = timezone.localdate()
+    return today, today + timedelta(days=CALENDAR_DAYS)
+
+
+def refresh_calendar(room_type_ids=None, start=None, end=None):
+    """
+    Пересчитывает календарь для типов room_type_ids (все типы, если None)
+    в днях [start, end), обрезанных окном календаря. Возвращает число записанных строк
+    """
+    first, last = calendar_window()
+    start = max(start or first, first)
+    end = min(end or last, last)
+    if start >= end:
+        return 0
+
+    types = RoomType.objects.all()
+    if room_type_ids is not None:
+        types = types.filter(id__in=[t for t in room_type_ids if t])
+    type_ids = list(types.values_list('id', flat=True))
+    if not type_ids:
+        return 0
+
+    # В продаже все номера, кроме находящихся на обслуживании
+    in_service = Room.objects.filter(room_type_id__in=type_ids).exclude(status='maintenance')
+    totals = dict(in_service.values('room_type_id').annotate(n=Count('id')).values_list('room_type_id', 'n'))
+
+    booked = defaultdict(int)
+    nights = RoomNight.objects.filter(
+        room__in=in_service,
+        date__gte=start,
+        date__lt=end,
+    ).values('room__room_type_id', 'date').annotate(n=Count('id')).values_list('room__room_type_id', 'date', 'n')
+    for type_id, night, count in nights:
+        booked[(type_id, night)] = count
+
+    rows = []
+    for type_id in type_ids:
+        total = totals.get(type_id, 0)
+        for day in iter_nights(start, end):
+            taken = booked[(type_id, day)]
+            rows.append(RoomTypeAvailability(
+                room_type_id=type_id,
+                date=day,
+                total_rooms=total,
+                booked_rooms=taken,
+                free_rooms=max(total - taken, 0),
+            ))
+    RoomTypeAvailability.objects.bulk_create(
+        rows,
+        batch_size=2000,
+        update_conflicts=True,
+        unique_fields=['date', 'room_type'],
+        update_fields=['total_rooms', 'booked_rooms', 'free_rooms'],
+    )
+    return len(rows)
+
+
+def rebuild_calendar():
+    """Сдвигает окно календаря на сегодня и пересчитывает его целиком"""
+    first, last = calendar_window()
+    with transaction.atomic():
+        RoomTypeAvailability.objects.exclude(date__gte=first, date__lt=last).delete()
+        return refresh_calendar()
+
+
+def calendar_grid(start, days):
+    """
+    Сетка «тип номера × день» одним запросом.
+    Возвращает (dates, types), где types — [{id, name, total, free: [по дням]}]
+    """
+    dates = [start + timedelta(days=i) for i in range(days)]
+    offsets = {d: i for i, d in enumerate(dates)}
+    rows = RoomTypeAvailability.objects.filter(
+        date__gte=start,
+        date__lt=start + timedelta(days=days),
+    ).order_by('room_type__name', 'room_type_id').values_list(
+        'room_type_id', 'room_type__name', 'date', 'total_rooms', 'free_rooms'
+    )
+
+    types = {}
+    for type_id, name, day, total, free in rows:
+        item = types.get(type_id)
+        if item is None:
+            item = types[type_id] = {'id': type_id, 'name': name, 'total': total, 'free': [None] * days}
+        item['free'][offsets[day]] = free
+    return dates, list(types.values())
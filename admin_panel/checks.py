@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые видит только текущий процесс
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Версии матрицы занятости, шахматки и календаря цен, счетчики стойки регистрации
+    хранятся в кэше по умолчанию. В кэше одного процесса их не увидят другие воркеры,
+    и те будут отдавать устаревшие данные
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+    if backend in PROCESS_LOCAL_BACKENDS:
+        return [Error(
+            f'Кэш по умолчанию ({backend}) не общий для процессов',
+            hint='Настройте в CACHES общий кэш, например django.core.cache.backends.redis.RedisCache',
+            id='admin_panel.E001',
+        )]
+    return []
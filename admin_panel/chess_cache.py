@@ -0,0 +1,102 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Общая версия: номера, типы номеров и клиенты видны в любом окне шахматки
+GLOBAL_VERSION_KEY = 'chess_fragment_version'
+# Версии недель: изменение бронирования сбрасывает только недели, которые оно задевает
+WEEK_VERSION_PREFIX = 'chess_week_version'
+# Бронирование длиннее этого числа недель проще сбросить общей версией
+MAX_SCOPED_WEEKS = 26
+
+HITS_KEY = 'chess_fragment_hits'
+MISSES_KEY = 'chess_fragment_misses'
+FRAGMENT_TIMEOUT = 60 * 60
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def _week_keys(first_day, last_day):
+    """Ключи версий недель (с понедельника), задетых днями first_day..last_day включительно"""
+    monday = first_day - timedelta(days=first_day.weekday())
+    keys = []
+    while monday <= last_day:
+        keys.append(f'{WEEK_VERSION_PREFIX}:{monday.isoformat()}')
+        monday += timedelta(days=7)
+    return keys
+
+
+def _incr_all(keys):
+    for key in keys:
+        _incr(key)
+
+
+# Версии меняются после фиксации транзакции: иначе другой процесс успел бы собрать
+# фрагмент по незафиксированному (старому) состоянию и закэшировать его под новой версией
+
+def bump_global():
+    transaction.on_commit(partial(_incr, GLOBAL_VERSION_KEY))
+
+
+def bump_range(check_in, check_out):
+    """Сбрасывает окна, в которые попадают ночи [check_in, check_out)"""
+    if not check_in or not check_out or check_in >= check_out:
+        return
+    keys = _week_keys(check_in, check_out - timedelta(days=1))
+    if len(keys) > MAX_SCOPED_WEEKS:
+        bump_global()
+        return
+    transaction.on_commit(partial(_incr_all, keys))
+
+
+def bump_bookings(bookings):
+    for booking in bookings:
+        bump_range(booking.check_in_date, booking.check_out_date)
+
+
+def window_key(start_date, end_date, filters):
+    """Ключ фрагмента: окно дат, фильтры и версии данных всех недель окна"""
+    version_keys = [GLOBAL_VERSION_KEY] + _week_keys(start_date, end_date)
+    versions = cache.get_many(version_keys)
+    raw = json.dumps({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'filters': filters,
+        'versions': [versions.get(key, 0) for key in version_keys],
+    }, sort_keys=True)
+    return f'chess_fragment:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_or_build(start_date, end_date, filters, build):
+    """Готовый фрагмент окна из кэша или build(), результат кладется в кэш"""
+    key = window_key(start_date, end_date, filters)
+    fragment = cache.get(key)
+    if fragment is not None:
+        _incr(HITS_KEY)
+        return fragment
+    _incr(MISSES_KEY)
+    fragment = build()
+    cache.set(key, fragment, FRAGMENT_TIMEOUT)
+    return fragment
+
+
+def stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,303 @@
+import os
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+
+from .chess_tiles import filtered_rooms
+from .models import Booking
+from .pdf_fonts import register_cyrillic_fonts
+
+EXPORT_FORMATS = ('pdf', 'xlsx')
+# Экспорты крупнее этого числа ячеек «номер × день» собираются в фоновом потоке
+EXPORT_SYNC_CELLS = 30000
+# Номера читаются пачками: в памяти одновременно только бронирования одной пачки
+ROOMS_CHUNK = 100
+
+# Файл собирается во временном каталоге процесса, а готовый файл фоновой задачи переносится
+# в хранилище по умолчанию (MEDIA_ROOT — общий для всех серверов каталог): статус задачи лежит
+# в общем кэше, поэтому опрос и скачивание может обслужить любой процесс
+EXPORT_DIR = Path(tempfile.gettempdir()) / 'chess_exports'
+STORAGE_DIR = 'chess_exports'
+JOB_TIMEOUT = 60 * 60
+
+STATUS_COLORS = {
+    'confirmed': '#2ECC71',
+    'checked_in': '#3498DB',
+    'checked_out': '#95A5A6',
+    'awaiting_payment': '#F39C12',
+}
+DAYS_RU_SHORT = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+
+def export_filename(fmt, start, days):
+    end = start + timedelta(days=days - 1)
+    return f'chess_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}'
+
+
+def _chunk_rows(rooms, start, days):
+    by_room = defaultdict(list)
+    bookings = Booking.objects.filter(
+        room_id__in=[room.id for room in rooms],
+    ).exclude(status='cancelled').overlapping(start, start + timedelta(days=days)).values_list(
+        'room_id', 'check_in_date', 'check_out_date', 'status', 'customer__last_name'
+    )
+    for room_id, check_in, check_out, status, last_name in bookings:
+        by_room[room_id].append((check_in, check_out, status, last_name))
+
+    for room in rooms:
+        cells = [None] * days
+        for check_in, check_out, status, last_name in by_room.get(room.id, ()):
+            first = max((check_in - start).days, 0)
+            last = min((check_out - start).days, days)
+            for i in range(first, last):
+                # (подпись, статус, первый видимый день брони)
+                cells[i] = (last_name, status, i == first)
+        yield room, cells
+
+
+def iter_room_rows(filters, start, days):
+    """(номер, [ячейка на каждый день или None]) по строкам шахматки, бронирования — пачками номеров"""
+    chunk = []
+    for room in filtered_rooms(**filters).select_related('room_type').iterator(chunk_size=ROOMS_CHUNK):
+        chunk.append(room)
+        if len(chunk) == ROOMS_CHUNK:
+            yield from _chunk_rows(chunk, start, days)
+            chunk = []
+    if chunk:
+        yield from _chunk_rows(chunk, start, days)
+
+
+def write_xlsx(path, filters, start, days):
+    """XLSX построчно в режиме write-only: строки сразу уходят во временный файл"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Шахматка')
+    sheet.column_dimensions['A'].width = 10
+    sheet.column_dimensions['B'].width = 18
+    sheet.column_dimensions['C'].width = 6
+    sheet.freeze_panes = 'D2'
+
+    bold = Font(bold=True)
+    center = Alignment(horizontal='center')
+    fills = {status: PatternFill('solid', fgColor=color.lstrip('#')) for status, color in STATUS_COLORS.items()}
+
+    header = []
+    for value in ['Номер', 'Тип', 'Этаж'] + [
+        f'{start + timedelta(days=i):%d.%m} {DAYS_RU_SHORT[(start + timedelta(days=i)).weekday()]}'
+        for i in range(days)
+    ]:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = bold
+        cell.alignment = center
+        header.append(cell)
+    sheet.append(header)
+
+    for room, cells in iter_room_rows(filters, start, days):
+        row = [room.room_number, room.room_type.name, room.floor]
+        for item in cells:
+            if item is None:
+                row.append(None)
+                continue
+            last_name, status, is_first = item
+            cell = WriteOnlyCell(sheet, value=last_name if is_first else '')
+            cell.fill = fills.get(status, fills['confirmed'])
+            row.append(cell)
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_pdf(path, filters, start, days):
+    """
+    PDF в альбомной A4: сетка режется на страницы по номерам и дням (плитками),
+    строки читаются пачками — в памяти только текущая страница номеров
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+
+    regular, bold = register_cyrillic_fonts()
+    width, height = landscape(A4)
+    margin, label_w, header_h, row_h, day_w = 1 * cm, 3.2 * cm, 1 * cm, 0.55 * cm, 0.6 * cm
+    days_per_page = int((width - 2 * margin - label_w) // day_w)
+    rows_per_page = int((height - 2 * margin - header_h - 0.8 * cm) // row_h)
+    period = f'{start:%d.%m.%Y} — {start + timedelta(days=days - 1):%d.%m.%Y}'
+
+    pdf = canvas.Canvas(str(path), pagesize=landscape(A4))
+    pdf.setTitle(f'Шахматка {period}')
+    page = 0
+
+    def draw_page(rows, day_from):
+        nonlocal page
+        page += 1
+        day_to = min(day_from + days_per_page, days)
+        top = height - margin
+        pdf.setFont(bold, 11)
+        pdf.drawString(margin, top - 0.4 * cm, f'Шахматка номеров: {period}')
+        pdf.setFont(regular, 8)
+        pdf.drawRightString(width - margin, top - 0.4 * cm, f'стр. {page}')
+
+        grid_top = top - 0.8 * cm
+        for i in range(day_from, day_to):
+            day = start + timedelta(days=i)
+            x = margin + label_w + (i - day_from) * day_w
+            if day.weekday() >= 5:
+                pdf.setFillColor(colors.HexColor('#FDEDEC'))
+                pdf.rect(x, grid_top - header_h - len(rows) * row_h, day_w, header_h + len(rows) * row_h,
+                         stroke=0, fill=1)
+            pdf.setFillColor(colors.black)
+            pdf.setFont(bold, 7)
+            pdf.drawCentredString(x + day_w / 2, grid_top - 0.4 * cm, f'{day:%d}')
+            pdf.setFont(regular, 6)
+            pdf.drawCentredString(x + day_w / 2, grid_top - 0.8 * cm, DAYS_RU_SHORT[day.weekday()])
+
+        y = grid_top - header_h
+        for room, cells in rows:
+            y -= row_h
+            pdf.setFillColor(colors.black)
+            pdf.setFont(bold, 7)
+            pdf.drawString(margin, y + 0.18 * cm, room.room_number)
+            pdf.setFont(regular, 6)
+            pdf.drawString(margin + 1.1 * cm, y + 0.18 * cm, room.room_type.name[:18])
+            i = day_from
+            while i < day_to:
+                item = cells[i]
+                if item is None:
+                    i += 1
+                    continue
+                # Сплошной отрезок одного бронирования на этой странице
+                j = i + 1
+                while j < day_to and cells[j] is not None and not cells[j][2] and cells[j][1] == item[1]:
+                    j += 1
+                x = margin + label_w + (i - day_from) * day_w
+                pdf.setFillColor(colors.HexColor(STATUS_COLORS.get(item[1], '#2ECC71')))
+                pdf.roundRect(x + 0.5, y + 1, (j - i) * day_w - 1, row_h - 2, 2, stroke=0, fill=1)
+                pdf.setFillColor(colors.white)
+                pdf.setFont(regular, 6)
+                label_len = max(int((j - i) * day_w / 3.2), 1)
+                pdf.drawString(x + 2, y + 0.18 * cm, item[0][:label_len])
+                i = j
+            pdf.setStrokeColor(colors.HexColor('#DDDDDD'))
+            pdf.line(margin, y, margin + label_w + (day_to - day_from) * day_w, y)
+        pdf.showPage()
+
+    rows = []
+    for row in iter_room_rows(filters, start, days):
+        rows.append(row)
+        if len(rows) == rows_per_page:
+            for day_from in range(0, days, days_per_page):
+                draw_page(rows, day_from)
+            rows = []
+    if rows or page == 0:
+        for day_from in range(0, days, days_per_page):
+            draw_page(rows, day_from)
+    pdf.save()
+
+
+WRITERS = {'pdf': write_pdf, 'xlsx': write_xlsx}
+
+
+def _cleanup_old_exports():
+    """Удаляет из хранилища файлы задач старше JOB_TIMEOUT — за ними уже не придут"""
+    try:
+        _, names = default_storage.listdir(STORAGE_DIR)
+    except FileNotFoundError:
+        return
+    expired = timezone.now() - timedelta(seconds=JOB_TIMEOUT)
+    for name in names:
+        path = f'{STORAGE_DIR}/{name}'
+        try:
+            if default_storage.get_modified_time(path) < expired:
+                default_storage.delete(path)
+        except OSError:
+            pass
+
+
+def build_export(fmt, filters, start, days):
+    """Собирает файл экспорта во временном каталоге и возвращает путь к нему"""
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = EXPORT_DIR / f'{uuid.uuid4().hex}.{fmt}'
+    WRITERS[fmt](path, filters, start, days)
+    return path
+
+
+def is_large(rooms_count, days):
+    return rooms_count * days > EXPORT_SYNC_CELLS
+
+
+def _job_key(job_id):
+    return f'chess_export_job:{job_id}'
+
+
+def get_job(job_id):
+    return cache.get(_job_key(job_id))
+
+
+def _store_export(path, job_id, fmt):
+    """Переносит собранный файл из временного каталога в общее хранилище, возвращает имя в нем"""
+    try:
+        with open(path, 'rb') as handle:
+            return default_storage.save(f'{STORAGE_DIR}/{job_id}.{fmt}', File(handle))
+    finally:
+        os.unlink(path)
+
+
+def _run_job(job_id, fmt, filters, start, days):
+    job = get_job(job_id) or {}
+    try:
+        path = build_export(fmt, filters, start, days)
+        job.update(status='done', name=_store_export(path, job_id, fmt))
+    except Exception as e:
+        job.update(status='failed', error=str(e))
+    finally:
+        # Поток открывал собственное соединение с БД
+        connection.close()
+    cache.set(_job_key(job_id), job, JOB_TIMEOUT)
+
+
+def start_export_job(fmt, filters, start, days):
+    """
+    Запускает сборку экспорта в фоновом потоке; состояние задачи хранится в общем кэше,
+    готовый файл — в общем хранилище
+    """
+    _cleanup_old_exports()
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {
+        'status': 'running',
+        'format': fmt,
+        'filename': export_filename(fmt, start, days),
+    }, JOB_TIMEOUT)
+    threading.Thread(target=_run_job, args=(job_id, fmt, filters, start, days), daemon=True).start()
+    return job_id
+
+
+def open_export(path):
+    """Открывает готовый файл и сразу удаляет его с диска — он живет, пока открыт"""
+    handle = open(path, 'rb')
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    return handle
+
+
+def open_job_export(job_id, job):
+    """
+    Открывает файл задачи из хранилища и снимает задачу: ссылка выдается один раз,
+    а сам файл удалит очистка через JOB_TIMEOUT (из удаленного хранилища нельзя удалить открытый файл)
+    """
+    handle = default_storage.open(job['name'], 'rb')
+    cache.delete(_job_key(job_id))
+    return handle
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db.models import Count
+
+from .availability_calendar import calendar_window
+from .chess_tiles import filtered_rooms
+from .models import Booking, RoomTypeAvailability
+
+# Тепловая карта показывает до года с небольшим запасом
+MAX_HEATMAP_DAYS = 366
+HEATMAP_GROUPS = ('type', 'floor')
+# Число ступеней цвета: загрузка округляется до 10%
+LEVELS = 10
+
+MONTHS_RU = ['Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+             'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь']
+
+
+def _from_calendar(start, days):
+    """{тип: (название, [(занято, всего) по дням])} из готового календаря доступности — один запрос"""
+    series = {}
+    rows = RoomTypeAvailability.objects.filter(
+        date__gte=start, date__lt=start + timedelta(days=days),
+    ).order_by('room_type__name', 'room_type_id').values_list(
+        'room_type_id', 'room_type__name', 'date', 'booked_rooms', 'total_rooms'
+    )
+    for type_id, name, day, booked, total in rows:
+        label, cells = series.setdefault(type_id, (name, [(0, 0)] * days))
+        cells[(day - start).days] = (booked, total)
+    return series
+
+
+def _sweep(start, days, group, filters):
+    """
+    {группа: (подпись, [(занято, всего) по дням])} разностным массивом:
+    +1 в день заезда, -1 в день выезда, занятость дня — префиксная сумма.
+    Бронирования читаются одним запросом, завершенные проживания тоже учитываются;
+    номера на обслуживании в знаменатель не входят
+    """
+    rooms = filtered_rooms(**filters).exclude(status='maintenance').order_by()
+    if group == 'type':
+        key = 'room_type_id'
+        totals = {
+            type_id: (name, count)
+            for type_id, name, count in rooms.values('room_type_id', 'room_type__name').annotate(
+                n=Count('id')
+            ).values_list('room_type_id', 'room_type__name', 'n')
+        }
+    else:
+        key = 'floor'
+        totals = {
+            floor: (f'{floor} этаж', count)
+            for floor, count in rooms.values('floor').annotate(n=Count('id')).values_list('floor', 'n')
+        }
+
+    diffs = {value: [0] * (days + 1) for value in totals}
+    bookings = Booking.objects.filter(room__in=rooms).exclude(status='cancelled').overlapping(
+        start, start + timedelta(days=days)
+    ).values_list(f'room__{key}', 'check_in_date', 'check_out_date')
+    for value, check_in, check_out in bookings:
+        diff = diffs[value]
+        diff[max((check_in - start).days, 0)] += 1
+        diff[min((check_out - start).days, days)] -= 1
+
+    series = {}
+    for value in sorted(totals, key=lambda v: v if group == 'floor' else (totals[v][0], v)):
+        label, total = totals[value]
+        occupied = list(accumulate(diffs[value][:days]))
+        series[value] = (label, [(booked, total) for booked in occupied])
+    return series
+
+
+def build_heatmap(start, days, group='type', filters=None):
+    """
+    Загрузка по типам номеров или этажам по дням: {'rows': [...], 'months': [...], 'average': ...}.
+    Для типов без фильтров в окне календаря читается готовый дневной агрегат,
+    иначе загрузка считается проходом по бронированиям
+    """
+    filters = filters or {}
+    first, last = calendar_window()
+    if group == 'type' and not any(filters.values()) and first <= start and start + timedelta(days=days) <= last:
+        series = _from_calendar(start, days)
+    else:
+        series = _sweep(start, days, group, filters)
+
+    rows = []
+    booked_sum = total_sum = 0
+    for label, cells in series.values():
+        out = []
+        row_booked = row_total = 0
+        for i, (booked, total) in enumerate(cells):
+            share = booked / total if total else 0
+            day = start + timedelta(days=i)
+            out.append((min(round(share * LEVELS), LEVELS), f'{day:%d.%m.%Y}: {booked} из {total} ({share:.0%})'))
+            row_booked += booked
+            row_total += total
+        rows.append({'label': label, 'cells': out, 'average': row_booked / row_total if row_total else 0})
+        booked_sum += row_booked
+        total_sum += row_total
+
+    months = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        if not months or months[-1]['key'] != (day.year, day.month):
+            months.append({'key': (day.year, day.month), 'label': f'{MONTHS_RU[day.month - 1]} {day.year}', 'span': 0})
+        months[-1]['span'] += 1
+
+    return {
+        'rows': rows,
+        'months': months,
+        'average': booked_sum / total_sum if total_sum else 0,
+    }
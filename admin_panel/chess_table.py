@@ -1,20 +1,22 @@
 
+from django.conf import settings
 from django.shortcuts import render
 from django.db.models import Q
 from datetime import datetime, timedelta
 from django.template.loader import render_to_string
 from collections import defaultdict
-from django.http import JsonResponse, HttpResponse
+from itertools import accumulate
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse
+from django.utils.http import urlencode
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
 from django.views import View
-import pandas as pd
-from pandas import date_range
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-import io
 
+from . import chess_cache, chess_export
+from .availability import get_matrix, in_horizon
+from .chess_heatmap import HEATMAP_GROUPS, LEVELS, MAX_HEATMAP_DAYS, build_heatmap
+from .chess_tiles import TILE_DAYS, TILE_ROOMS, filtered_rooms
+from .conditional import conditional_page, modified
 from .models import Booking, Room, RoomType, Customer
 
 from .views import _auto_update_statuses
@@ -37,6 +39,10 @@ CUSTOMER_COLORS = [
     ('#673AB7', '#512DA8'),  # тёмно-фиолетовый
 ]
 
+# Табличный режим рисует весь период на сервере, виртуализированный — подгружает плитки
+MAX_TABLE_DAYS = 90
+MAX_VIRTUAL_DAYS = 731
+
 STATUS_SHORT = {
     'confirmed': 'Подтв.',
     'checked_in': 'Заселен',
@@ -45,46 +51,182 @@ STATUS_SHORT = {
     'canceled': 'Отменен'
 }
 
-class ChessTableView(View):
+def booking_cell(b, customer_colors):
+    light, dark = customer_colors[b.customer.id]
+    return {
+        'room_id': b.room_id,
+        'customer_id': b.customer_id,
+        'customer_name': b.customer.get_full_name(),
+        'customer_last_name': b.customer.last_name,
+        'customer_first_name': b.customer.first_name,
+        'color': light,
+        'color_dark': dark,
+        'check_in': b.check_in_date,
+        'check_out': b.check_out_date,
+        'status_display': b.get_status_display(),
+        'status_short': STATUS_SHORT.get(b.status, b.status),
+        'total_price': b.total_price,
+        'booking_id': b.id,
+        'version': b.version,
+        'movable': b.status in Booking.ACTIVE_STATUSES,
+    }
 
-    def get(self, request):
-        today = datetime.now().date()
 
-        # ── Даты ──────────────────────────────────────────────
-        start_str = request.GET.get('start_date', '')
-        end_str   = request.GET.get('end_date', '')
-        # Если даты не переданы, показываем текущую неделю
-        if not start_str and not end_str:
-            # Начало недели (понедельник)
-            start_date = today
-            # Конец недели (воскресенье)
-            end_date = start_date + timedelta(days=6)
-        else:
-            try:
-                start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
-            except ValueError:
-                start_date = today
-            try:
-                end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=6)
-            except ValueError:
-                end_date = start_date + timedelta(days=6)
+TOTAL_KEYS = ('occupied', 'free', 'arrivals', 'departures')
 
-        # Ограничиваем диапазон 90 днями для производительности
-        if (end_date - start_date).days > 90:
-            end_date = start_date + timedelta(days=90)
 
-        date_range = []
-        cur = start_date
-        while cur <= end_date:
-            date_range.append(cur)
-            cur += timedelta(days=1)
+def _day_totals(rooms_count, occupied_diff, arrivals, departures):
+    """Итоги по дням из разностного массива занятости: [{'occupied', 'free', 'arrivals', 'departures'}]"""
+    return [
+        {'occupied': occupied, 'free': rooms_count - occupied, 'arrivals': arrived, 'departures': departed}
+        for occupied, arrived, departed in zip(accumulate(occupied_diff), arrivals, departures)
+    ]
+
+
+def build_grid(rooms, bookings, days, customer_colors):
+    """
+    Готовая сетка шахматки: [{'floor', 'rows': [{'room', 'cells': [...]}], 'totals': [...]}].
+    days — элементы date_range_rich (date, date_str, is_weekend). Ячейка — {'day', 'span', 'booking'},
+    у свободного дня booking = None и span = 1. Каждая строка строится одним проходом
+    по отсортированным бронированиям номера, без обращений к словарям по датам.
+    Тем же проходом считаются итоги этажа по дням (занято, свободно, заезды, выезды)
+    без отмененных бронирований; итоги по всей сетке дает grid_totals()
+    """
+    if not days:
+        return []
+    start = days[0]['date']
+    total = len(days)
+
+    by_room = defaultdict(list)
+    for b in bookings:
+        by_room[b.room_id].append(b)
+
+    floors = []
+    # Счетчики этажей по дням: разностный массив занятости, заезды, выезды
+    counters = []
+    for room in rooms:
+        if not floors or floors[-1]['floor'] != room.floor:
+            floors.append({'floor': room.floor, 'rows': []})
+            occupied_diff = [0] * total
+            arrivals = [0] * total
+            departures = [0] * total
+            counters.append((occupied_diff, arrivals, departures))
+
+        cells = []
+        pos = 0
+        # День, до которого занятость номера уже учтена: пересекающиеся бронирования не считаются дважды
+        busy = 0
+        for b in sorted(by_room.get(room.id, ()), key=lambda b: (b.check_in_date, b.id)):
+            if b.status != 'cancelled':
+                check_in = (b.check_in_date - start).days
+                check_out = (b.check_out_date - start).days
+                if 0 <= check_in < total:
+                    arrivals[check_in] += 1
+                if 0 <= check_out < total:
+                    departures[check_out] += 1
+                first, last = max(check_in, busy, 0), min(check_out, total)
+                if first < last:
+                    occupied_diff[first] += 1
+                    if last < total:
+                        occupied_diff[last] -= 1
+                    busy = last
+
+            first = max((b.check_in_date - start).days, pos)
+            last = min((b.check_out_date - start).days, total)
+            if first >= last:
+                continue
+            cells.extend({'day': days[i], 'span': 1, 'booking': None} for i in range(pos, first))
+            cells.append({'day': days[first], 'span': last - first, 'booking': booking_cell(b, customer_colors)})
+            pos = last
+        cells.extend({'day': days[i], 'span': 1, 'booking': None} for i in range(pos, total))
+        floors[-1]['rows'].append({'room': room, 'cells': cells})
+
+    for floor, (occupied_diff, arrivals, departures) in zip(floors, counters):
+        floor['totals'] = _day_totals(len(floor['rows']), occupied_diff, arrivals, departures)
+    return floors
+
+
+def grid_totals(grid):
+    """Итоги по дням для всей сетки — сумма итогов этажей"""
+    if not grid:
+        return []
+    return [
+        {key: sum(day[key] for day in days) for key in TOTAL_KEYS}
+        for days in zip(*(floor['totals'] for floor in grid))
+    ]
+
+
+def _chess_freshness(request):
+    """Данные окна шахматки для условного GET; выгрузки не сверяются"""
+    if request.GET.get('export'):
+        return None
+    start_date, end_date = ChessTableView.requested_dates(request)
+    _, end_date = ChessTableView.resolve_mode(request, start_date, end_date)
+    filters = {
+        'room_type_id': request.GET.get('room_type', ''),
+        'floor':        request.GET.get('floor', ''),
+        'status':       request.GET.get('status', ''),
+    }
+    rooms = filtered_rooms(**filters)
+    return [
+        modified(rooms),
+        modified(Booking.objects.filter(room__in=rooms).overlapping(start_date, end_date + timedelta(days=1))),
+        # Версии кэша шахматки меняются и при удалении бронирований, и при правке клиентов и типов номеров
+        chess_cache.window_key(start_date, end_date, filters),
+        # Подсветка сегодняшнего дня
+        datetime.now().date(),
+    ]
 
-        # ── Параметры фильтрации ──────────────────────────────
-        room_type_id  = request.GET.get('room_type', '')
-        floor         = request.GET.get('floor', '')
-        status_filter = request.GET.get('status', '')
-        export_format = request.GET.get('export', '')
 
+@method_decorator(conditional_page(_chess_freshness), name='get')
+class ChessTableView(View):
+
+    @staticmethod
+    def filter_context(filter_params):
+        """Данные для панели фильтров"""
+        return {
+            'room_types':     RoomType.objects.all(),
+            'floors':         Room.objects.order_by('floor').values_list('floor', flat=True).distinct(),
+            'status_choices': Room.ROOM_STATUS,
+            'filter_params':  filter_params,
+        }
+
+    def live_context(self):
+        """Живые обновления через SSE (только под ASGI) или опрос версии данных"""
+        return {
+            'live_updates': settings.CHESS_LIVE_UPDATES,
+            'poll_seconds': settings.CHESS_POLL_SECONDS,
+        }
+
+    def export(self, request, fmt, filters, start_date, days):
+        """
+        Экспорт сетки в PDF/XLSX. Небольшие выгрузки отдаются сразу,
+        крупные собираются в фоновом потоке, а пользователь ждет на странице с опросом статуса
+        """
+        rooms_count = chess_export.filtered_rooms(**filters).count()
+        if not chess_export.is_large(rooms_count, days):
+            path = chess_export.build_export(fmt, filters, start_date, days)
+            return FileResponse(
+                chess_export.open_export(path),
+                as_attachment=True,
+                filename=chess_export.export_filename(fmt, start_date, days),
+            )
+
+        job_id = chess_export.start_export_job(fmt, filters, start_date, days)
+        return render(request, 'admin_panel/chess_export_wait.html', {
+            'job_id':      job_id,
+            'format':      fmt,
+            'rooms_count': rooms_count,
+            'days':        days,
+            'start_date':  start_date,
+            'end_date':    start_date + timedelta(days=days - 1),
+        })
+
+    def table_fragment(self, start_date, end_date, date_range, room_type_id, floor, status_filter):
+        """
+        Все, что табличный режим считает по данным: цвета, легенда, сводка
+        и отрисованные строки сетки. Результат кэшируется целиком (chess_cache)
+        """
         # ── Комнаты ───────────────────────────────────────────
         rooms_qs = Room.objects.select_related('room_type').order_by('floor', 'room_number')
         if room_type_id:
@@ -96,9 +238,8 @@ class ChessTableView(View):
         rooms = list(rooms_qs)
 
         # ── Бронирования ──────────────────────────────────────
-        bookings_qs = Booking.objects.filter(
-            check_in_date__lte=end_date,
-            check_out_date__gt=start_date,
+        bookings_qs = Booking.objects.overlapping(
+            start_date, end_date + timedelta(days=1)
         ).select_related('customer', 'room', 'room__room_type')
 
         # Если фильтр по комнатам активен — ограничиваем бронирования
@@ -117,78 +258,6 @@ class ChessTableView(View):
                 customer_colors[cid] = CUSTOMER_COLORS[color_idx % len(CUSTOMER_COLORS)]
                 color_idx += 1
 
-        # ── Плоский список записей для шаблона ────────────────
-        # Формат: [{room_id, date_str, ...}, ...]
-        # Шаблон Django не умеет делать dict lookup по переменной,
-        # поэтому передаём плоский список и итерируем в шаблоне.
-# УДАЛИТЬ
-        # bookings_list = []
-        # for b in bookings:
-        #     room_id = b.room.id
-        #     light, dark = customer_colors[b.customer.id]
-        #     # Определяем пересечение дат бронирования с отображаемым диапазоном
-        #     seg_start = max(b.check_in_date, start_date)
-        #     seg_end   = min(b.check_out_date - timedelta(days=1), end_date)  # check_out — день выезда, не занят
-        #     cur = seg_start
-        #     while cur <= seg_end:
-        #         bookings_list.append({
-        #             'room_id':        room_id,
-        #             'date_str':       cur.strftime('%Y-%m-%d'),
-        #             'customer_name':  b.customer.get_full_name(),
-        #             'customer_last_name': b.customer.last_name,
-        #             'color':          light,
-        #             'color_dark':     dark,
-        #             'check_in':       b.check_in_date,
-        #             'check_out':      b.check_out_date,
-        #             'status_display': b.get_status_display(),
-        #             'status_short':   STATUS_SHORT.get(b.status, b.status),
-        #             'total_price':    b.total_price,
-        #             'booking_id':     b.id,
-        #         })
-        #         cur += timedelta(days=1)
-        from collections import defaultdict
-
-        schedule_map = defaultdict(dict)
-        booking_spans = defaultdict(dict)
-
-        for b in bookings:
-            room_id = b.room.id
-            light, dark = customer_colors[b.customer.id]
-
-            seg_start = max(b.check_in_date, start_date)
-            seg_end = min(b.check_out_date - timedelta(days=1), end_date)
-
-            visible_dates = []
-            cur = seg_start
-            while cur <= seg_end:
-                visible_dates.append(cur)
-                cur += timedelta(days=1)
-
-            if not visible_dates:
-                continue
-
-            booking_dict = {
-                'room_id': room_id,
-                'customer_name': b.customer.get_full_name(),
-                'customer_last_name': b.customer.last_name,
-                'customer_first_name': b.customer.first_name,
-                'color': light,
-                'color_dark': dark,
-                'check_in': b.check_in_date,
-                'check_out': b.check_out_date,
-                'status_display': b.get_status_display(),
-                'status_short': STATUS_SHORT.get(b.status, b.status),
-                'total_price': b.total_price,
-                'booking_id': b.id,
-            }
-
-            for d in visible_dates:
-                schedule_map[room_id][d.strftime('%Y-%m-%d')] = booking_dict
-
-            # colspan только для первого видимого дня
-            first_date_str = visible_dates[0].strftime('%Y-%m-%d')
-            booking_spans[room_id][first_date_str] = len(visible_dates)
-
         # ── Легенда ───────────────────────────────────────────
         seen_customers = {}
         for b in bookings:
@@ -201,16 +270,14 @@ class ChessTableView(View):
                 }
         legend_items = list(seen_customers.values())
 
-        # ── Данные для фильтров ───────────────────────────────
-        room_types = RoomType.objects.all()
-        floors     = Room.objects.order_by('floor').values_list('floor', flat=True).distinct()
+        # ── Номера, свободные весь период (матрица занятости) ─
+        period_end = end_date + timedelta(days=1)
+        free_whole_period = None
+        if in_horizon(start_date, period_end):
+            free_ids = set(get_matrix().free_room_ids(start_date, period_end, only_available=False))
+            free_whole_period = sum(1 for r in rooms if r.id in free_ids)
 
-        filter_params = {
-            'room_type': room_type_id,
-            'floor':     floor,
-            'status':    status_filter,
-        }
-# ── Русские названия дней для шаблона ─────────────────
+        # ── Русские названия дней для шаблона ─────────────────
         DAYS_RU_SHORT   = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
         MONTHS_RU_SHORT = ['янв', 'фев', 'мар', 'апр', 'май', 'июн',
                            'июл', 'авг', 'сен', 'окт', 'ноя', 'дек']
@@ -226,22 +293,162 @@ class ChessTableView(View):
             for d in date_range
         ]
 
+        # ── Сетка: строки номеров по этажам, ячейки уже с colspan ─
+        grid = build_grid(rooms, bookings, date_range_rich, customer_colors)
+        rows_html = render_to_string('admin_panel/chess_table_rows.html', {
+            'grid':       grid,
+            'date_range': date_range,
+        })
+
+        return {
+            'rooms_count':       len(rooms),
+            'customers_count':   len(customer_colors),
+            'date_range_rich':   date_range_rich,
+            'legend_items':      legend_items,
+            'free_whole_period': free_whole_period,
+            'rows_html':         rows_html,
+            'totals':            grid_totals(grid),
+        }
+
+    @staticmethod
+    def requested_dates(request):
+        """Период из GET-параметров; по умолчанию неделя начиная с сегодняшнего дня"""
+        today = datetime.now().date()
+        start_str = request.GET.get('start_date', '')
+        end_str   = request.GET.get('end_date', '')
+        # Если даты не переданы, показываем текущую неделю
+        if not start_str and not end_str:
+            # Начало недели (понедельник)
+            start_date = today
+            # Конец недели (воскресенье)
+            end_date = start_date + timedelta(days=6)
+        else:
+            try:
+                start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+            except ValueError:
+                start_date = today
+            try:
+                end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=6)
+            except ValueError:
+                end_date = start_date + timedelta(days=6)
+        if end_date < start_date:
+            end_date = start_date
+        return start_date, end_date
+
+    @staticmethod
+    def resolve_mode(request, start_date, end_date):
+        """
+        Режим отображения и конец периода с учетом ограничений режима.
+        Табличный режим рисует весь период на сервере и ограничен 90 днями.
+        Более длинные периоды показывает виртуализированная сетка, подгружающая плитки
+        """
+        mode = request.GET.get('mode', '')
+        if mode == 'heatmap':
+            # Тепловая карта по умолчанию показывает год вперед
+            if not request.GET.get('end_date'):
+                end_date = start_date + timedelta(days=364)
+            end_date = min(end_date, start_date + timedelta(days=MAX_HEATMAP_DAYS - 1))
+        else:
+            if (end_date - start_date).days > MAX_TABLE_DAYS:
+                mode = 'virtual'
+            max_days = MAX_VIRTUAL_DAYS if mode == 'virtual' else MAX_TABLE_DAYS
+            if (end_date - start_date).days > max_days:
+                end_date = start_date + timedelta(days=max_days)
+        return mode, end_date
+
+    def get(self, request):
+        # ── Даты ──────────────────────────────────────────────
+        start_date, end_date = self.requested_dates(request)
+
+        # ── Параметры фильтрации ──────────────────────────────
+        room_type_id  = request.GET.get('room_type', '')
+        floor         = request.GET.get('floor', '')
+        status_filter = request.GET.get('status', '')
+        export_format = request.GET.get('export', '')
+
+        if export_format in chess_export.EXPORT_FORMATS:
+            end_date = min(end_date, start_date + timedelta(days=MAX_VIRTUAL_DAYS))
+            filters = {'room_type_id': room_type_id, 'floor': floor, 'status': status_filter}
+            return self.export(request, export_format, filters, start_date, (end_date - start_date).days + 1)
+
+        mode, end_date = self.resolve_mode(request, start_date, end_date)
+
+        date_range = []
+        cur = start_date
+        while cur <= end_date:
+            date_range.append(cur)
+            cur += timedelta(days=1)
+
+        filter_params = {
+            'room_type': room_type_id,
+            'floor':     floor,
+            'status':    status_filter,
+            'mode':      mode,
+            'group':     request.GET.get('group') if request.GET.get('group') in HEATMAP_GROUPS else 'type',
+        }
+        export_query = urlencode({
+            'start_date': start_date.isoformat(),
+            'end_date':   end_date.isoformat(),
+            'room_type':  room_type_id,
+            'floor':      floor,
+            'status':     status_filter,
+        })
+        if mode == 'heatmap':
+            filters = {'room_type_id': room_type_id, 'floor': floor, 'status': status_filter}
+            heatmap = chess_cache.get_or_build(
+                start_date, end_date,
+                {**filters, 'mode': mode, 'group': filter_params['group']},
+                lambda: build_heatmap(start_date, len(date_range), filter_params['group'], filters),
+            )
+            return render(request, 'admin_panel/chess_table_heatmap.html', {
+                'start_date':     start_date,
+                'end_date':       end_date,
+                'days':           len(date_range),
+                'heatmap':        heatmap,
+                'levels':         range(LEVELS + 1),
+                'export_query':   export_query,
+                **self.filter_context(filter_params),
+            })
+
+        if mode == 'virtual':
+            return render(request, 'admin_panel/chess_table_virtual.html', {
+                'start_date':     start_date,
+                'end_date':       end_date,
+                'days':           len(date_range),
+                'tile_rooms':     TILE_ROOMS,
+                'tile_days':      TILE_DAYS,
+                'palette':        CUSTOMER_COLORS,
+                'export_query':   export_query,
+                **self.live_context(),
+                **self.filter_context(filter_params),
+            })
+
+        fragment = chess_cache.get_or_build(
+            start_date, end_date,
+            {'room_type': room_type_id, 'floor': floor, 'status': status_filter},
+            lambda: self.table_fragment(start_date, end_date, date_range, room_type_id, floor, status_filter),
+        )
         context = {
-            'rooms':            rooms,
+            **fragment,
+            'rows_html':        mark_safe(fragment['rows_html']),
             'date_range':       date_range,
-            'date_range_rich':  date_range_rich,
-            #'bookings_list':    bookings_list, УДАЛИТЬ
-            'schedule_map': dict(schedule_map),  # было: bookings_list
-            'booking_spans': dict(booking_spans),  # новое
             'start_date':       start_date,
             'end_date':         end_date,
-            'room_types':       room_types,
-            'floors':           floors,
-            'status_choices':   Room.ROOM_STATUS,
-            'customer_colors':  customer_colors,
-            'legend_items':     legend_items,
-            'filter_params':    filter_params,
+            'export_query':     export_query,
+            'palette':          CUSTOMER_COLORS,
+            **self.live_context(),
+            **self.filter_context(filter_params),
         }
         return render(request, 'admin_panel/chess_table.html', context)
 
 
+def chess_export_download(request, job_id):
+    """Отдает файл, собранный фоновой задачей экспорта; файл выдается один раз"""
+    job = chess_export.get_job(job_id)
+    if not job or job.get('status') != 'done':
+        raise Http404('Экспорт не найден или еще не готов')
+    try:
+        handle = chess_export.open_job_export(job_id, job)
+    except OSError:
+        raise Http404('Файл экспорта уже выдан или удален')
+    return FileResponse(handle, as_attachment=True, filename=job['filename'])
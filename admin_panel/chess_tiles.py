@@ -0,0 +1,98 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Booking, Room
+
+# Размер плитки по умолчанию: клиент запрашивает сетку кусками «номера × дни»
+TILE_ROOMS = 40
+TILE_DAYS = 28
+MAX_TILE_ROOMS = 200
+MAX_TILE_DAYS = 92
+
+# Версия данных шахматки: меняется при любом изменении бронирований, номеров и клиентов
+VERSION_CACHE_KEY = 'chess_tiles_version'
+TILE_CACHE_TIMEOUT = 60 * 60
+
+
+def current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        return 1
+
+
+def bump_on_commit():
+    """
+    Версия меняется после фиксации: иначе другой процесс успел бы прочитать
+    незафиксированное (старое) состояние и закэшировать его под новой версией
+    """
+    transaction.on_commit(bump_version)
+
+
+def filtered_rooms(room_type_id='', floor='', status=''):
+    """Номера шахматки в порядке строк: этаж, номер"""
+    rooms = Room.objects.order_by('floor', 'room_number')
+    if room_type_id:
+        rooms = rooms.filter(room_type_id=room_type_id)
+    if floor:
+        rooms = rooms.filter(floor=floor)
+    if status:
+        rooms = rooms.filter(status=status)
+    return rooms
+
+
+def cache_key(kind, params):
+    """Ключ плитки: версия данных + нормализованные параметры запроса"""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return f'chess_{kind}:{current_version()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def rooms_index(filters):
+    """Список строк шахматки: [[id, номер, этаж, тип, статус, цена], ...]"""
+    rows = filtered_rooms(**filters).values_list(
+        'id', 'room_number', 'floor', 'room_type__name', 'status', 'room_type__price_per_night'
+    )
+    return {
+        'rooms': [[room_id, number, floor, type_name, status, str(price)]
+                  for room_id, number, floor, type_name, status, price in rows],
+    }
+
+
+def tile(filters, offset, limit, start, days):
+    """
+    Сегменты бронирований для окна строк [offset, offset + limit) × дней [start, start + days).
+    Сегмент: [id номера, смещение дня, длина, id бронирования, id клиента, статус, заезд, выезд];
+    сегменты обрезаны окном, заезд/выезд — полные даты брони
+    """
+    room_ids = list(filtered_rooms(**filters).values_list('id', flat=True)[offset:offset + limit])
+    end = start + timedelta(days=days)
+    bookings = Booking.objects.filter(room_id__in=room_ids).overlapping(start, end).order_by(
+        'room_id', 'check_in_date'
+    ).values_list('id', 'room_id', 'customer_id', 'customer__last_name', 'customer__first_name',
+                  'status', 'check_in_date', 'check_out_date')
+
+    segments = []
+    customers = {}
+    for booking_id, room_id, customer_id, last_name, first_name, status, check_in, check_out in bookings:
+        first = max((check_in - start).days, 0)
+        last = min((check_out - start).days, days)
+        segments.append([room_id, first, last - first, booking_id, customer_id, status,
+                         check_in.isoformat(), check_out.isoformat()])
+        customers[customer_id] = [last_name, first_name]
+    return {
+        'start': start.isoformat(),
+        'days': days,
+        'offset': offset,
+        'rooms': room_ids,
+        'segments': segments,
+        'customers': customers,
+    }
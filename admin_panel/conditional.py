@@ -0,0 +1,84 @@
+import hashlib
+from functools import partial, wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def modified(queryset):
+    """(время последнего изменения, число строк) одним агрегатом; число строк замечает удаления"""
+    row = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('pk'))
+    return row['last'], row['count']
+
+
+def _deletes_key(model):
+    return f'deleted_rows:{model._meta.label_lower}'
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def table_modified(model):
+    """
+    То же, что modified(), для таблицы целиком без COUNT по всем строкам: Max(updated_at)
+    читает край индекса, а удаления замечает счетчик в общем кэше (note_delete)
+    """
+    last = model.objects.order_by().aggregate(last=Max('updated_at'))['last']
+    return last, cache.get(_deletes_key(model), 0)
+
+
+def note_delete(model):
+    """Учитывает удаление строки model после фиксации транзакции"""
+    transaction.on_commit(partial(_incr, _deletes_key(model)))
+
+
+def conditional_page(freshness):
+    """
+    Условный GET для страницы: freshness(request, *args, **kwargs) возвращает список значений,
+    от которых зависит страница — пары modified() по данным окна, даты, версии кэша, —
+    или None, если сверка не нужна.
+    Last-Modified — самое позднее из изменений, ETag — хэш всех значений вместе с адресом и пользователем.
+    Если браузер прислал актуальные валидаторы, отвечаем 304 без сборки и рендера страницы
+    """
+    def state(request, *args, **kwargs):
+        # condition() спрашивает ETag и Last-Modified отдельно — данные окна читаются один раз
+        if not hasattr(request, '_freshness'):
+            # Непоказанные сообщения должны попасть на страницу, поэтому ее рендерим заново
+            pending = len(messages.get_messages(request))
+            request._freshness = None if pending else freshness(request, *args, **kwargs)
+        return request._freshness
+
+    def etag(request, *args, **kwargs):
+        parts = state(request, *args, **kwargs)
+        if parts is None:
+            return None
+        raw = repr((request.get_full_path(), request.user.pk, parts))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        parts = state(request, *args, **kwargs)
+        if parts is None:
+            return None
+        stamps = [part[0] for part in parts if isinstance(part, tuple) and part[0] is not None]
+        return max(stamps) if stamps else None
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                # Браузер хранит страницу, но перед показом сверяет ее с сервером
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
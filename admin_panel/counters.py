@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Booking
+
+# Счетчики нужны почти на каждой странице стойки регистрации; после изменения бронирования
+# ключ удаляется сигналом, TTL страхует от изменений в обход сигналов (update() и т.п.)
+COUNTERS_TIMEOUT = 60
+COUNTERS_KEY = 'booking_counters'
+# «Предстоящие» заезды: сегодня и следующие 7 дней
+UPCOMING_DAYS = 7
+# Неделя аналитики: сегодня и следующие 6 дней
+WEEK_DAYS = 6
+
+# Ожидаемые заезды: подтвержденные и ожидающие оплаты
+ARRIVING_STATUSES = ['confirmed', 'awaiting_payment']
+
+
+def _key(today):
+    return f'{COUNTERS_KEY}:{today.isoformat()}'
+
+
+def _compute(today):
+    tomorrow = today + timedelta(days=1)
+    arriving = Q(status__in=ARRIVING_STATUSES)
+    not_cancelled = ~Q(status='cancelled')
+    week = [today, today + timedelta(days=WEEK_DAYS)]
+    # Один запрос: каждое значение — COUNT(*) FILTER (WHERE ...) по своему условию
+    return Booking.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status__in=Booking.ACTIVE_STATUSES)),
+        today_checkins=Count('id', filter=arriving & Q(check_in_date=today)),
+        today_checkouts=Count('id', filter=Q(status='checked_in', check_out_date=today)),
+        upcoming_checkins=Count('id', filter=arriving & Q(
+            check_in_date__range=[today, today + timedelta(days=UPCOMING_DAYS)]
+        )),
+        # Для аналитики: все неотмененные заезды и выезды
+        arrivals_today=Count('id', filter=not_cancelled & Q(check_in_date=today)),
+        departures_today=Count('id', filter=not_cancelled & Q(check_out_date=today)),
+        arrivals_tomorrow=Count('id', filter=not_cancelled & Q(check_in_date=tomorrow)),
+        arrivals_week=Count('id', filter=not_cancelled & Q(check_in_date__range=week)),
+        departures_week=Count('id', filter=not_cancelled & Q(check_out_date__range=week)),
+        **{
+            f'status_{status}': Count('id', filter=Q(status=status))
+            for status, _ in Booking.BOOKING_STATUS
+        },
+    )
+
+
+def booking_counters(today=None):
+    """
+    Счетчики бронирований для стойки регистрации: всего, активных, заезды и выезды на сегодня,
+    предстоящие заезды, заезды/выезды недели и число бронирований в каждом статусе
+    (ключи status_<код>). Считаются одним запросом и кэшируются на COUNTERS_TIMEOUT
+    """
+    today = today or date.today()
+    key = _key(today)
+    counters = cache.get(key)
+    if counters is None:
+        counters = _compute(today)
+        cache.set(key, counters, COUNTERS_TIMEOUT)
+    return counters
+
+
+def status_stats(counters):
+    """Статусы с ненулевым числом бронирований: [{'status', 'status_display', 'count'}]"""
+    return [
+        {'status': status, 'status_display': label, 'count': counters[f'status_{status}']}
+        for status, label in sorted(Booking.BOOKING_STATUS)
+        if counters[f'status_{status}']
+    ]
+
+
+def _delete():
+    cache.delete(_key(date.today()))
+
+
+def invalidate():
+    """
+    Удаляет счетчики после фиксации транзакции: удаленные раньше, они успели бы
+    пересчитаться другим процессом по незафиксированному (старому) состоянию
+    """
+    transaction.on_commit(_delete)
@@ -0,0 +1,67 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+from service.models import ServiceBooking
+from .models import Booking
+
+RECENT_SERVICES = 5
+# Записи на услуги, которые еще не состоялись
+ACTIVE_SERVICE_STATUSES = ['pending', 'confirmed', 'in_progress']
+# Запросов на сборку профиля: бронирования, итоги услуг по видам, последние записи
+PROFILE_QUERIES = 3
+
+
+def _booking_stats(bookings):
+    """Итоги проживаний по уже загруженному списку — без отдельных COUNT и SUM"""
+    room_types = Counter(booking.room.room_type.name for booking in bookings)
+    favorite = room_types.most_common(1)
+    return {
+        'total_bookings': len(bookings),
+        'total_spent': sum((booking.total_price for booking in bookings), Decimal('0')),
+        'active_bookings': sum(booking.status in Booking.ACTIVE_STATUSES for booking in bookings),
+        'last_booking': bookings[0] if bookings else None,
+        'favorite_room_type': {'room__room_type__name': favorite[0][0], 'count': favorite[0][1]} if favorite else None,
+    }
+
+
+def _service_stats(customer):
+    """Итоги записей на услуги одним сгруппированным запросом: строка на услугу"""
+    rows = list(
+        ServiceBooking.objects.filter(customer=customer).order_by().values('service_id', 'service__name').annotate(
+            count=Count('id'),
+            active=Count('id', filter=Q(status__in=ACTIVE_SERVICE_STATUSES)),
+            spent=Sum('total_price'),
+        )
+    )
+    favorite = max(rows, key=lambda row: row['count'], default=None)
+    return {
+        'total_service_bookings': sum(row['count'] for row in rows),
+        'active_service_bookings': sum(row['active'] for row in rows),
+        'total_service_spent': sum((row['spent'] or 0 for row in rows), Decimal('0')),
+        'favorite_service': {'service__name': favorite['service__name'], 'count': favorite['count']} if favorite else None,
+    }
+
+
+def build_profile(customer):
+    """
+    Контекст карточки клиента за PROFILE_QUERIES запросов при любом числе проживаний:
+    бронирования читаются одним запросом вместе с номером и типом номера, итоги по ним
+    считаются в памяти, итоги услуг — одной группировкой по услуге
+    """
+    bookings = list(
+        Booking.objects.filter(customer=customer).select_related('room__room_type').order_by('-created_at', '-id')
+    )
+    recent_service_bookings = list(
+        ServiceBooking.objects.filter(customer=customer).select_related('service', 'created_by').order_by(
+            '-booking_date', '-start_time'
+        )[:RECENT_SERVICES]
+    )
+    return {
+        'customer': customer,
+        'bookings': bookings,
+        'recent_service_bookings': recent_service_bookings,
+        **_booking_stats(bookings),
+        **_service_stats(customer),
+    }
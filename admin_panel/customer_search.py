@@ -0,0 +1,53 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import F, Q
+
+from .models import Customer, Room, customer_search_document
+
+# То же выражение, что и в GIN-индексе customer_search_trgm (gin_trgm_ops) — иначе индекс не используется
+CUSTOMER_DOCUMENT = customer_search_document()
+
+AUTOCOMPLETE_LIMIT = 10
+
+
+def _words(query):
+    return [word.upper() for word in query.split()]
+
+
+def matching(customers, query):
+    """
+    Клиенты из customers, в строке поиска которых есть каждое слово запроса, с rank — сходством
+    триграмм запроса и строки поиска. Условие LIKE '%слово%' по выражению индекса
+    обслуживается GIN-индексом pg_trgm, а не последовательным просмотром таблицы
+    """
+    words = _words(query)
+    customers = customers.alias(document=CUSTOMER_DOCUMENT)
+    for word in words:
+        customers = customers.filter(document__contains=word)
+    return customers.annotate(rank=TrigramWordSimilarity(' '.join(words), CUSTOMER_DOCUMENT))
+
+
+def search(queryset, query, customer='', room=None):
+    """
+    Общий поиск для списков клиентов, бронирований и записей на услуги.
+    customer — путь от модели queryset к клиенту ('' для самих клиентов, 'customer' для бронирований),
+    room — путь к номеру, если номер комнаты тоже участвует в поиске.
+    Клиенты получают rank для сортировки по релевантности; остальные модели фильтруются
+    подзапросом по найденным клиентам и сохраняют свой порядок
+    """
+    if not query.strip():
+        return queryset
+    if not customer:
+        return matching(queryset, query)
+
+    condition = Q(**{f'{customer}__in': matching(Customer.objects.all(), query).values('pk')})
+    if room:
+        # Номеров немного — подходящие id выбираются заранее отдельным запросом
+        room_ids = list(Room.objects.filter(room_number__icontains=query.strip()).values_list('id', flat=True))
+        if room_ids:
+            condition |= Q(**{f'{room}__in': room_ids})
+    return queryset.filter(condition)
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """Лучшие совпадения для автозаполнения: по релевантности, затем по фамилии"""
+    return search(Customer.objects.all(), query).order_by(F('rank').desc(), 'last_name', 'first_name', 'id')[:limit]
@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from service.models import ServiceBooking
+from .models import Booking, Customer, CustomerStats
+
+REBUILD_BATCH = 2000
+CUSTOMERS_PAGE_SIZE = 25
+STATS_FIELDS = ['booking_count', 'total_spent', 'last_booking_date', 'service_spent', 'is_active']
+
+
+def refresh_customers(customer_ids):
+    """
+    Пересчитывает итоги клиентов customer_ids по их бронированиям и записям на услуги.
+    Агрегаты идут по индексам внешних ключей клиента, поэтому цена не зависит от размера таблиц.
+    Удаленные клиенты пропускаются. Возвращает число записанных строк
+    """
+    ids = list(Customer.objects.filter(id__in={i for i in customer_ids if i}).values_list('id', flat=True))
+    if not ids:
+        return 0
+
+    bookings = {
+        row['customer_id']: row
+        for row in Booking.objects.filter(customer_id__in=ids).order_by().values('customer_id').annotate(
+            count=Count('id'),
+            spent=Sum('total_price'),
+            last=Max('created_at'),
+            active=Count('id', filter=Q(status__in=Booking.ACTIVE_STATUSES)),
+        )
+    }
+    services = dict(
+        ServiceBooking.objects.filter(customer_id__in=ids).order_by().values('customer_id').annotate(
+            spent=Sum('total_price')
+        ).values_list('customer_id', 'spent')
+    )
+
+    rows = []
+    for customer_id in ids:
+        row = bookings.get(customer_id, {})
+        rows.append(CustomerStats(
+            customer_id=customer_id,
+            booking_count=row.get('count', 0),
+            total_spent=row.get('spent') or 0,
+            last_booking_date=row.get('last'),
+            service_spent=services.get(customer_id) or 0,
+            is_active=bool(row.get('active')),
+        ))
+    CustomerStats.objects.bulk_create(
+        rows,
+        batch_size=REBUILD_BATCH,
+        update_conflicts=True,
+        unique_fields=['customer'],
+        update_fields=STATS_FIELDS,
+    )
+    return len(rows)
+
+
+def refresh_on_commit(customer_ids):
+    """
+    Пересчет после фиксации транзакции: при каскадном удалении клиента его бронирования
+    удаляются раньше самого клиента, и пересчет внутри транзакции вернул бы строку итогов
+    """
+    transaction.on_commit(partial(refresh_customers, set(customer_ids)))
+
+
+def rebuild_stats():
+    """Пересчитывает итоги всех клиентов пачками по REBUILD_BATCH. Возвращает число строк"""
+    total = 0
+    batch = []
+    for customer_id in Customer.objects.order_by('id').values_list('id', flat=True).iterator():
+        batch.append(customer_id)
+        if len(batch) >= REBUILD_BATCH:
+            total += refresh_customers(batch)
+            batch = []
+    if batch:
+        total += refresh_customers(batch)
+    return total
+
+
+def with_stats(customers):
+    """
+    Клиенты с полями итогов booking_count, total_spent, last_booking_date, service_spent.
+    Внутреннее соединение позволяет сортировке пройти по индексу CustomerStats
+    (поле, клиент) вместо агрегации всех бронирований
+    """
+    return customers.filter(stats__isnull=False).annotate(
+        booking_count=F('stats__booking_count'),
+        total_spent=F('stats__total_spent'),
+        last_booking_date=F('stats__last_booking_date'),
+        service_spent=F('stats__service_spent'),
+    )
+
+
+def paginate_customers(customers, page, per_page=CUSTOMERS_PAGE_SIZE):
+    return Paginator(customers, per_page).get_page(page)
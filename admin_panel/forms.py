@@ -3,6 +3,7 @@ from datetime import date
 from django import forms
 from django.core.exceptions import ValidationError
 
+from .room_search import search_rooms
 from .models import Room, RoomType, Customer, Booking, Payment
 
 
@@ -124,6 +125,15 @@ class BookingForm(forms.ModelForm):
         if available_rooms:
             self.fields['room'].queryset = available_rooms
 
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in_date = cleaned_data.get('check_in_date')
+        check_out_date = cleaned_data.get('check_out_date')
+        if check_in_date and check_out_date and check_in_date >= check_out_date:
+            # Ошибка поля снимает повторную проверку ограничения booking_check_out_after_check_in
+            self.add_error('check_out_date', 'Дата выезда должна быть позже даты заезда')
+        return cleaned_data
+
 
 class BookingEditForm(forms.ModelForm):
     class Meta:
@@ -171,7 +181,9 @@ class BookingEditForm(forms.ModelForm):
         today = date.today()
 
         if check_in_date and check_out_date and check_in_date >= check_out_date:
-            raise forms.ValidationError('Дата выезда должна быть позже даты заезда')
+            # Ошибка поля снимает повторную проверку ограничения booking_check_out_after_check_in
+            self.add_error('check_out_date', 'Дата выезда должна быть позже даты заезда')
+            return cleaned_data
 
         if 'check_in_date' in self.changed_data and check_in_date and check_in_date < today:
             self.add_error('check_in_date', 'Дата заезда не может быть в прошлом')
@@ -217,6 +229,108 @@ class SearchForm(forms.Form):
             'placeholder': 'Любая'
         })
     )
+    floor = forms.IntegerField(
+        label='Этаж',
+        required=False,
+        min_value=1,
+        max_value=10,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '1',
+            'max': '10',
+            'placeholder': 'Любой'
+        })
+    )
+    features = forms.CharField(
+        label='Особенности',
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Например: балкон вид на море'
+        })
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in')
+        check_out = cleaned_data.get('check_out')
+
+        if check_in and check_out:
+            if check_in >= check_out:
+                raise forms.ValidationError('Дата выезда должна быть позже даты заезда')
+            if check_in < date.today():
+                raise forms.ValidationError('Дата заезда не может быть в прошлом')
+
+        return cleaned_data
+
+    def search(self):
+        """Ранжированная выдача свободных номеров со всеми фильтрами формы"""
+        data = self.cleaned_data
+        return search_rooms(
+            data['check_in'],
+            data['check_out'],
+            room_type=data.get('room_type'),
+            capacity=data.get('capacity'),
+            floor=data.get('floor'),
+            features=data.get('features'),
+        )
+
+    def nights(self):
+        return (self.cleaned_data['check_out'] - self.cleaned_data['check_in']).days
+
+
+class GroupBookingForm(forms.Form):
+    MAX_ROOMS = 100
+    STATUS_CHOICES = [
+        ('awaiting_payment', 'Ожидает оплаты'),
+        ('confirmed', 'Подтверждено'),
+    ]
+
+    customer = forms.ModelChoiceField(
+        queryset=Customer.objects.order_by('last_name', 'first_name'),
+        label='Клиент / контактное лицо группы',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    check_in = forms.DateField(
+        label='Дата заезда',
+        input_formats=['%Y-%m-%d'],
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d')
+    )
+    check_out = forms.DateField(
+        label='Дата выезда',
+        input_formats=['%Y-%m-%d'],
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d')
+    )
+    room_type = forms.ModelChoiceField(
+        queryset=RoomType.objects.all(),
+        label='Тип номера',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    rooms_count = forms.IntegerField(
+        label='Количество номеров',
+        required=False,
+        min_value=1,
+        max_value=MAX_ROOMS,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': '1'})
+    )
+    rooms = forms.ModelMultipleChoiceField(
+        queryset=Room.objects.select_related('room_type').order_by('floor', 'room_number'),
+        label='Или конкретные номера',
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 10})
+    )
+    status = forms.ChoiceField(
+        choices=STATUS_CHOICES,
+        label='Статус',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    special_requests = forms.CharField(
+        label='Особые пожелания',
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3})
+    )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -229,4 +343,27 @@ class SearchForm(forms.Form):
             if check_in < date.today():
                 raise forms.ValidationError('Дата заезда не может быть в прошлом')
 
-        return cleaned_data
\ No newline at end of file
+        rooms = cleaned_data.get('rooms')
+        if rooms:
+            if len(rooms) > self.MAX_ROOMS:
+                raise forms.ValidationError(f'Не более {self.MAX_ROOMS} номеров в одной группе')
+        elif not (cleaned_data.get('room_type') and cleaned_data.get('rooms_count')):
+            raise forms.ValidationError('Выберите номера списком или укажите тип номера и количество')
+
+        return cleaned_data
+
+
+class BookingMoveForm(forms.Form):
+    """Перенос бронирования с шахматки: новый номер, даты и версия, которую видел пользователь"""
+    room = forms.ModelChoiceField(queryset=Room.objects.select_related('room_type').exclude(status='maintenance'))
+    check_in = forms.DateField(input_formats=['%Y-%m-%d'])
+    check_out = forms.DateField(input_formats=['%Y-%m-%d'])
+    version = forms.IntegerField(min_value=1)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in')
+        check_out = cleaned_data.get('check_out')
+        if check_in and check_out and check_in >= check_out:
+            raise forms.ValidationError('Дата выезда должна быть позже даты заезда')
+        return cleaned_data
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from .models import Booking, RoomNight
+
+
+def iter_nights(check_in, check_out):
+    """Ночи проживания в полуинтервале [check_in, check_out)"""
+    cur = check_in
+    while cur < check_out:
+        yield cur
+        cur += timedelta(days=1)
+
+
+def _booking_nights(booking_id, room_id, check_in, check_out):
+    return [RoomNight(room_id=room_id, date=d, booking_id=booking_id)
+            for d in iter_nights(check_in, check_out)]
+
+
+def sync_booking_nights(booking):
+    """
+    Приводит журнал занятости в соответствие с одним бронированием.
+    Ночь, уже занятая в журнале другим бронированием, не пропускается молча:
+    IntegrityError по room_night_unique откатывает сохранение бронирования
+    """
+    if (booking.status not in Booking.ACTIVE_STATUSES
+            or not booking.check_in_date or not booking.check_out_date):
+        RoomNight.objects.filter(booking_id=booking.pk).delete()
+        return
+
+    with transaction.atomic():
+        # Убираем ночи, которые больше не входят в бронирование (смена дат или комнаты)
+        RoomNight.objects.filter(booking_id=booking.pk).exclude(
+            room_id=booking.room_id,
+            date__gte=booking.check_in_date,
+            date__lt=booking.check_out_date,
+        ).delete()
+        # Вставляются только недостающие ночи этого бронирования
+        existing = set(RoomNight.objects.filter(booking_id=booking.pk).values_list('date', flat=True))
+        RoomNight.objects.bulk_create([
+            night for night in _booking_nights(booking.pk, booking.room_id, booking.check_in_date, booking.check_out_date)
+            if night.date not in existing
+        ])
+
+
+def add_bookings_nights(bookings):
+    """Добавляет в журнал ночи новых бронирований, созданных пакетно; занятая ночь — IntegrityError"""
+    nights = []
+    for booking in bookings:
+        if booking.status in Booking.ACTIVE_STATUSES:
+            nights.extend(_booking_nights(booking.pk, booking.room_id, booking.check_in_date, booking.check_out_date))
+    RoomNight.objects.bulk_create(nights, batch_size=5000)
+
+
+def replace_bookings_nights(bookings):
+    """Переписывает ночи бронирований, пакетно переселенных в другие номера"""
+    with transaction.atomic():
+        # Сначала удаляем все старые ночи: при обмене номерами новые строки заняли бы чужие (room, date)
+        RoomNight.objects.filter(booking_id__in=[b.pk for b in bookings]).delete()
+        add_bookings_nights(bookings)
+
+
+def occupied_rooms_filter(check_in, check_out):
+    """Условие «номер занят хотя бы одну ночь в [check_in, check_out)» для Room-запросов"""
+    return Exists(RoomNight.objects.filter(
+        room_id=OuterRef('pk'),
+        date__gte=check_in,
+        date__lt=check_out,
+    ))
+
+
+def _active_bookings():
+    return Booking.objects.filter(
+        status__in=Booking.ACTIVE_STATUSES,
+        check_out_date__gt=F('check_in_date'),
+    ).values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+
+
+def rebuild_ledger(batch_size=5000):
+    """
+    Полностью пересобирает журнал занятости по таблице Booking. Возвращает число ночей.
+    Пересекающиеся активные бронирования одного номера не скрываются — пересборка падает с IntegrityError
+    """
+    total = 0
+    with transaction.atomic():
+        RoomNight.objects.all().delete()
+        batch = []
+        for booking_id, room_id, check_in, check_out in _active_bookings().iterator():
+            batch.extend(_booking_nights(booking_id, room_id, check_in, check_out))
+            if len(batch) >= batch_size:
+                RoomNight.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            RoomNight.objects.bulk_create(batch)
+            total += len(batch)
+    return total
+
+
+def find_ledger_drift():
+    """
+    Сравнивает журнал занятости с бронированиями.
+    Возвращает (missing, extra): ночи, которых нет в журнале, и лишние строки журнала
+    """
+    expected = set()
+    for booking_id, room_id, check_in, check_out in _active_bookings().iterator():
+        for d in iter_nights(check_in, check_out):
+            expected.add((room_id, d, booking_id))
+
+    actual = set(RoomNight.objects.values_list('room_id', 'date', 'booking_id').iterator())
+
+    missing = sorted(expected - actual)
+    extra = sorted(actual - expected)
+    return missing, extra
@@ -0,0 +1,161 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+BOOKINGS_PAGE_SIZE = 50
+# Оценка числа строк кэшируется: счетчик над списком не пересчитывается на каждой странице
+COUNT_TIMEOUT = 5 * 60
+# До этого числа (по оценке планировщика) строки считаются точно, дальше показывается оценка
+EXACT_COUNT_LIMIT = 10000
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации: строки и курсоры соседних страниц.
+    Стоимость страницы не зависит от ее номера — запрос начинается с ключа последней строки,
+    а не пропускает OFFSET строк
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def fingerprint(params):
+    """Отпечаток фильтров и сортировки: курсор от другого набора фильтров не применяется"""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
+def _value(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    return obj.isoformat() if hasattr(obj, 'isoformat') else str(obj)
+
+
+def encode_cursor(obj, fields, direction, params_fingerprint):
+    raw = json.dumps({'v': [_value(obj, field) for field in fields], 'id': obj.pk, 'd': direction,
+                      'f': params_fingerprint})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, params_fingerprint):
+    """{'v', 'id', 'd'} или None для пустого, поврежденного или чужого курсора"""
+    if not cursor:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if position['f'] != params_fingerprint or position['d'] not in ('next', 'prev'):
+            return None
+        if not isinstance(position['v'], list):
+            return None
+        position['id'] = int(position['id'])
+        return position
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _after(fields, values, op, pk):
+    """Ключ (поля..., id) строго после (values..., pk): первое поле op, либо оно равно и дальше так же"""
+    condition = Q(**{f'id__{op}': pk})
+    for field, value in reversed(list(zip(fields, values))):
+        condition = Q(**{f'{field}__{op}': value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+def paginate(queryset, sort, cursor, params, per_page=BOOKINGS_PAGE_SIZE, tiebreakers=()):
+    """
+    Keyset-пагинация queryset по полю sort ('поле' или '-поле') с id для однозначного порядка.
+    Строка после курсора: (поле, id) строго больше (или меньше при убывании) ключа курсора —
+    такое условие обслуживает составной индекс (поле, id). tiebreakers — поля между sort и id:
+    для сортировки по полю связанной таблицы это ее ключ, тогда начало порядка совпадает
+    с индексом (поле, id) той таблицы. Назад идем в обратном порядке и переворачиваем страницу
+    """
+    field = sort.lstrip('-')
+    fields = [field, *tiebreakers]
+    descending = sort.startswith('-')
+    params_fingerprint = fingerprint({**params, 'sort': sort})
+    position = decode_cursor(cursor, params_fingerprint)
+    if position and len(position['v']) != len(fields):
+        position = None
+    backwards = bool(position) and position['d'] == 'prev'
+
+    reverse = descending != backwards
+    prefix = '-' if reverse else ''
+    rows = queryset.order_by(*(f'{prefix}{name}' for name in [*fields, 'id']))
+    if position:
+        op = 'lt' if reverse else 'gt'
+        try:
+            rows = rows.filter(_after(fields, position['v'], op, position['id']))
+        except (ValidationError, ValueError):
+            # Значение ключа не подходит полю — начинаем с первой страницы
+            position, backwards = None, False
+            order = '-' if descending else ''
+            rows = queryset.order_by(*(f'{order}{name}' for name in [*fields, 'id']))
+
+    rows = list(rows[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = backwards or more
+    has_previous = more if backwards else bool(position)
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], fields, 'next', params_fingerprint) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], fields, 'prev', params_fingerprint) if has_previous else None,
+    )
+
+
+def _estimate(queryset):
+    """Оценка числа строк по плану запроса — без чтения самих строк"""
+    sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', sql_params)
+        plan = db_cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_count(queryset, params):
+    """
+    Число строк для подписи над списком: (число, точное ли) с кэшем на COUNT_TIMEOUT.
+    Небольшие выборки считаются COUNT(*), крупные — оценкой планировщика
+    """
+    key = f'keyset_count:{fingerprint(params)}'
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    estimate = _estimate(queryset)
+    result = (queryset.order_by().count(), True) if estimate <= EXACT_COUNT_LIMIT else (estimate, False)
+    cache.set(key, result, COUNT_TIMEOUT)
+    return result
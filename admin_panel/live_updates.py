@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from django.db import transaction
+
+# Очередь одного клиента; отставшему клиенту вместо потерянных событий отправляется resync
+CLIENT_QUEUE_SIZE = 256
+# Комментарий-пинг держит соединение открытым через прокси
+KEEPALIVE_SECONDS = 15
+
+RESYNC = {'type': 'resync'}
+
+
+class Broker:
+    """
+    Брокер событий шахматки внутри процесса (для одного узла).
+    publish() можно вызывать из любого потока: событие передается в event loop каждого подписчика
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    @property
+    def clients(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        event_id = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event_id, event)
+            except RuntimeError:
+                # Loop клиента уже закрыт
+                self.unsubscribe(queue)
+        return event_id
+
+
+def _deliver(queue, event_id, event):
+    try:
+        queue.put_nowait((event_id, event))
+    except asyncio.QueueFull:
+        # Клиент не успевает читать: очищаем очередь и просим перечитать шахматку целиком
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait((event_id, RESYNC))
+
+
+broker = Broker()
+
+
+def booking_payload(booking):
+    customer = booking.customer
+    return {
+        'id': booking.pk,
+        'room_id': booking.room_id,
+        'customer_id': booking.customer_id,
+        'customer': [customer.last_name, customer.first_name],
+        'status': booking.status,
+        'status_display': booking.get_status_display(),
+        'check_in': booking.check_in_date.isoformat(),
+        'check_out': booking.check_out_date.isoformat(),
+        'version': booking.version,
+    }
+
+
+def booking_event(kind, booking, previous=None):
+    """
+    Дифф сегмента шахматки: created, moved, status, updated или deleted.
+    previous — прежние номер и даты, чтобы клиент снял старый сегмент
+    """
+    event = {'type': kind, 'booking': booking_payload(booking)}
+    if previous:
+        event['previous'] = {
+            'room_id': previous['room_id'],
+            'check_in': previous['check_in_date'].isoformat(),
+            'check_out': previous['check_out_date'].isoformat(),
+        }
+    return event
+
+
+def deleted_event(booking):
+    # Клиент мог быть удален каскадом вместе с бронированием — отправляем только то, что есть в строке
+    return {'type': 'deleted', 'booking': {
+        'id': booking.pk,
+        'room_id': booking.room_id,
+        'check_in': booking.check_in_date.isoformat(),
+        'check_out': booking.check_out_date.isoformat(),
+    }}
+
+
+def publish_on_commit(event):
+    # Клиенты должны получать только зафиксированные изменения
+    transaction.on_commit(lambda: broker.publish(event))
+
+
+def format_sse(event_id, event):
+    return f'id: {event_id}\nevent: {event["type"]}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n'
+
+
+async def stream(queue):
+    """Поток Server-Sent Events для одного клиента; подписка снимается при отключении"""
+    try:
+        yield f'retry: 3000\n: {broker.clients} clients\n\n'
+        while True:
+            try:
+                event_id, event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_sse(event_id, event)
+    finally:
+        broker.unsubscribe(queue)
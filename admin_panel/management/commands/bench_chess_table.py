@@ -0,0 +1,213 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import render_to_string
+
+from admin_panel.chess_table import CUSTOMER_COLORS, STATUS_SHORT, build_grid
+from admin_panel.models import Booking, Customer, Room, RoomType
+
+# Прежний вариант строк шахматки: две цепочки get_item на каждую ячейку «номер × дата»
+LEGACY_ROWS_TEMPLATE = '''{% load custom_filters %}
+    {% regroup rooms by floor as floors_list %}
+    {% for floor_group in floors_list %}
+
+    <!-- Заголовок этажа -->
+    <tr class="floor-header-row">
+        <td class="floor-label sticky-col" colspan="{{ date_range|length|add:1 }}">
+            🏢 {{ floor_group.grouper }} этаж
+        </td>
+    </tr>
+
+    {% for room in floor_group.list %}
+    <tr class="room-row" data-room-id="{{ room.id }}">
+        <!-- Ячейка с описанием номера -->
+        <td class="room-info-cell sticky-col">
+            <div class="room-number">{{ room.room_number }}</div>
+            <div class="room-meta">
+                <span>{{ room.room_type.name }}</span>
+                <span class="room-price">{{ room.room_type.price_per_night }} ₽</span>
+            </div>
+            <span class="room-status-badge status-{{ room.status }}">{{ room.get_status_display }}</span>
+        </td>
+
+        {% for date in date_range %}
+        {% with date_str=date|date:"Y-m-d" %}
+
+        {# Получаем бронирование на эту дату для этой комнаты #}
+        {% with cell=schedule_map|get_item:room.id|get_item:date_str %}
+        {% with span=booking_spans|get_item:room.id|get_item:date_str %}
+{% if span %}
+            {# Первый день бронирования — рисуем широкую ячейку #}
+            <td class="day-cell booking-cell {% if date.weekday >= 5 %}weekend-day{% endif %}"
+                colspan="{{ span }}"
+                data-room="{{ room.id }}"
+                data-date="{{ date_str }}"
+                title="{{ cell.customer_name }} | {{ cell.check_in|date:'d.m.Y' }} — {{ cell.check_out|date:'d.m.Y' }} | {{ cell.status_display }}">
+                <a href="{% url 'booking_edit' pk=cell.booking_id %}?next=chess_table" >
+                <div class="booking-segment-span"
+                     style="background: linear-gradient(135deg, {{ cell.color }}33, {{ cell.color }}18); border-left: 4px solid {{ cell.color }}; border-right: 2px solid {{ cell.color }}55;">
+                    <div class="seg-name" style="color: {{ cell.color_dark }};">
+                        {{ cell.customer_last_name }} {{ cell.customer_first_name }}
+                    </div>
+                    <div class="seg-dates" style="color: {{ cell.color_dark }}99;">
+                        {{ cell.check_in|date:'d.m' }} — {{ cell.check_out|date:'d.m' }}
+                    </div>
+                    <div class="seg-status">{{ cell.status_display }}</div>
+                </div>
+                    </a>
+            </td>
+        {% elif cell %}
+            {# Середина бронирования — ячейка уже занята colspan, пропускаем #}
+        {% else %}
+            {# Свободная ячейка #}
+            <td class="day-cell {% if date.weekday >= 5 %}weekend-day{% endif %}"
+                data-room="{{ room.id }}"
+                data-date="{{ date_str }}"></td>
+        {% endif %}
+
+        {% endwith %}
+        {% endwith %}
+        {% endwith %}
+        {% endfor %}
+    </tr>
+    {% endfor %}
+    {% empty %}
+    <tr>
+        <td colspan="{{ date_range|length|add:1 }}" class="empty-state">
+            Нет номеров по выбранным фильтрам
+        </td>
+    </tr>
+    {% endfor %}
+'''
+
+
+def legacy_maps(bookings, start_date, end_date, customer_colors):
+    """Прежняя подготовка данных: словари room_id → 'YYYY-MM-DD' со strftime на каждый день брони"""
+    schedule_map = {}
+    booking_spans = {}
+    for b in bookings:
+        light, dark = customer_colors[b.customer.id]
+        seg_start = max(b.check_in_date, start_date)
+        seg_end = min(b.check_out_date - timedelta(days=1), end_date)
+        visible_dates = []
+        cur = seg_start
+        while cur <= seg_end:
+            visible_dates.append(cur)
+            cur += timedelta(days=1)
+        if not visible_dates:
+            continue
+        booking_dict = {
+            'room_id': b.room_id,
+            'customer_name': b.customer.get_full_name(),
+            'customer_last_name': b.customer.last_name,
+            'customer_first_name': b.customer.first_name,
+            'color': light,
+            'color_dark': dark,
+            'check_in': b.check_in_date,
+            'check_out': b.check_out_date,
+            'status_display': b.get_status_display(),
+            'status_short': STATUS_SHORT.get(b.status, b.status),
+            'total_price': b.total_price,
+            'booking_id': b.id,
+        }
+        for d in visible_dates:
+            schedule_map.setdefault(b.room_id, {})[d.strftime('%Y-%m-%d')] = booking_dict
+        booking_spans.setdefault(b.room_id, {})[visible_dates[0].strftime('%Y-%m-%d')] = len(visible_dates)
+    return schedule_map, booking_spans
+
+
+def synthetic_data(room_count, days, seed=0):
+    """Номера и бронирования в памяти, без обращений к БД"""
+    rng = random.Random(seed)
+    room_types = [
+        RoomType(id=i, name=name, price_per_night=Decimal(price), capacity=capacity)
+        for i, (name, price, capacity) in enumerate(
+            [('Стандарт', 3500, 2), ('Комфорт', 5200, 2), ('Семейный', 7400, 4), ('Люкс', 12000, 2)], start=1)
+    ]
+    rooms = []
+    for i in range(room_count):
+        room = Room(id=i + 1, room_number=str(100 + i), floor=i * 10 // room_count + 1, status='available')
+        room.room_type = room_types[i % len(room_types)]
+        rooms.append(room)
+    customers = [Customer(id=i + 1, first_name=f'Гость{i}', last_name=f'Фамилия{i}') for i in range(room_count * 2)]
+
+    start = date.today()
+    bookings = []
+    for room in rooms:
+        day = start - timedelta(days=rng.randint(0, 3))
+        while day < start + timedelta(days=days):
+            day += timedelta(days=rng.randint(0, 4))
+            nights = rng.randint(1, 7)
+            booking = Booking(
+                id=len(bookings) + 1,
+                check_in_date=day,
+                check_out_date=day + timedelta(days=nights),
+                status=rng.choice(['confirmed', 'checked_in', 'awaiting_payment', 'checked_out', 'cancelled']),
+                total_price=room.room_type.price_per_night * nights,
+            )
+            booking.room = room
+            booking.customer = rng.choice(customers)
+            bookings.append(booking)
+            day += timedelta(days=nights)
+    return rooms, bookings, start
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк шахматки: прежние get_item-поиски против готовой сетки (данные в памяти)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rooms, bookings, start_date = synthetic_data(options['rooms'], options['days'])
+        end_date = start_date + timedelta(days=options['days'] - 1)
+        date_range = [start_date + timedelta(days=i) for i in range(options['days'])]
+        date_range_rich = [
+            {'date': d, 'date_str': d.strftime('%Y-%m-%d'), 'is_weekend': d.weekday() >= 5}
+            for d in date_range
+        ]
+        customer_colors = {}
+        for b in bookings:
+            customer_colors.setdefault(b.customer.id, CUSTOMER_COLORS[len(customer_colors) % len(CUSTOMER_COLORS)])
+
+        legacy_template = Template(LEGACY_ROWS_TEMPLATE)
+
+        def legacy():
+            schedule_map, booking_spans = legacy_maps(bookings, start_date, end_date, customer_colors)
+            return legacy_template.render(Context({
+                'rooms': rooms,
+                'date_range': date_range,
+                'schedule_map': schedule_map,
+                'booking_spans': booking_spans,
+            }))
+
+        def precomputed():
+            grid = build_grid(rooms, bookings, date_range_rich, customer_colors)
+            return render_to_string('admin_panel/chess_table_rows.html', {
+                'grid': grid,
+                'date_range': date_range,
+            })
+
+        self.stdout.write(f'Номеров: {len(rooms)}, дней: {len(date_range)}, бронирований: {len(bookings)}')
+        results = {}
+        for name, func in (('get_item (до)', legacy), ('готовая сетка (после)', precomputed)):
+            func()  # прогрев: компиляция шаблонов
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                html = func()
+                timings.append(time.perf_counter() - started)
+            results[name] = statistics.median(timings)
+            cells = html.count('class="day-cell')
+            self.stdout.write(
+                f'{name:<24} медиана {results[name] * 1000:8.1f} мс, ячеек {cells}, {len(html) // 1024} КБ'
+            )
+        before, after = results.values()
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: ×{before / after:.1f}'))
@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from admin_panel.customer_profile import PROFILE_QUERIES, build_profile
+from admin_panel.models import Customer, CustomerStats
+from admin_panel.views import customer_detail
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Замер карточки клиента: число запросов сборки профиля не должно расти с числом проживаний, '
+            'время ответа customer_detail — укладываться в бюджет')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, help='id клиента (по умолчанию клиент с наибольшим числом бронирований)')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--budget-ms', type=float, default=50, help='Бюджет на p95 ответа, мс')
+
+    def handle(self, *args, **options):
+        customer_id = options['customer']
+        if customer_id is None:
+            customer_id = CustomerStats.objects.order_by('-booking_count', 'customer').values_list(
+                'customer', flat=True
+            ).first()
+        customer = Customer.objects.filter(pk=customer_id).first() if customer_id else None
+        if customer is None:
+            raise CommandError('Клиент не найден')
+
+        with CaptureQueriesContext(connection) as queries:
+            profile = build_profile(customer)
+        self.stdout.write(f'Клиент {customer.pk}: бронирований {profile["total_bookings"]}, '
+                          f'записей на услуги {profile["total_service_bookings"]}')
+        self.stdout.write(f'Запросов на сборку профиля: {len(queries)} (допустимо {PROFILE_QUERIES})')
+        if len(queries) > PROFILE_QUERIES:
+            for query in queries.captured_queries:
+                self.stdout.write(query['sql'])
+            raise CommandError(f'Сборка профиля выполнила {len(queries)} запросов вместо {PROFILE_QUERIES}')
+
+        request = RequestFactory().get(reverse('customer_detail', args=[customer.pk]))
+        request.user = AnonymousUser()
+        customer_detail(request, customer.pk)  # прогрев: компиляция шаблона
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = customer_detail(request, customer.pk)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f'Ответ, мс: медиана {statistics.median(timings):.1f}, p95 {_percentile(timings, 0.95):.1f}; '
+                          f'запросов {len(queries)}, {len(response.content) // 1024} КБ')
+
+        if _percentile(timings, 0.95) > options['budget_ms']:
+            raise CommandError(f'p95 {_percentile(timings, 0.95):.1f} мс превышает бюджет {options["budget_ms"]} мс')
+        self.stdout.write(self.style.SUCCESS('Карточка клиента укладывается в бюджет'))
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Код, который выполняет каждый воркер при старте: настройка Django и загрузка всех маршрутов
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(f'{(time.perf_counter() - started) * 1000:.1f}')
+'''
+
+HEAVY_MODULES = ['pandas', 'numpy', 'reportlab', 'openpyxl']
+
+
+def _parse_importtime(lines):
+    """Дерево импортов из вывода python -X importtime: [{'name', 'self', 'cumulative', 'children'}]"""
+    pending = defaultdict(list)
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.split('|', 2)
+        self_us = self_us.replace('import time:', '')
+        name = name[1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        node = {
+            'name': name.strip(),
+            'self': int(self_us),
+            'cumulative': int(cumulative_us),
+            'children': pending.pop(level + 1, []),
+        }
+        pending[level].append(node)
+    return pending.get(0, [])
+
+
+def _attribute(nodes, owners, owner=None, totals=None):
+    """Собственное время модулей, отнесенное к приложению, которое первым их импортировало"""
+    totals = defaultdict(int) if totals is None else totals
+    for node in nodes:
+        top = node['name'].split('.')[0]
+        node_owner = top if top in owners else owner
+        totals[node_owner or 'django и прочее'] += node['self']
+        _attribute(node['children'], owners, node_owner, totals)
+    return totals
+
+
+def _heavy(nodes, found=None):
+    """Самые внешние импорты тяжелых библиотек: {библиотека: суммарное время в мкс}"""
+    found = defaultdict(int) if found is None else found
+    for node in nodes:
+        top = node['name'].split('.')[0]
+        if top in HEAVY_MODULES:
+            found[top] += node['cumulative']
+        else:
+            _heavy(node['children'], found)
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Замер времени холодного старта: в отдельном процессе выполняются django.setup() и загрузка '
+            'маршрутов, время импорта раскладывается по приложениям. Команда завершается ошибкой, '
+            'если превышен бюджет или при старте загружены запрещенные тяжелые библиотеки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, default=1500, help='Бюджет на весь старт, мс')
+        parser.add_argument('--app-budget-ms', type=float, default=None,
+                            help='Бюджет на импорт модулей одного приложения, мс')
+        parser.add_argument('--forbid', default='pandas,reportlab,openpyxl',
+                            help='Библиотеки, которые не должны загружаться при старте (через запятую)')
+        parser.add_argument('--runs', type=int, default=3, help='Запусков; в отчет идет самый быстрый')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        best = None
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f'Процесс старта завершился с ошибкой:\n{result.stderr[-2000:]}')
+            total_ms = float(result.stdout.strip().splitlines()[-1])
+            if best is None or total_ms < best[0]:
+                best = (total_ms, result.stderr.splitlines())
+
+        total_ms, lines = best
+        tree = _parse_importtime(lines)
+        owners = {config.name.split('.')[0] for config in apps.get_app_configs()
+                  if not config.name.startswith('django.')}
+        per_app = _attribute(tree, owners)
+        heavy = _heavy(tree)
+
+        self.stdout.write(f'Старт (setup + маршруты): {total_ms:.1f} мс, бюджет {options["budget_ms"]:.0f} мс')
+        self.stdout.write('Импорт по приложениям:')
+        for name, us in sorted(per_app.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {name:<24} {us / 1000:8.1f} мс')
+        self.stdout.write('Тяжелые библиотеки:')
+        for name in HEAVY_MODULES:
+            loaded = f'{heavy[name] / 1000:.1f} мс' if name in heavy else 'не загружена'
+            self.stdout.write(f'  {name:<24} {loaded}')
+
+        problems = []
+        if total_ms > options['budget_ms']:
+            problems.append(f'старт занял {total_ms:.1f} мс при бюджете {options["budget_ms"]:.0f} мс')
+        if options['app_budget_ms'] is not None:
+            for name, us in per_app.items():
+                if name in owners and us / 1000 > options['app_budget_ms']:
+                    problems.append(f'импорт {name} занял {us / 1000:.1f} мс')
+        forbidden = [name.strip() for name in options['forbid'].split(',') if name.strip()]
+        problems += [f'при старте загружена {name}' for name in forbidden if name in heavy]
+        if problems:
+            raise CommandError('Бюджет старта превышен: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Старт укладывается в бюджет'))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from admin_panel import live_updates
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка живых обновлений шахматки: клиенты подключаются к api/chess/events/ '
+            'через ASGI-приложение в этом процессе, брокер рассылает события из отдельного потока, '
+            'замеряются задержка доставки и потери')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--events', type=int, default=200, help='Сколько событий разослать')
+        parser.add_argument('--rate', type=float, default=50, help='Событий в секунду')
+        parser.add_argument('--timeout', type=float, default=10, help='Секунд на подключение и доставку')
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self._run(options))
+        expected = options['clients'] * options['events']
+        latencies = [latency for client in results for latency in client['latencies'].values()]
+        lost = expected - len(latencies)
+        resyncs = sum(client['resyncs'] for client in results)
+        failed = [client['status'] for client in results if client['status'] != 200]
+
+        self.stdout.write(f'Клиентов: {options["clients"]}, событий: {options["events"]}, '
+                          f'ожидалось доставок: {expected}')
+        self.stdout.write(f'Доставлено: {len(latencies)}, потеряно: {lost}, resync: {resyncs}')
+        if latencies:
+            ms = [latency * 1000 for latency in latencies]
+            self.stdout.write(f'Задержка, мс: медиана {statistics.median(ms):.2f}, '
+                              f'p95 {_percentile(ms, 0.95):.2f}, макс {max(ms):.2f}')
+        if failed:
+            raise CommandError(f'Не удалось подключить клиентов: {len(failed)} (статусы {sorted(set(failed))})')
+        if lost:
+            raise CommandError(f'Потеряно событий: {lost}')
+        self.stdout.write(self.style.SUCCESS('Все события доставлены всем клиентам'))
+
+    async def _run(self, options):
+        app = get_asgi_application()
+        path = reverse('api_chess_events')
+        stop = asyncio.Event()
+        results = [{'status': None, 'latencies': {}, 'resyncs': 0} for _ in range(options['clients'])]
+        tasks = [asyncio.create_task(self._client(app, path, result, stop)) for result in results]
+
+        deadline = time.perf_counter() + options['timeout']
+        while live_updates.broker.clients < options['clients'] and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+        # Сигналы моделей публикуют события из потоков запросов — так же делает и тест
+        await asyncio.to_thread(self._publish, options['events'], options['rate'])
+
+        deadline = time.perf_counter() + options['timeout']
+        while time.perf_counter() < deadline and any(
+                len(r['latencies']) + r['resyncs'] < options['events'] for r in results if r['status'] == 200):
+            await asyncio.sleep(0.05)
+
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+    @staticmethod
+    def _publish(count, rate):
+        for seq in range(count):
+            live_updates.broker.publish({'type': 'loadtest', 'seq': seq, 'sent': time.perf_counter()})
+            time.sleep(1 / rate)
+
+    @staticmethod
+    async def _client(app, path, result, stop):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        requested = False
+        buffer = ''
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await stop.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal buffer
+            if message['type'] == 'http.response.start':
+                result['status'] = message['status']
+                return
+            buffer += message.get('body', b'').decode()
+            while '\n\n' in buffer:
+                block, buffer = buffer.split('\n\n', 1)
+                for line in block.splitlines():
+                    if not line.startswith('data: '):
+                        continue
+                    event = json.loads(line[len('data: '):])
+                    if event['type'] == 'loadtest':
+                        result['latencies'][event['seq']] = time.perf_counter() - event['sent']
+                    elif event['type'] == 'resync':
+                        result['resyncs'] += 1
+
+        await app(scope, receive, send)
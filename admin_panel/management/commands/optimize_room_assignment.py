@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.models import RoomType
+from admin_panel.reservations import ReservationConflict
+from admin_panel.room_assignment import PLAN_DAYS, AssignmentError, apply_plan, plan_room_type
+
+
+class Command(BaseCommand):
+    help = ('Уплотняет шахматку: перекладывает будущие бронирования внутри типа номера, '
+            'чтобы свободные ночи шли подряд. Без --apply только показывает план')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-type', type=int, help='id типа номера (по умолчанию все типы)')
+        parser.add_argument('--days', type=int, default=PLAN_DAYS, help='Горизонт оценки фрагментации')
+        parser.add_argument('--apply', action='store_true', help='Применить план')
+
+    def handle(self, *args, **options):
+        room_types = RoomType.objects.order_by('name')
+        if options['room_type']:
+            room_types = room_types.filter(pk=options['room_type'])
+            if not room_types:
+                raise CommandError(f'Тип номера {options["room_type"]} не найден')
+
+        for room_type in room_types:
+            started = time.time()
+            try:
+                if options['apply']:
+                    plan = apply_plan(room_type, days=options['days'])
+                else:
+                    plan = plan_room_type(room_type, days=options['days'])
+            except (AssignmentError, ReservationConflict) as e:
+                self.stderr.write(f'{room_type.name}: {e}')
+                continue
+            elapsed = time.time() - started
+
+            before, after = plan['before'], plan['after']
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{room_type.name} ({elapsed:.2f} с)'))
+            self.stdout.write(
+                f'  Короткие окна: {before["short_gaps"]} → {after["short_gaps"]}, '
+                f'ночей в них: {before["short_gap_nights"]} → {after["short_gap_nights"]}, '
+                f'самый длинный свободный отрезок: {before["longest_free_run"]} → {after["longest_free_run"]} дн.'
+            )
+            for move in plan['moves']:
+                self.stdout.write(
+                    f'  №{move["booking_id"]} {move["check_in"]:%d.%m}–{move["check_out"]:%d.%m}: '
+                    f'{move["from_room"]} → {move["to_room"]}'
+                )
+            verb = 'Переселено' if options['apply'] else 'К переселению'
+            self.stdout.write(self.style.SUCCESS(f'  {verb}: {len(plan["moves"])}'))
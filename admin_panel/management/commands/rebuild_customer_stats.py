@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.customer_stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги клиентов (CustomerStats) по бронированиям и записям на услуги'
+
+    def handle(self, *args, **options):
+        total = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f'Итоги клиентов пересчитаны: {total} строк'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from admin_panel.inventory import find_ledger_drift, rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает журнал занятости номеров (RoomNight) по бронированиям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только сравнить журнал с бронированиями, ничего не меняя')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Сколько расхождений выводить')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            missing, extra = find_ledger_drift()
+            limit = options['limit']
+            for room_id, night, booking_id in missing[:limit]:
+                self.stdout.write(f'Нет в журнале: комната {room_id}, ночь {night}, бронирование {booking_id}')
+            for room_id, night, booking_id in extra[:limit]:
+                self.stdout.write(f'Лишняя запись: комната {room_id}, ночь {night}, бронирование {booking_id}')
+            if missing or extra:
+                raise CommandError(f'Расхождения журнала: отсутствует {len(missing)}, лишних {len(extra)}')
+            self.stdout.write(self.style.SUCCESS('Журнал занятости совпадает с бронированиями'))
+            return
+
+        try:
+            total = rebuild_ledger()
+        except IntegrityError as e:
+            raise CommandError(f'Активные бронирования одного номера пересекаются, журнал не изменен: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Журнал пересобран: {total} ночей'))
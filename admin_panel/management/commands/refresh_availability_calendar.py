@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.availability_calendar import rebuild_calendar
+
+
+class Command(BaseCommand):
+    help = 'Сдвигает календарь доступности на сегодня и пересчитывает его (запускать раз в сутки)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_calendar()
+        self.stdout.write(self.style.SUCCESS(f'Календарь доступности обновлен: {rows} строк'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.pricing import rebuild_rates
+
+
+class Command(BaseCommand):
+    help = 'Сдвигает календарь цен на сегодня и пересчитывает его (запускать раз в сутки)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rates()
+        self.stdout.write(self.style.SUCCESS(f'Календарь цен обновлен: {rows} строк'))
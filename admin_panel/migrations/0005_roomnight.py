@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+ACTIVE_STATUSES = ['confirmed', 'checked_in', 'awaiting_payment']
+
+
+def fill_room_nights(apps, schema_editor):
+    Booking = apps.get_model('admin_panel', 'Booking')
+    RoomNight = apps.get_model('admin_panel', 'RoomNight')
+    active = Booking.objects.filter(status__in=ACTIVE_STATUSES)
+
+    # Ночь номера может принадлежать только одному бронированию: пересечения не пропускаются
+    # молча (журнал начался бы с потерянными ночами), а останавливают миграцию со списком бронирований
+    overlapping = active.filter(models.Exists(active.filter(
+        room_id=models.OuterRef('room_id'),
+        check_in_date__lt=models.OuterRef('check_out_date'),
+        check_out_date__gt=models.OuterRef('check_in_date'),
+    ).exclude(pk=models.OuterRef('pk')))).order_by('room_id', 'check_in_date')
+    conflicts = list(overlapping.values_list('id', flat=True))
+    if conflicts:
+        raise RuntimeError(
+            'Активные бронирования одного номера пересекаются по датам, id: '
+            f'{", ".join(map(str, conflicts))}. Отмените или перенесите их и повторите миграцию'
+        )
+
+    batch = []
+    bookings = active.values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+    for booking_id, room_id, check_in, check_out in bookings.iterator():
+        cur = check_in
+        while cur < check_out:
+            batch.append(RoomNight(room_id=room_id, date=cur, booking_id=booking_id))
+            cur += timedelta(days=1)
+        if len(batch) >= 5000:
+            RoomNight.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        RoomNight.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0004_delete_cleaningtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ночь')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='admin_panel.booking', verbose_name='Бронирование')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='admin_panel.room', verbose_name='Комната')),
+            ],
+            options={
+                'verbose_name': 'Ночь занятости',
+                'verbose_name_plural': 'Журнал занятости',
+                'indexes': [models.Index(fields=['date', 'room'], name='room_night_date_room_idx')],
+                'constraints': [models.UniqueConstraint(fields=('room', 'date'), name='room_night_unique')],
+            },
+        ),
+        migrations.RunPython(fill_room_nights, migrations.RunPython.noop),
+    ]
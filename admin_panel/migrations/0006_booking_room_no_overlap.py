@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+import admin_panel.models
+
+
+def repair_stay_dates(apps, schema_editor):
+    # daterange(заезд, выезд) с выездом раньше заезда — ошибка Postgres, и индекс не построится.
+    # Перепутанные даты меняются местами, проживание без ночей продлевается до одной ночи
+    Booking = apps.get_model('admin_panel', 'Booking')
+    for booking in Booking.objects.filter(check_out_date__lte=models.F('check_in_date')):
+        if booking.check_out_date < booking.check_in_date:
+            booking.check_in_date, booking.check_out_date = booking.check_out_date, booking.check_in_date
+        else:
+            booking.check_out_date = booking.check_in_date + timedelta(days=1)
+        booking.save(update_fields=['check_in_date', 'check_out_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0005_roomnight'),
+    ]
+
+    operations = [
+        # Нужно для оператора «=» по room_id внутри GiST-ограничения
+        BtreeGistExtension(),
+        migrations.RunPython(repair_stay_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GistIndex(
+                admin_panel.models.DateRange('check_in_date', 'check_out_date', django.contrib.postgres.fields.ranges.RangeBoundary()),
+                name='booking_stay_range_gist',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                condition=models.Q(('status__in', ['confirmed', 'checked_in', 'awaiting_payment'])),
+                expressions=[
+                    (admin_panel.models.DateRange('check_in_date', 'check_out_date', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'),
+                    ('room', '='),
+                ],
+                name='booking_room_no_overlap',
+            ),
+        ),
+    ]
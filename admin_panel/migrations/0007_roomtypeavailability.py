@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_booking_room_no_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomTypeAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('total_rooms', models.IntegerField(default=0, verbose_name='Номеров в продаже')),
+                ('booked_rooms', models.IntegerField(default=0, verbose_name='Занято')),
+                ('free_rooms', models.IntegerField(default=0, verbose_name='Свободно')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar', to='admin_panel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Доступность типа номера',
+                'verbose_name_plural': 'Календарь доступности',
+                'constraints': [models.UniqueConstraint(fields=('date', 'room_type'), name='room_type_availability_unique')],
+            },
+        ),
+    ]
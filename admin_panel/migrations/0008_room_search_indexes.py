@@ -0,0 +1,28 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_roomtypeavailability'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomtype',
+            index=models.Index(fields=['capacity', 'price_per_night'], name='room_type_capacity_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', 'room_type', 'floor'], name='room_status_type_floor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector('features', config='russian'),
+                name='room_features_search_gin',
+            ),
+        ),
+    ]
@@ -0,0 +1,71 @@
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0008_room_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Season',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('start_date', models.DateField(verbose_name='Начало')),
+                ('end_date', models.DateField(verbose_name='Окончание')),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, max_digits=5, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Коэффициент')),
+                ('room_type', models.ForeignKey(blank=True, help_text='Пусто — для всех типов', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='seasons', to='admin_panel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Сезон',
+                'verbose_name_plural': 'Сезоны',
+            },
+        ),
+        migrations.CreateModel(
+            name='WeekdayRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], verbose_name='День недели')),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, max_digits=5, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Коэффициент')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekday_rates', to='admin_panel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Коэффициент дня недели',
+                'verbose_name_plural': 'Коэффициенты дней недели',
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'weekday'), name='weekday_rate_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RateOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена за ночь')),
+                ('reason', models.CharField(blank=True, max_length=200, verbose_name='Причина')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_overrides', to='admin_panel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Ручная цена',
+                'verbose_name_plural': 'Ручные цены',
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'date'), name='rate_override_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена за ночь')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='admin_panel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Цена на дату',
+                'verbose_name_plural': 'Календарь цен',
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'date'), name='daily_rate_unique')],
+            },
+        ),
+    ]
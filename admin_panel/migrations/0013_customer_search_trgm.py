@@ -0,0 +1,31 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0012_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        django.db.models.functions.text.Concat(
+                            'last_name', models.Value(' '), 'first_name', models.Value(' '), 'phone',
+                            models.Value(' '), 'email', models.Value(' '), 'passport_number',
+                            output_field=models.TextField(),
+                        )
+                    ),
+                    name='gin_trgm_ops',
+                ),
+                name='customer_search_trgm',
+            ),
+        ),
+    ]
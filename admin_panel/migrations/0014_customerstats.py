@@ -0,0 +1,74 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_customer_stats(apps, schema_editor):
+    Customer = apps.get_model('admin_panel', 'Customer')
+    Booking = apps.get_model('admin_panel', 'Booking')
+    CustomerStats = apps.get_model('admin_panel', 'CustomerStats')
+    ServiceBooking = apps.get_model('service', 'ServiceBooking')
+
+    bookings = {
+        row['customer_id']: row
+        for row in Booking.objects.order_by().values('customer_id').annotate(
+            count=models.Count('id'),
+            spent=models.Sum('total_price'),
+            last=models.Max('created_at'),
+            active=models.Count('id', filter=models.Q(status__in=['confirmed', 'checked_in', 'awaiting_payment'])),
+        ).iterator()
+    }
+    services = dict(
+        ServiceBooking.objects.order_by().values('customer_id').annotate(
+            spent=models.Sum('total_price')
+        ).values_list('customer_id', 'spent').iterator()
+    )
+
+    batch = []
+    for customer_id in Customer.objects.order_by('id').values_list('id', flat=True).iterator():
+        row = bookings.get(customer_id, {})
+        batch.append(CustomerStats(
+            customer_id=customer_id,
+            booking_count=row.get('count', 0),
+            total_spent=row.get('spent') or 0,
+            last_booking_date=row.get('last'),
+            service_spent=services.get(customer_id) or 0,
+            is_active=bool(row.get('active')),
+        ))
+        if len(batch) >= 5000:
+            CustomerStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        CustomerStats.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0013_customer_search_trgm'),
+        ('service', '0004_servicespecialist_servicebooking_specialist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='admin_panel.customer', verbose_name='Клиент')),
+                ('booking_count', models.IntegerField(default=0, verbose_name='Бронирований')),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма бронирований')),
+                ('last_booking_date', models.DateTimeField(blank=True, null=True, verbose_name='Последнее бронирование')),
+                ('service_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма услуг')),
+                ('is_active', models.BooleanField(default=False, verbose_name='Есть активное бронирование')),
+            ],
+            options={
+                'verbose_name': 'Статистика клиента',
+                'verbose_name_plural': 'Статистика клиентов',
+                'indexes': [
+                    models.Index(fields=['booking_count', 'customer'], name='customer_stats_count_idx'),
+                    models.Index(fields=['total_spent', 'customer'], name='customer_stats_spent_idx'),
+                    models.Index(fields=['last_booking_date', 'customer'], name='customer_stats_last_idx'),
+                    models.Index(condition=models.Q(('is_active', True)), fields=['customer'], name='customer_stats_active_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_customer_stats, migrations.RunPython.noop),
+    ]
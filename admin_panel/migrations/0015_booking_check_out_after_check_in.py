@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def repair_stay_dates(apps, schema_editor):
+    # Как в 0006: до ограничения перепутанные даты меняются местами, проживание без ночей — одна ночь
+    Booking = apps.get_model('admin_panel', 'Booking')
+    for booking in Booking.objects.filter(check_out_date__lte=models.F('check_in_date')):
+        if booking.check_out_date < booking.check_in_date:
+            booking.check_in_date, booking.check_out_date = booking.check_out_date, booking.check_in_date
+        else:
+            booking.check_out_date = booking.check_in_date + timedelta(days=1)
+        booking.save(update_fields=['check_in_date', 'check_out_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0014_customerstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_stay_dates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(
+                condition=models.Q(('check_out_date__gt', models.F('check_in_date'))),
+                name='booking_check_out_after_check_in',
+                violation_error_message='Дата выезда должна быть позже даты заезда',
+            ),
+        ),
+    ]
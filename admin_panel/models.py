@@ -1,7 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVector
 from django.core.validators import (MinValueValidator,
                                     MaxValueValidator)
+from django.db.models.functions import Concat, Upper
 from datetime import date
 
 
@@ -10,6 +15,13 @@ class RoomType(models.Model):
     description = models.TextField(verbose_name="Описание")
     price_per_night = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена за ночь")
     capacity = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(8)], verbose_name="Вместимость")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        indexes = [
+            # Поиск номеров: фильтр по вместимости и сортировка по цене
+            models.Index(fields=['capacity', 'price_per_night'], name='room_type_capacity_price_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.capacity} чел.) - {self.price_per_night} руб./ночь"
@@ -27,11 +39,28 @@ class Room(models.Model):
     status = models.CharField(max_length=20, choices=ROOM_STATUS, default='available', verbose_name="Статус")
     floor = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)], verbose_name="Этаж")
     features = models.TextField(blank=True, null=True, verbose_name="Особенности")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'room_type', 'floor'], name='room_status_type_floor_idx'),
+            # Полнотекстовый поиск по особенностям (admin_panel.room_search.FEATURES_VECTOR)
+            GinIndex(SearchVector('features', config='russian'), name='room_features_search_gin'),
+        ]
 
     def __str__(self):
         return f"Комната {self.room_number} - {self.room_type.name}"
 
 
+def customer_search_document():
+    """Строка поиска клиента в верхнем регистре: ФИО, телефон, email и паспорт"""
+    return Upper(Concat(
+        'last_name', models.Value(' '), 'first_name', models.Value(' '), 'phone', models.Value(' '),
+        'email', models.Value(' '), 'passport_number',
+        output_field=models.TextField(),
+    ))
+
+
 class Customer(models.Model):
     first_name = models.CharField(max_length=100, verbose_name="Имя")
     last_name = models.CharField(max_length=100, verbose_name="Фамилия")
@@ -40,6 +69,14 @@ class Customer(models.Model):
     passport_number = models.CharField(max_length=50, verbose_name="Номер паспорта")
     birthday = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Сортировка по фамилии: список клиентов (фамилия, id) и список бронирований (фамилия, id клиента, id)
+            models.Index(fields=['last_name', 'id'], name='customer_last_name_id_idx'),
+            # Поиск по подстроке ФИО, телефона, email и паспорта (admin_panel.customer_search.CUSTOMER_DOCUMENT)
+            GinIndex(OpClass(customer_search_document(), name='gin_trgm_ops'), name='customer_search_trgm'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -54,6 +91,24 @@ class Customer(models.Model):
         return None
 
 
+class DateRange(models.Func):
+    """daterange(начало, конец, '[)') — период проживания в виде диапазона Postgres"""
+    function = 'DATERANGE'
+    output_field = DateRangeField()
+
+
+def stay_range():
+    return DateRange('check_in_date', 'check_out_date', RangeBoundary())
+
+
+class BookingQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """Бронирования, пересекающиеся с [start, end); использует GiST-индекс по периоду"""
+        return self.alias(stay=stay_range()).filter(
+            stay__overlap=DateRange(models.Value(start), models.Value(end), RangeBoundary())
+        )
+
+
 class Booking(models.Model):
     BOOKING_STATUS = [
         ('confirmed', 'Подтверждено'),
@@ -63,6 +118,9 @@ class Booking(models.Model):
         ('cancelled', 'Отменено'),
     ]
 
+    # Статусы, при которых бронирование занимает номер
+    ACTIVE_STATUSES = ['confirmed', 'checked_in', 'awaiting_payment']
+
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, verbose_name="Клиент")
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name="Комната")
     check_in_date = models.DateField(verbose_name="Дата заезда")
@@ -70,7 +128,43 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=BOOKING_STATUS, default='awaiting_payment', verbose_name="Статус")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Общая стоимость")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
     special_requests = models.TextField(blank=True, null=True, verbose_name="Особые пожелания")
+    # Растет при каждом сохранении: правка по устаревшей версии отклоняется (оптимистическая блокировка)
+    version = models.PositiveIntegerField(default=1, verbose_name="Версия")
+
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Проверяется до вставки в GiST-индексы: перепутанные даты дают понятную ошибку,
+            # а не ошибку построения daterange
+            models.CheckConstraint(
+                condition=models.Q(check_out_date__gt=models.F('check_in_date')),
+                name='booking_check_out_after_check_in',
+                violation_error_message='Дата выезда должна быть позже даты заезда',
+            ),
+            # Один номер не может быть занят двумя активными бронированиями в одну ночь
+            ExclusionConstraint(
+                name='booking_room_no_overlap',
+                expressions=[
+                    (stay_range(), RangeOperators.OVERLAPS),
+                    ('room', RangeOperators.EQUAL),
+                ],
+                condition=models.Q(status__in=['confirmed', 'checked_in', 'awaiting_payment']),
+            ),
+        ]
+        indexes = [
+            GistIndex(stay_range(), name='booking_stay_range_gist'),
+            # Keyset-пагинация списка бронирований (admin_panel.keyset): поле сортировки + id
+            models.Index(fields=['check_in_date', 'id'], name='booking_check_in_id_idx'),
+            models.Index(fields=['check_out_date', 'id'], name='booking_check_out_id_idx'),
+            models.Index(fields=['total_price', 'id'], name='booking_price_id_idx'),
+            models.Index(fields=['status', 'id'], name='booking_status_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),
+            # Последнее изменение таблицы для условного GET (conditional.table_modified)
+            models.Index(fields=['updated_at'], name='booking_updated_at_idx'),
+        ]
 
     @property
     def nights(self):
@@ -79,10 +173,70 @@ class Booking(models.Model):
             return (self.check_out_date - self.check_in_date).days
         return 0
 
+    def save(self, *args, **kwargs):
+        if self.pk and not self._state.adding:
+            self.version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Бронирование {self.id} - {self.customer}"
 
 
+class RoomNight(models.Model):
+    """
+    Журнал занятости: одна строка на номер и ночь активного бронирования.
+    Поддерживается сигналами Booking, пересобирается командой rebuild_room_nights
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='nights', verbose_name="Комната")
+    date = models.DateField(verbose_name="Ночь")
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights', verbose_name="Бронирование")
+
+    class Meta:
+        verbose_name = 'Ночь занятости'
+        verbose_name_plural = 'Журнал занятости'
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='room_night_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room'], name='room_night_date_room_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} {self.date} (бронирование {self.booking_id})"
+
+
+class CustomerStats(models.Model):
+    """
+    Итоги клиента для списка клиентов: строка на каждого клиента.
+    Пересчитывается по клиенту сигналами Booking/ServiceBooking/Customer,
+    пересобирается командой rebuild_customer_stats
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='stats', verbose_name="Клиент")
+    booking_count = models.IntegerField(default=0, verbose_name="Бронирований")
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Сумма бронирований")
+    last_booking_date = models.DateTimeField(null=True, blank=True, verbose_name="Последнее бронирование")
+    service_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Сумма услуг")
+    is_active = models.BooleanField(default=False, verbose_name="Есть активное бронирование")
+
+    class Meta:
+        verbose_name = 'Статистика клиента'
+        verbose_name_plural = 'Статистика клиентов'
+        indexes = [
+            # Сортировки списка клиентов: поле + клиент для однозначного порядка страниц
+            models.Index(fields=['booking_count', 'customer'], name='customer_stats_count_idx'),
+            models.Index(fields=['total_spent', 'customer'], name='customer_stats_spent_idx'),
+            models.Index(fields=['last_booking_date', 'customer'], name='customer_stats_last_idx'),
+            models.Index(fields=['customer'], condition=models.Q(is_active=True), name='customer_stats_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.booking_count} бронирований"
+
+
 class Payment(models.Model):
     PAYMENT_STATUS = [
         ('pending', 'Ожидает'),
@@ -103,6 +257,125 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=50, choices=PAYMENT_METHOD, default='credit_card',
                                       verbose_name="Способ оплаты")
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default='pending', verbose_name="Статус")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        indexes = [
+            # Последнее изменение таблицы для условного GET (conditional.table_modified)
+            models.Index(fields=['updated_at'], name='payment_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"Платеж {self.pk} - {self.amount} руб."
+
+
+class RoomTypeAvailability(models.Model):
+    """
+    Календарь свободных номеров по типам на год вперед.
+    Обновляется сигналами Booking/Room, пересобирается командой refresh_availability_calendar
+    """
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='calendar',
+                                  verbose_name="Тип номера")
+    date = models.DateField(verbose_name="Дата")
+    total_rooms = models.IntegerField(default=0, verbose_name="Номеров в продаже")
+    booked_rooms = models.IntegerField(default=0, verbose_name="Занято")
+    free_rooms = models.IntegerField(default=0, verbose_name="Свободно")
+
+    class Meta:
+        verbose_name = 'Доступность типа номера'
+        verbose_name_plural = 'Календарь доступности'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'room_type'], name='room_type_availability_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} {self.date}: свободно {self.free_rooms}"
+
+
+class Season(models.Model):
+    """Сезонный коэффициент цены на период [start_date, end_date] включительно"""
+    name = models.CharField(max_length=100, verbose_name="Название")
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='seasons', verbose_name="Тип номера",
+                                  help_text="Пусто — для всех типов")
+    start_date = models.DateField(verbose_name="Начало")
+    end_date = models.DateField(verbose_name="Окончание")
+    multiplier = models.DecimalField(max_digits=5, decimal_places=2, default=1,
+                                     validators=[MinValueValidator(0)], verbose_name="Коэффициент")
+
+    class Meta:
+        verbose_name = 'Сезон'
+        verbose_name_plural = 'Сезоны'
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} — {self.end_date}) ×{self.multiplier}"
+
+
+class WeekdayRate(models.Model):
+    """Коэффициент цены по дню недели для типа номера"""
+    WEEKDAYS = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='weekday_rates',
+                                  verbose_name="Тип номера")
+    weekday = models.IntegerField(choices=WEEKDAYS, verbose_name="День недели")
+    multiplier = models.DecimalField(max_digits=5, decimal_places=2, default=1,
+                                     validators=[MinValueValidator(0)], verbose_name="Коэффициент")
+
+    class Meta:
+        verbose_name = 'Коэффициент дня недели'
+        verbose_name_plural = 'Коэффициенты дней недели'
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'weekday'], name='weekday_rate_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} {self.get_weekday_display()} ×{self.multiplier}"
+
+
+class RateOverride(models.Model):
+    """Фиксированная цена ночи на конкретную дату — важнее сезонов и дней недели"""
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='rate_overrides',
+                                  verbose_name="Тип номера")
+    date = models.DateField(verbose_name="Дата")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена за ночь")
+    reason = models.CharField(max_length=200, blank=True, verbose_name="Причина")
+
+    class Meta:
+        verbose_name = 'Ручная цена'
+        verbose_name_plural = 'Ручные цены'
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='rate_override_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} {self.date}: {self.price} руб."
+
+
+class DailyRate(models.Model):
+    """
+    Календарь цен «тип номера × дата», рассчитанный из базовой цены, сезонов,
+    дней недели и ручных цен. Обновляется сигналами, пересобирается командой refresh_rate_calendar
+    """
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='rates',
+                                  verbose_name="Тип номера")
+    date = models.DateField(verbose_name="Дата")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена за ночь")
+
+    class Meta:
+        verbose_name = 'Цена на дату'
+        verbose_name_plural = 'Календарь цен'
+        constraints = [
+            # Индекс (room_type, date) обслуживает выборку цен за период проживания
+            models.UniqueConstraint(fields=['room_type', 'date'], name='daily_rate_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} {self.date}: {self.price} руб."
@@ -3,8 +3,6 @@ import glob
 import shutil
 from pathlib import Path
 from django.conf import settings
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 
 #Шрифты с кириллицы
@@ -99,6 +97,9 @@ def get_cyrillic_fonts():
 
 _registered = {}
 def register_cyrillic_fonts():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
     regular_path, bold_path = get_cyrillic_fonts()
     regular_name = 'CyrillicRegular'
     bold_name = 'CyrillicBold'
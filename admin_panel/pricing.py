@@ -0,0 +1,253 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .inventory import iter_nights
+from .models import DailyRate, RateOverride, RoomType, Season, WeekdayRate
+
+# Календарь цен строится на тот же горизонт, что и матрица занятости
+RATE_DAYS = 540
+CENTS = Decimal('0.01')
+
+# Версия календаря цен: меняется при каждом пересчете и обнуляет кэш месяцев
+VERSION_CACHE_KEY = 'rate_calendar_version'
+MONTH_CACHE_TIMEOUT = 6 * 60 * 60
+
+
+def rate_window():
+    """Окно календаря цен [сегодня, сегодня + RATE_DAYS)"""
+    today = timezone.localdate()
+    return today, today + timedelta(days=RATE_DAYS)
+
+
+def compute_rates(room_type_ids, start, end):
+    """
+    Цены по правилам для дней [start, end): ручная цена, иначе базовая цена × сезон × день недели.
+    Сезон конкретного типа важнее общего, из нескольких подходящих берется начавшийся позже.
+    Возвращает {room_type_id: {date: цена}}
+    """
+    base = dict(RoomType.objects.filter(id__in=room_type_ids).values_list('id', 'price_per_night'))
+    seasons = sorted(
+        Season.objects.filter(
+            Q(room_type_id__in=room_type_ids) | Q(room_type__isnull=True),
+            start_date__lt=end,
+            end_date__gte=start,
+        ).values_list('room_type_id', 'start_date', 'end_date', 'multiplier'),
+        key=lambda s: (s[0] is not None, s[1]),
+    )
+    weekdays = {
+        (type_id, weekday): multiplier
+        for type_id, weekday, multiplier in WeekdayRate.objects.filter(
+            room_type_id__in=room_type_ids
+        ).values_list('room_type_id', 'weekday', 'multiplier')
+    }
+    overrides = {
+        (type_id, day): price
+        for type_id, day, price in RateOverride.objects.filter(
+            room_type_id__in=room_type_ids, date__gte=start, date__lt=end,
+        ).values_list('room_type_id', 'date', 'price')
+    }
+
+    rates = {}
+    for type_id, base_price in base.items():
+        type_seasons = [s for s in seasons if s[0] in (None, type_id)]
+        per_day = {}
+        for day in iter_nights(start, end):
+            override = overrides.get((type_id, day))
+            if override is not None:
+                per_day[day] = override
+                continue
+            multiplier = weekdays.get((type_id, day.weekday()), Decimal(1))
+            for _, season_start, season_end, season_multiplier in reversed(type_seasons):
+                if season_start <= day <= season_end:
+                    multiplier *= season_multiplier
+                    break
+            per_day[day] = (base_price * multiplier).quantize(CENTS)
+        rates[type_id] = per_day
+    return rates
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        return 1
+
+
+def refresh_rates(room_type_ids=None, start=None, end=None):
+    """
+    Пересчитывает календарь цен для типов room_type_ids (все типы, если None)
+    в днях [start, end), обрезанных окном календаря. Возвращает число записанных строк
+    """
+    first, last = rate_window()
+    start = max(start or first, first)
+    end = min(end or last, last)
+    if start >= end:
+        return 0
+
+    types = RoomType.objects.all()
+    if room_type_ids is not None:
+        types = types.filter(id__in=[t for t in room_type_ids if t])
+    type_ids = list(types.values_list('id', flat=True))
+    if not type_ids:
+        return 0
+
+    rows = [
+        DailyRate(room_type_id=type_id, date=day, price=price)
+        for type_id, per_day in compute_rates(type_ids, start, end).items()
+        for day, price in per_day.items()
+    ]
+    DailyRate.objects.bulk_create(
+        rows,
+        batch_size=2000,
+        update_conflicts=True,
+        unique_fields=['room_type', 'date'],
+        update_fields=['price'],
+    )
+    # Кэш месяцев общий для всех процессов: до фиксации они снова закэшировали бы старые цены
+    transaction.on_commit(_bump_version)
+    return len(rows)
+
+
+def rebuild_rates():
+    """Сдвигает окно календаря цен на сегодня и пересчитывает его целиком"""
+    first, last = rate_window()
+    with transaction.atomic():
+        DailyRate.objects.exclude(date__gte=first, date__lt=last).delete()
+        return refresh_rates()
+
+
+def _months(start, end):
+    """Месяцы (год, месяц), задетые днями [start, end)"""
+    months = []
+    year, month = start.year, start.month
+    while date(year, month, 1) < end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _month_bounds(year, month):
+    first = date(year, month, 1)
+    last = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return first, last
+
+
+def _load_months(missing):
+    """
+    Цены месяцев missing = [(room_type_id, (год, месяц)), ...] одним запросом к календарю цен.
+    Дни за окном календаря досчитываются по правилам
+    """
+    type_ids = {type_id for type_id, _ in missing}
+    bounds = [_month_bounds(*month) for _, month in missing]
+    first = min(b[0] for b in bounds)
+    last = max(b[1] for b in bounds)
+
+    rates = {type_id: {} for type_id in type_ids}
+    for type_id, day, price in DailyRate.objects.filter(
+        room_type_id__in=type_ids, date__gte=first, date__lt=last,
+    ).values_list('room_type_id', 'date', 'price'):
+        rates[type_id][day] = price
+
+    gaps = [type_id for type_id in type_ids if len(rates[type_id]) < (last - first).days]
+    if gaps:
+        for type_id, per_day in compute_rates(gaps, first, last).items():
+            for day, price in per_day.items():
+                rates[type_id].setdefault(day, price)
+
+    loaded = {}
+    for type_id, month in missing:
+        month_first, month_last = _month_bounds(*month)
+        loaded[(type_id, month)] = [rates[type_id].get(day) for day in iter_nights(month_first, month_last)]
+    return loaded
+
+
+def nightly_rates(room_type_ids, start, end):
+    """
+    {room_type_id: [цена каждой ночи из [start, end)]}.
+    Месяцы берутся из кэша, все промахи загружаются одним запросом
+    """
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    months = _months(start, end)
+    keys = {
+        (type_id, month): f'rates:{version}:{type_id}:{month[0]}-{month[1]:02d}'
+        for type_id in set(room_type_ids) for month in months
+    }
+    cached = cache.get_many(list(keys.values()))
+    missing = [item for item, key in keys.items() if key not in cached]
+    if missing:
+        loaded = {keys[item]: prices for item, prices in _load_months(missing).items()}
+        cache.set_many(loaded, MONTH_CACHE_TIMEOUT)
+        cached.update(loaded)
+
+    result = {}
+    for type_id in set(room_type_ids):
+        prices = []
+        for month in months:
+            month_first, _ = _month_bounds(*month)
+            month_prices = cached[keys[(type_id, month)]]
+            lo = max((start - month_first).days, 0)
+            hi = min((end - month_first).days, len(month_prices))
+            prices.extend(month_prices[lo:hi])
+        result[type_id] = prices
+    return result
+
+
+class RateTable:
+    """
+    Цены ночей нескольких типов номеров на период [start, end) с префиксными суммами:
+    стоимость любого проживания внутри периода считается за O(1), без запросов к БД
+    """
+
+    def __init__(self, room_type_ids, start, end):
+        self.start = start
+        self.end = end
+        self.rates = nightly_rates(room_type_ids, start, end)
+        self.prefix = {
+            type_id: list(accumulate(prices, initial=Decimal(0)))
+            for type_id, prices in self.rates.items()
+        }
+
+    def _offsets(self, check_in, check_out):
+        if check_in < self.start or check_out > self.end or check_in >= check_out:
+            raise ValueError('Период проживания вне таблицы цен')
+        return (check_in - self.start).days, (check_out - self.start).days
+
+    def nightly(self, room_type_id, check_in, check_out):
+        lo, hi = self._offsets(check_in, check_out)
+        return self.rates[room_type_id][lo:hi]
+
+    def price(self, room_type_id, check_in, check_out):
+        lo, hi = self._offsets(check_in, check_out)
+        prefix = self.prefix[room_type_id]
+        return prefix[hi] - prefix[lo]
+
+
+def price_stays(stays):
+    """Стоимость многих проживаний [(room_type_id, check_in, check_out), ...] одной загрузкой цен"""
+    if not stays:
+        return []
+    table = RateTable(
+        {type_id for type_id, _, _ in stays},
+        min(check_in for _, check_in, _ in stays),
+        max(check_out for _, _, check_out in stays),
+    )
+    return [table.price(type_id, check_in, check_out) for type_id, check_in, check_out in stays]
+
+
+def stay_price(room_type, check_in, check_out):
+    """Стоимость проживания в номере типа room_type на [check_in, check_out)"""
+    type_id = getattr(room_type, 'pk', room_type)
+    return RateTable([type_id], check_in, check_out).price(type_id, check_in, check_out)
+
+
+def stay_rates(room_type, check_in, check_out):
+    """Цены каждой ночи проживания [check_in, check_out)"""
+    type_id = getattr(room_type, 'pk', room_type)
+    return nightly_rates([type_id], check_in, check_out)[type_id]
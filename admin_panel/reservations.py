@@ -0,0 +1,197 @@
+import random
+import time
+
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from .models import Booking, Room
+from .pricing import RateTable
+from .signals import bookings_bulk_created
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.05
+
+# serialization_failure и deadlock_detected — транзакцию можно просто повторить
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+class ReservationConflict(Exception):
+    """Номер уже занят другим активным бронированием на эти даты"""
+
+
+class VersionConflict(ReservationConflict):
+    """Бронирование успели изменить после того, как пользователь его открыл"""
+
+
+def _is_retryable(error):
+    cause = error.__cause__
+    sqlstate = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+def lock_rooms(room_ids):
+    """
+    Блокирует строки номеров (SELECT ... FOR UPDATE) в порядке id,
+    чтобы две транзакции с одними и теми же номерами не взаимоблокировались
+    """
+    ids = sorted({room_id for room_id in room_ids if room_id})
+    return list(
+        Room.objects.select_related('room_type').select_for_update(of=('self',)).filter(id__in=ids).order_by('id')
+    )
+
+
+def has_overlap(room_id, check_in, check_out, exclude_id=None):
+    overlapping = Booking.objects.filter(
+        room_id=room_id,
+        status__in=Booking.ACTIVE_STATUSES,
+    ).overlapping(check_in, check_out)
+    if exclude_id:
+        overlapping = overlapping.exclude(pk=exclude_id)
+    return overlapping.exists()
+
+
+def run_with_retry(func, attempts=MAX_ATTEMPTS):
+    """
+    Выполняет func() в транзакции, повторяя ее с экспоненциальной задержкой
+    при ошибках сериализации и взаимоблокировках
+    """
+    if connection.in_atomic_block:
+        # Внутри чужой транзакции повтор невозможен — ее откатит вызывающий код
+        with transaction.atomic():
+            return func()
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as e:
+            if attempt == attempts or not _is_retryable(e):
+                raise
+            time.sleep(BASE_DELAY * 2 ** (attempt - 1) * (1 + random.random()))
+
+
+def reserve(booking, before_save=None, after_save=None, extra_room_ids=(), expected_version=None):
+    """
+    Сохраняет бронирование под блокировкой номера.
+    Внутри транзакции: блокирует номер бронирования и extra_room_ids (например, прежний номер при
+    переносе), заново проверяет пересечения и сохраняет. before_save/after_save выполняются в той же
+    транзакции — для сохранения клиента и статусов номеров.
+    expected_version — версия, которую видел пользователь; если бронирование с тех пор сохраняли,
+    VersionConflict
+    """
+    is_new = booking.pk is None
+
+    def attempt():
+        if is_new:
+            # После отката предыдущей попытки у объекта мог остаться несуществующий pk
+            booking.pk = None
+            booking._state.adding = True
+        lock_rooms([booking.room_id, *extra_room_ids])
+        if not is_new:
+            current = Booking.objects.select_for_update().filter(pk=booking.pk).values_list(
+                'version', flat=True
+            ).first()
+            if current is None:
+                raise VersionConflict('Бронирование удалено другим пользователем')
+            if expected_version is not None and current != expected_version:
+                raise VersionConflict('Бронирование изменено другим пользователем — обновите данные')
+            # save() увеличит версию от значения в БД, а не от устаревшего в памяти
+            booking.version = current
+        if booking.status in Booking.ACTIVE_STATUSES and has_overlap(
+                booking.room_id, booking.check_in_date, booking.check_out_date, exclude_id=booking.pk):
+            raise ReservationConflict('Номер уже занят другим бронированием на выбранные даты')
+        if before_save:
+            before_save()
+        booking.save()
+        if after_save:
+            after_save()
+        return booking
+
+    return run_with_retry(attempt)
+
+
+def reserve_group(customer, check_in, check_out, rooms=None, room_type=None, count=None,
+                  status='awaiting_payment', special_requests=''):
+    """
+    Групповое бронирование одной транзакцией: либо конкретный список номеров rooms,
+    либо count свободных номеров типа room_type. Номера блокируются, стоимость считается
+    одним проходом, бронирования вставляются через bulk_create
+    """
+    def attempt():
+        if rooms:
+            candidate_ids = [room.id for room in rooms]
+        else:
+            candidate_ids = list(Room.objects.filter(
+                room_type=room_type, status='available'
+            ).values_list('id', flat=True))
+        locked = lock_rooms(candidate_ids)
+
+        busy = set(Booking.objects.filter(
+            room_id__in=candidate_ids,
+            status__in=Booking.ACTIVE_STATUSES,
+        ).overlapping(check_in, check_out).values_list('room_id', flat=True))
+
+        if rooms:
+            taken = [room.room_number for room in locked if room.id in busy]
+            if taken:
+                raise ReservationConflict(f'Номера уже заняты на выбранные даты: {", ".join(taken)}')
+            allocated = locked
+        else:
+            # Группу селим компактно: по этажам и номерам
+            free = sorted((room for room in locked if room.id not in busy),
+                          key=lambda room: (room.floor, room.room_number))
+            if len(free) < count:
+                raise ReservationConflict(f'Свободно только {len(free)} номеров типа «{room_type.name}»')
+            allocated = free[:count]
+
+        rates = RateTable({room.room_type_id for room in allocated}, check_in, check_out)
+        bookings = [
+            Booking(
+                customer=customer,
+                room=room,
+                check_in_date=check_in,
+                check_out_date=check_out,
+                status=status,
+                total_price=rates.price(room.room_type_id, check_in, check_out),
+                special_requests=special_requests,
+            )
+            for room in allocated
+        ]
+        Booking.objects.bulk_create(bookings)
+        # Как и при одиночном бронировании, номера помечаются занятыми
+        Room.objects.filter(id__in=[room.id for room in allocated]).update(
+            status='occupied', updated_at=timezone.now()
+        )
+        # bulk_create не вызывает post_save — журналы и уборки обновляют получатели этого сигнала
+        bookings_bulk_created.send(sender=Booking, bookings=bookings)
+        return bookings
+
+    return run_with_retry(attempt)
+
+
+def move_booking(booking, room, check_in, check_out, expected_version):
+    """
+    Перенос бронирования в другой номер и/или на другие даты (перетаскивание на шахматке).
+    Стоимость пересчитывается по календарю цен. У заселенного гостя дату заезда менять нельзя,
+    при смене номера статусы номеров переставляются
+    """
+    if booking.status not in Booking.ACTIVE_STATUSES:
+        raise ReservationConflict('Перенести можно только активное бронирование')
+    if booking.status == 'checked_in' and check_in != booking.check_in_date:
+        raise ReservationConflict('У заселенного гостя нельзя изменить дату заезда')
+
+    old_room = booking.room
+    booking.room = room
+    booking.check_in_date = check_in
+    booking.check_out_date = check_out
+    booking.total_price = RateTable([room.room_type_id], check_in, check_out).price(room.room_type_id, check_in, check_out)
+
+    def update_room_statuses():
+        if booking.status == 'checked_in' and old_room.pk != room.pk:
+            old_room.status = 'available'
+            old_room.save(update_fields=['status', 'updated_at'])
+            room.status = 'occupied'
+            room.save(update_fields=['status', 'updated_at'])
+
+    return reserve(booking, before_save=update_room_statuses, extra_room_ids=[old_room.pk],
+                   expected_version=expected_version)
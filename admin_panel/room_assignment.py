@@ -0,0 +1,176 @@
+from bisect import bisect_right, insort
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Booking, Room
+from .reservations import ReservationConflict, lock_rooms, run_with_retry
+from .signals import bookings_reassigned
+
+# Горизонт, на котором оценивается фрагментация шахматки
+PLAN_DAYS = 180
+# Окно из 1–2 ночей между бронированиями почти никогда не продается
+SHORT_GAP_NIGHTS = 2
+
+
+class AssignmentError(Exception):
+    """Бронирования типа номера нельзя разложить по номерам (данные противоречивы)"""
+
+
+def _is_fixed(status, check_in, today):
+    # Заселенных и уже начавшиеся проживания не переселяем
+    return status == 'checked_in' or check_in <= today
+
+
+def _pack(room_order, bookings, today):
+    """
+    Раскладка интервалов по номерам: жадная раскраска интервального графа
+    с выбором номера, освободившегося последним (best fit). Бронирования обходятся по дате заезда,
+    поэтому номеров хватает всегда, когда хватало при исходной раскладке.
+    Возвращает {booking_id: room_id}
+    """
+    ready = {room_id: today.toordinal() for room_id in room_order}
+    assignment = {}
+    movable = []
+    for booking_id, room_id, check_in, check_out, status in bookings:
+        if room_id in ready and _is_fixed(status, check_in, today):
+            assignment[booking_id] = room_id
+            ready[room_id] = max(ready[room_id], check_out.toordinal())
+        else:
+            movable.append((check_in.toordinal(), -check_out.toordinal(), booking_id, room_id))
+
+    # (день освобождения, порядок номера, id номера), отсортировано по дню освобождения
+    free_at = sorted((day, room_order[room_id], room_id) for room_id, day in ready.items())
+    movable.sort()
+    for start, neg_end, booking_id, current_room in movable:
+        i = bisect_right(free_at, (start, len(room_order), 0))
+        if i == 0:
+            raise AssignmentError(f'Бронированию №{booking_id} не хватает номера — проверьте пересечения')
+        chosen = i - 1
+        # Среди одинаково подходящих номеров оставляем гостя в его номере
+        j = i - 1
+        while j >= 0 and free_at[j][0] == free_at[i - 1][0]:
+            if free_at[j][2] == current_room:
+                chosen = j
+                break
+            j -= 1
+        _, order, room_id = free_at.pop(chosen)
+        assignment[booking_id] = room_id
+        insort(free_at, (-neg_end, order, room_id))
+    return assignment
+
+
+def fragmentation(room_ids, stays, start, end):
+    """
+    Оценка шахматки на [start, end): stays — {room_id: [(заезд, выезд), ...]}.
+    Короткие окна — свободные промежутки до SHORT_GAP_NIGHTS ночей между двумя бронированиями
+    """
+    short_gaps = short_gap_nights = longest = free_rooms = 0
+    for room_id in room_ids:
+        cursor = start
+        run_longest = 0
+        for check_in, check_out in sorted(stays.get(room_id, ())):
+            if check_out <= start or check_in >= end:
+                continue
+            gap = (check_in - cursor).days
+            if 0 < gap <= SHORT_GAP_NIGHTS and cursor > start:
+                short_gaps += 1
+                short_gap_nights += gap
+            run_longest = max(run_longest, gap)
+            cursor = max(cursor, check_out)
+        tail = (end - cursor).days
+        if cursor == start:
+            free_rooms += 1
+        longest = max(longest, run_longest, tail)
+    return {
+        'short_gaps': short_gaps,
+        'short_gap_nights': short_gap_nights,
+        'longest_free_run': longest,
+        'free_rooms': free_rooms,
+    }
+
+
+def plan_room_type(room_type, days=PLAN_DAYS, today=None):
+    """
+    Пробная переукладка будущих бронирований типа номера без записи в БД.
+    Возвращает {'room_type', 'moves': [...], 'before': {...}, 'after': {...}}
+    """
+    today = today or timezone.localdate()
+    rooms = list(Room.objects.filter(room_type=room_type).exclude(status='maintenance').order_by(
+        'floor', 'room_number'
+    ).values_list('id', 'room_number'))
+    room_order = {room_id: i for i, (room_id, _) in enumerate(rooms)}
+    numbers = dict(rooms)
+
+    bookings = list(Booking.objects.filter(
+        room_id__in=room_order,
+        status__in=Booking.ACTIVE_STATUSES,
+        check_out_date__gt=today,
+    ).values_list('id', 'room_id', 'check_in_date', 'check_out_date', 'status'))
+    assignment = _pack(room_order, bookings, today)
+
+    before, after, moves = {}, {}, []
+    for booking_id, room_id, check_in, check_out, _ in bookings:
+        new_room = assignment[booking_id]
+        before.setdefault(room_id, []).append((check_in, check_out))
+        after.setdefault(new_room, []).append((check_in, check_out))
+        if new_room != room_id:
+            moves.append({
+                'booking_id': booking_id,
+                'check_in': check_in,
+                'check_out': check_out,
+                'from_room_id': room_id,
+                'from_room': numbers[room_id],
+                'to_room_id': new_room,
+                'to_room': numbers[new_room],
+            })
+    moves.sort(key=lambda m: (m['check_in'], m['booking_id']))
+
+    end = today + timedelta(days=days)
+    return {
+        'room_type': room_type,
+        'moves': moves,
+        'before': fragmentation(room_order, before, today, end),
+        'after': fragmentation(room_order, after, today, end),
+    }
+
+
+def _move_key(moves):
+    return sorted((m['booking_id'], m['from_room_id'], m['to_room_id']) for m in moves)
+
+
+def apply_plan(room_type, expected_moves=None, days=PLAN_DAYS):
+    """
+    Пересчитывает план под блокировкой номеров типа и переселяет бронирования одной транзакцией.
+    Если передан expected_moves (показанный пользователю пробный план), а данные успели измениться —
+    ReservationConflict. Возвращает примененный план
+    """
+    def attempt():
+        lock_rooms(Room.objects.filter(room_type=room_type).values_list('id', flat=True))
+        plan = plan_room_type(room_type, days=days)
+        if expected_moves is not None and _move_key(plan['moves']) != _move_key(expected_moves):
+            raise ReservationConflict('Бронирования изменились после расчета плана — пересчитайте его')
+        if not plan['moves']:
+            return plan
+
+        targets = {m['booking_id']: m['to_room_id'] for m in plan['moves']}
+        bookings = list(Booking.objects.filter(id__in=targets))
+        previous_rooms = {b.pk: b.room_id for b in bookings}
+        statuses = {b.pk: b.status for b in bookings}
+        # Ограничение booking_room_no_overlap проверяется построчно, поэтому обмены номерами
+        # делаются в два шага: бронирования временно выводятся из-под ограничения
+        now = timezone.now()
+        Booking.objects.filter(id__in=targets).update(status='cancelled', updated_at=now)
+        for booking in bookings:
+            booking.room_id = targets[booking.pk]
+            booking.status = statuses[booking.pk]
+            booking.version += 1
+            # bulk_update не заполняет auto_now-поля
+            booking.updated_at = now
+        Booking.objects.bulk_update(bookings, ['room', 'status', 'version', 'updated_at'], batch_size=500)
+
+        # bulk_update не вызывает post_save — журнал ночей и уборки обновляют получатели сигнала
+        bookings_reassigned.send(sender=Booking, bookings=bookings, previous_rooms=previous_rooms)
+        return plan
+
+    return run_with_retry(attempt)
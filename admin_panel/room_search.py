@@ -0,0 +1,65 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.paginator import Paginator
+from django.db.models import F, Value
+
+from .availability import find_available_rooms
+from .pricing import RateTable
+
+SEARCH_PAGE_SIZE = 20
+
+# То же выражение, что и в GIN-индексе room_features_search_gin — иначе индекс не используется
+FEATURES_VECTOR = SearchVector('features', config='russian')
+
+
+def search_rooms(check_in, check_out, room_type=None, capacity=None, floor=None, features=None):
+    """
+    Свободные на [check_in, check_out) номера с фильтрами по типу, вместимости, этажу
+    и полнотекстовым поиском по особенностям. Порядок: релевантность особенностей,
+    наименьшая подходящая вместимость, цена, этаж, номер
+    """
+    rooms = find_available_rooms(check_in, check_out, room_type=room_type, capacity=capacity)
+    if floor:
+        rooms = rooms.filter(floor=floor)
+
+    if features:
+        query = SearchQuery(features, config='russian', search_type='websearch')
+        rooms = rooms.alias(search=FEATURES_VECTOR).filter(search=query).annotate(
+            rank=SearchRank(FEATURES_VECTOR, query)
+        )
+    else:
+        rooms = rooms.annotate(rank=Value(0.0))
+
+    return rooms.order_by(
+        F('rank').desc(), 'room_type__capacity', 'room_type__price_per_night', 'floor', 'room_number'
+    )
+
+
+def paginate_rooms(rooms, page, per_page=SEARCH_PAGE_SIZE):
+    return Paginator(rooms, per_page).get_page(page)
+
+
+def attach_prices(rooms, check_in, check_out):
+    """Проставляет номерам total_price и nightly_rates по календарю цен одной загрузкой"""
+    rooms = list(rooms)
+    if not rooms:
+        return rooms
+    table = RateTable({room.room_type_id for room in rooms}, check_in, check_out)
+    for room in rooms:
+        room.nightly_rates = table.nightly(room.room_type_id, check_in, check_out)
+        room.total_price = table.price(room.room_type_id, check_in, check_out)
+    return rooms
+
+
+def serialize_room(room):
+    return {
+        'id': room.id,
+        'room_number': room.room_number,
+        'floor': room.floor,
+        'room_type': room.room_type.name,
+        'room_type_id': room.room_type_id,
+        'capacity': room.room_type.capacity,
+        'features': room.features or '',
+        'rank': round(float(room.rank), 4),
+        'nightly_rates': [str(price) for price in room.nightly_rates],
+        'total_price': str(room.total_price),
+    }
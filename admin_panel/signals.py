@@ -0,0 +1,343 @@
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from service.models import ServiceBooking
+from . import availability, chess_cache, chess_tiles, conditional, counters, customer_stats, live_updates
+from .availability_calendar import refresh_calendar
+from .inventory import add_bookings_nights, replace_bookings_nights, sync_booking_nights
+from .models import (Booking, Customer, CustomerStats, Payment, RateOverride, Room, RoomType, Season,
+                     WeekdayRate)
+from .pricing import refresh_rates
+
+# Бронирования созданы через bulk_create (post_save не отправлялся); аргумент bookings
+bookings_bulk_created = Signal()
+# Бронирования переселены в другие номера через bulk_update; аргументы bookings, previous_rooms
+bookings_reassigned = Signal()
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_booking(sender, instance, **kwargs):
+    # Состояние до сохранения нужно, чтобы пересчитать и старый период/тип номера
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Booking.objects.filter(pk=instance.pk).values(
+            'room_id', 'room__room_type_id', 'check_in_date', 'check_out_date', 'status', 'customer_id'
+        ).first()
+
+
+@receiver(post_save, sender=Booking)
+def sync_room_nights(sender, instance, **kwargs):
+    # Удаление бронирования чистит журнал каскадом по FK
+    sync_booking_nights(instance)
+
+
+@receiver(post_save, sender=Booking)
+def patch_availability_on_save(sender, instance, **kwargs):
+    availability.patch_booking(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def patch_availability_on_delete(sender, instance, **kwargs):
+    availability.patch_booking(instance, deleted=True)
+
+
+@receiver(post_save, sender=Booking)
+def refresh_calendar_on_booking_save(sender, instance, **kwargs):
+    # Должен выполняться после sync_room_nights: календарь считается по журналу ночей
+    type_ids = {instance.room.room_type_id}
+    start, end = instance.check_in_date, instance.check_out_date
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        type_ids.add(previous['room__room_type_id'])
+        start = min(start, previous['check_in_date'])
+        end = max(end, previous['check_out_date'])
+    refresh_calendar(type_ids, start, end)
+
+
+@receiver(post_delete, sender=Booking)
+def refresh_calendar_on_booking_delete(sender, instance, **kwargs):
+    try:
+        room_type_id = instance.room.room_type_id
+    except Room.DoesNotExist:
+        # Номер удален вместе с бронированием — календарь пересчитает сигнал Room
+        return
+    if _is_deleting(room_type_id):
+        return
+    refresh_calendar([room_type_id], instance.check_in_date, instance.check_out_date)
+
+
+@receiver(bookings_bulk_created)
+def sync_bulk_created_bookings(sender, bookings, **kwargs):
+    if not bookings:
+        return
+    add_bookings_nights(bookings)
+    # Номера групповой брони еще и переведены в «занят» через update(), поэтому матрицу проще сбросить
+    availability.invalidate()
+    refresh_calendar(
+        {b.room.room_type_id for b in bookings},
+        min(b.check_in_date for b in bookings),
+        max(b.check_out_date for b in bookings),
+    )
+
+
+@receiver(bookings_reassigned)
+def sync_reassigned_bookings(sender, bookings, **kwargs):
+    # Тип номеров не меняется, поэтому календарь доступности пересчитывать не нужно
+    replace_bookings_nights(bookings)
+    availability.invalidate()
+
+
+@receiver(pre_save, sender=Room)
+def remember_previous_room(sender, instance, **kwargs):
+    # Номер сохраняется при каждом бронировании — по прежнему состоянию видно, что именно изменилось
+    instance._previous_room = None
+    if instance.pk:
+        instance._previous_room = Room.objects.filter(pk=instance.pk).values(
+            'room_type_id', 'status', 'room_number', 'floor'
+        ).first()
+
+
+def _room_changes(instance):
+    """(сменился тип, сменился статус) относительно состояния до сохранения; у нового номера — оба"""
+    previous = getattr(instance, '_previous_room', None)
+    if previous is None:
+        return True, True
+    return previous['room_type_id'] != instance.room_type_id, previous['status'] != instance.status
+
+
+@receiver(post_save, sender=Room)
+def patch_availability_on_room_save(sender, instance, **kwargs):
+    type_changed, status_changed = _room_changes(instance)
+    if type_changed:
+        availability.invalidate()
+    elif status_changed:
+        # Свободен/занят/обслуживание — правится одна строка матрицы, а не вся матрица
+        availability.patch_room(instance)
+
+
+@receiver(post_delete, sender=Room)
+def invalidate_availability_on_room_delete(sender, instance, **kwargs):
+    availability.invalidate()
+
+
+@receiver(post_save, sender=Room)
+def refresh_calendar_on_room_save(sender, instance, **kwargs):
+    # Итоги типа меняют только новый номер, смена типа и вход в обслуживание или выход из него;
+    # свободен/занят при каждом бронировании календарь не трогает
+    previous = getattr(instance, '_previous_room', None)
+    if previous is None:
+        refresh_calendar([instance.room_type_id])
+    elif previous['room_type_id'] != instance.room_type_id:
+        refresh_calendar({instance.room_type_id, previous['room_type_id']})
+    elif (previous['status'] == 'maintenance') != (instance.status == 'maintenance'):
+        refresh_calendar([instance.room_type_id])
+
+
+@receiver(post_delete, sender=Room)
+def refresh_calendar_on_room_delete(sender, instance, **kwargs):
+    if not _is_deleting(instance.room_type_id):
+        refresh_calendar([instance.room_type_id])
+
+
+# Типы номеров, удаляемые прямо сейчас. Каскад удаляет их правила цен, номера и бронирования
+# уже после того, как строки календарей типа удалены, и пересчет по сигналам этих строк записал бы
+# календари несуществующему типу — проверка FK упала бы при фиксации
+_deleting_room_types = set()
+
+
+@receiver(pre_delete, sender=RoomType)
+def remember_deleting_room_type(sender, instance, **kwargs):
+    _deleting_room_types.add(instance.pk)
+
+
+@receiver(post_delete, sender=RoomType)
+def forget_deleting_room_type(sender, instance, **kwargs):
+    _deleting_room_types.discard(instance.pk)
+
+
+def _is_deleting(room_type_id):
+    return room_type_id in _deleting_room_types
+
+
+@receiver(post_save, sender=RoomType)
+def refresh_rates_on_room_type_save(sender, instance, **kwargs):
+    # Могла измениться базовая цена
+    refresh_rates([instance.pk])
+
+
+@receiver(pre_save, sender=Season)
+@receiver(pre_save, sender=WeekdayRate)
+@receiver(pre_save, sender=RateOverride)
+def remember_previous_rate_rule(sender, instance, **kwargs):
+    # Правило могли перенести на другие даты или другой тип — старые цены тоже пересчитываются
+    instance._previous_rule = None
+    if instance.pk:
+        instance._previous_rule = sender.objects.filter(pk=instance.pk).first()
+
+
+def _rule_states(instance):
+    """Прежнее (если правило редактировалось) и текущее состояние правила цены"""
+    previous = getattr(instance, '_previous_rule', None)
+    return [instance] if previous is None else [previous, instance]
+
+
+@receiver([post_save, post_delete], sender=Season)
+def refresh_rates_on_season_change(sender, instance, **kwargs):
+    for season in _rule_states(instance):
+        if _is_deleting(season.room_type_id):
+            continue
+        room_type_ids = [season.room_type_id] if season.room_type_id else None
+        refresh_rates(room_type_ids, season.start_date, season.end_date + timedelta(days=1))
+
+
+@receiver([post_save, post_delete], sender=WeekdayRate)
+def refresh_rates_on_weekday_rate_change(sender, instance, **kwargs):
+    room_type_ids = {rule.room_type_id for rule in _rule_states(instance) if not _is_deleting(rule.room_type_id)}
+    if room_type_ids:
+        refresh_rates(room_type_ids)
+
+
+@receiver([post_save, post_delete], sender=RateOverride)
+def refresh_rates_on_override_change(sender, instance, **kwargs):
+    for override in _rule_states(instance):
+        if _is_deleting(override.room_type_id):
+            continue
+        refresh_rates([override.room_type_id], override.date, override.date + timedelta(days=1))
+
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([bookings_bulk_created, bookings_reassigned])
+def bump_chess_version(sender, **kwargs):
+    # Плитки и ETag шахматки привязаны к этой версии
+    chess_tiles.bump_on_commit()
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_chess_fragments_on_save(sender, instance, **kwargs):
+    # Сбрасываются только недели старого и нового периода бронирования
+    chess_cache.bump_range(instance.check_in_date, instance.check_out_date)
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        chess_cache.bump_range(previous['check_in_date'], previous['check_out_date'])
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_chess_fragments_on_delete(sender, instance, **kwargs):
+    chess_cache.bump_range(instance.check_in_date, instance.check_out_date)
+
+
+@receiver(bookings_reassigned)
+def invalidate_chess_fragments_on_reassign(sender, bookings, **kwargs):
+    chess_cache.bump_bookings(bookings)
+
+
+@receiver(post_save, sender=Room)
+def invalidate_chess_fragments_on_room_save(sender, instance, **kwargs):
+    # Номер сохраняется при каждом заселении; окна сбрасываются, только если изменилось видимое в строке
+    previous = getattr(instance, '_previous_room', None)
+    if previous is None or any(previous[field] != getattr(instance, field) for field in previous):
+        chess_cache.bump_global()
+
+
+@receiver(bookings_bulk_created)
+@receiver(post_delete, sender=Room)
+@receiver([post_save, post_delete], sender=RoomType)
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_all_chess_fragments(sender, **kwargs):
+    # Номера и клиенты видны в любом окне шахматки; групповая бронь меняет статусы номеров через update()
+    chess_cache.bump_global()
+
+
+@receiver(post_save, sender=Booking)
+def publish_booking_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or not previous:
+        kind = 'created'
+    elif (previous['room_id'], previous['check_in_date'], previous['check_out_date']) != (
+            instance.room_id, instance.check_in_date, instance.check_out_date):
+        kind = 'moved'
+    elif previous['status'] != instance.status:
+        kind = 'status'
+    else:
+        kind = 'updated'
+    live_updates.publish_on_commit(live_updates.booking_event(kind, instance, previous))
+
+
+@receiver(post_delete, sender=Booking)
+def publish_booking_delete(sender, instance, **kwargs):
+    live_updates.publish_on_commit(live_updates.deleted_event(instance))
+
+
+@receiver(bookings_bulk_created)
+def publish_bulk_created_bookings(sender, bookings, **kwargs):
+    for booking in bookings:
+        live_updates.publish_on_commit(live_updates.booking_event('created', booking))
+
+
+@receiver(bookings_reassigned)
+def publish_reassigned_bookings(sender, bookings, previous_rooms, **kwargs):
+    for booking in bookings:
+        live_updates.publish_on_commit(live_updates.booking_event('moved', booking, {
+            'room_id': previous_rooms[booking.pk],
+            'check_in_date': booking.check_in_date,
+            'check_out_date': booking.check_out_date,
+        }))
+
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver(bookings_bulk_created)
+def invalidate_booking_counters(sender, **kwargs):
+    # Переселение (bookings_reassigned) не меняет ни статусов, ни дат — счетчики те же
+    counters.invalidate()
+
+
+@receiver(post_save, sender=Booking)
+def refresh_customer_stats_on_booking_save(sender, instance, **kwargs):
+    # Бронирование могли перевести на другого клиента — пересчитываются оба
+    previous = getattr(instance, '_previous', None)
+    customer_stats.refresh_on_commit({instance.customer_id, previous['customer_id'] if previous else None})
+
+
+@receiver(post_delete, sender=Booking)
+def refresh_customer_stats_on_booking_delete(sender, instance, **kwargs):
+    customer_stats.refresh_on_commit([instance.customer_id])
+
+
+@receiver(bookings_bulk_created)
+def refresh_customer_stats_on_bulk_create(sender, bookings, **kwargs):
+    # Переселение (bookings_reassigned) не меняет ни клиентов, ни сумм
+    customer_stats.refresh_on_commit({b.customer_id for b in bookings})
+
+
+@receiver(pre_save, sender=ServiceBooking)
+def remember_previous_service_customer(sender, instance, **kwargs):
+    instance._previous_customer_id = None
+    if instance.pk:
+        instance._previous_customer_id = ServiceBooking.objects.filter(pk=instance.pk).values_list(
+            'customer_id', flat=True
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=ServiceBooking)
+def refresh_customer_stats_on_service_change(sender, instance, **kwargs):
+    customer_stats.refresh_on_commit({instance.customer_id, getattr(instance, '_previous_customer_id', None)})
+
+
+@receiver(post_save, sender=Customer)
+def create_customer_stats(sender, instance, created, **kwargs):
+    # Список клиентов соединяется с итогами внутренним соединением — строка нужна каждому клиенту
+    # сразу, в той же транзакции: у нового клиента еще нет бронирований, итоги нулевые
+    if created:
+        CustomerStats.objects.get_or_create(customer=instance)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=ServiceBooking)
+@receiver(post_delete, sender=Payment)
+def note_deleted_row(sender, **kwargs):
+    # Удаление не оставляет следа в updated_at — условный GET аналитики сверяет счетчик удалений
+    conditional.note_delete(sender)
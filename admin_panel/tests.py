@@ -1,3 +1,567 @@
-from django.test import TestCase
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from service.models import Service, ServiceBooking, ServiceCategory
+
+from . import chess_cache, chess_export, chess_tiles, counters, keyset
+from .chess_table import CUSTOMER_COLORS, build_grid, grid_totals
+from .conditional import table_modified
+from .customer_profile import PROFILE_QUERIES, build_profile
+from .customer_stats import with_stats
+from .inventory import find_ledger_drift
+from .management.commands.bench_chess_table import synthetic_data
+from .models import (Booking, Customer, DailyRate, Payment, RateOverride, Room, RoomType, RoomTypeAvailability, Season,
+                     WeekdayRate)
+from .reservations import ReservationConflict, reserve
+
+# Тесты идут в одном процессе — общий Redis из настроек им не нужен
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_room_type(name='Стандарт', price=Decimal('1000'), capacity=2):
+    return RoomType.objects.create(name=name, description='', price_per_night=price, capacity=capacity)
+
+
+def make_customer(last_name='Иванов', first_name='Иван'):
+    return Customer.objects.create(
+        first_name=first_name, last_name=last_name, email='guest@example.com',
+        phone='+70000000000', passport_number='0000 000000', birthday=date(1990, 1, 1),
+    )
+
+
+def count_overlaps(room_ids):
+    """Пары пересекающихся активных бронирований одного номера — наивной проверкой по периодам"""
+    stays = defaultdict(list)
+    bookings = Booking.objects.filter(
+        room_id__in=room_ids, status__in=Booking.ACTIVE_STATUSES,
+    ).values_list('room_id', 'check_in_date', 'check_out_date')
+    for room_id, check_in, check_out in bookings:
+        stays[room_id].append((check_in, check_out))
+
+    overlaps = 0
+    for periods in stays.values():
+        periods.sort()
+        busy_until = None
+        for check_in, check_out in periods:
+            if busy_until and check_in < busy_until:
+                overlaps += 1
+            busy_until = max(busy_until or check_out, check_out)
+    return overlaps
+
+
+STRESS_BATCH = 10
+
+
+def _book_randomly(args):
+    """
+    Процесс стресс-теста: ATTEMPTS случайных бронирований через reserve().
+    Возвращает (создано, отказано, длительности пачек по STRESS_BATCH попыток)
+    """
+    seed, room_ids, customer_id, attempts, horizon_days = args
+    rng = random.Random(seed)
+    first_day = date.today() + timedelta(days=1)
+    created = conflicts = 0
+    batches = []
+    started = time.perf_counter()
+    try:
+        for attempt in range(1, attempts + 1):
+            check_in = first_day + timedelta(days=rng.randrange(horizon_days))
+            booking = Booking(
+                customer_id=customer_id,
+                room_id=rng.choice(room_ids),
+                check_in_date=check_in,
+                check_out_date=check_in + timedelta(days=rng.randint(1, 4)),
+                status='confirmed',
+                total_price=Decimal('0'),
+            )
+            # IntegrityError (пересечение поймало ограничение БД, а не блокировка) валит тест
+            try:
+                reserve(booking)
+                created += 1
+            except ReservationConflict:
+                conflicts += 1
+            if attempt % STRESS_BATCH == 0:
+                now = time.perf_counter()
+                batches.append(now - started)
+                started = now
+    finally:
+        connection.close()
+    return created, conflicts, batches
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConcurrentReservationTests(TransactionTestCase):
+    """
+    Отдельные процессы (fork) одновременно бронируют один набор номеров через reserve():
+    у каждого свое соединение, поэтому проверяются настоящие блокировки строк Room.
+    Кроме отсутствия пересечений проверяется, что пропускная способность не проседает
+    по мере заполнения номеров (ожидание блокировок не растет лавинообразно)
+    """
+    PROCESSES = 6
+    ATTEMPTS = 60
+    ROOMS = 8
+    HORIZON_DAYS = 60
+    # Нижняя граница пропускной способности, попыток в секунду на все процессы
+    MIN_THROUGHPUT = 20
+    # Медиана поздних пачек не дольше медианы ранних во столько раз
+    MAX_SLOWDOWN = 3
+
+    def setUp(self):
+        room_type = make_room_type()
+        self.room_ids = [
+            Room.objects.create(room_number=f'S-{i}', room_type=room_type, floor=1).pk
+            for i in range(self.ROOMS)
+        ]
+        self.customer_id = make_customer().pk
+
+    def test_parallel_reservations_never_overlap(self):
+        # Дочерние процессы не должны унаследовать открытое соединение родителя
+        connections.close_all()
+        args = [(seed, self.room_ids, self.customer_id, self.ATTEMPTS, self.HORIZON_DAYS)
+                for seed in range(self.PROCESSES)]
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(self.PROCESSES) as pool:
+            results = pool.map(_book_randomly, args)
+        elapsed = time.perf_counter() - started
+
+        created = sum(r[0] for r in results)
+        conflicts = sum(r[1] for r in results)
+        attempts = self.PROCESSES * self.ATTEMPTS
+        self.assertEqual(created + conflicts, attempts)
+        self.assertGreater(created, 0)
+        # Номеров мало, а попыток много — процессы действительно конкурировали за одни ночи
+        self.assertGreater(conflicts, 0)
+        self.assertEqual(Booking.objects.filter(room_id__in=self.room_ids).count(), created)
+        self.assertEqual(count_overlaps(self.room_ids), 0)
+        self.assertEqual(find_ledger_drift(), ([], []))
+
+        self.assertGreater(attempts / elapsed, self.MIN_THROUGHPUT)
+        batches = [r[2] for r in results]
+        third = len(batches[0]) // 3
+        early = statistics.median(d for process in batches for d in process[:third])
+        late = statistics.median(d for process in batches for d in process[-third:])
+        self.assertLess(late, early * self.MAX_SLOWDOWN)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RateRuleChangeTests(TestCase):
+    """Перенос правила цены пересчитывает календарь и на старом месте, а не только на новом"""
+
+    def setUp(self):
+        self.room_type = make_room_type(price=Decimal('1000'))
+        self.other_type = make_room_type(name='Люкс', price=Decimal('3000'))
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def price(self, room_type, day):
+        return DailyRate.objects.get(room_type=room_type, date=day).price
+
+    def test_moved_season_restores_old_dates(self):
+        season = Season.objects.create(name='Лето', room_type=self.room_type, start_date=self.day,
+                                       end_date=self.day + timedelta(days=2), multiplier=Decimal('2'))
+        self.assertEqual(self.price(self.room_type, self.day), Decimal('2000'))
+
+        season.start_date = season.end_date = self.day + timedelta(days=30)
+        season.save()
+        self.assertEqual(self.price(self.room_type, self.day), Decimal('1000'))
+        self.assertEqual(self.price(self.room_type, self.day + timedelta(days=30)), Decimal('2000'))
+
+    def test_override_moved_to_other_type_restores_old_type(self):
+        override = RateOverride.objects.create(room_type=self.room_type, date=self.day, price=Decimal('500'))
+        self.assertEqual(self.price(self.room_type, self.day), Decimal('500'))
+
+        override.room_type = self.other_type
+        override.save()
+        self.assertEqual(self.price(self.room_type, self.day), Decimal('1000'))
+        self.assertEqual(self.price(self.other_type, self.day), Decimal('500'))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ChessTileVersionTests(TestCase):
+    def test_version_changes_only_after_commit(self):
+        version = chess_tiles.current_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_customer()
+            self.assertEqual(chess_tiles.current_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(chess_tiles.current_version(), version)
+
+
+@override_settings(CACHES=LOCAL_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class ChessExportJobTests(TransactionTestCase):
+    """Фоновый экспорт кладет файл в хранилище по умолчанию, а не во временный каталог процесса"""
+
+    def setUp(self):
+        room_type = make_room_type()
+        room = Room.objects.create(room_number='101', room_type=room_type, floor=1)
+        Booking.objects.create(customer=make_customer(), room=room, check_in_date=date.today(),
+                               check_out_date=date.today() + timedelta(days=2), status='confirmed',
+                               total_price=Decimal('2000'))
+
+    def wait_for_job(self, job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = chess_export.get_job(job_id)
+            if job['status'] != 'running':
+                return job
+            time.sleep(0.1)
+        self.fail('Экспорт не завершился')
+
+    def test_job_file_is_served_once_from_storage(self):
+        job_id = chess_export.start_export_job('xlsx', {}, date.today(), 7)
+        job = self.wait_for_job(job_id)
+        self.assertEqual(job['status'], 'done', job.get('error'))
+        self.assertTrue(job['name'].startswith(f'{chess_export.STORAGE_DIR}/'))
+
+        url = reverse('chess_export_download', args=[job_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        response.close()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ChessFragmentInvalidationTests(TestCase):
+    def setUp(self):
+        self.room = Room.objects.create(room_number='101', room_type=make_room_type(), floor=1)
+        self.customer = make_customer()
+
+    def global_version(self):
+        return cache.get(chess_cache.GLOBAL_VERSION_KEY, 0)
+
+    def test_unchanged_room_save_keeps_fragments(self):
+        version = self.global_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save()
+        self.assertEqual(self.global_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.status = 'maintenance'
+            self.room.save()
+        self.assertEqual(self.global_version(), version + 1)
+
+    def test_booking_bumps_its_weeks_after_commit(self):
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday()) + timedelta(days=14)
+        week_key, = chess_cache._week_keys(monday, monday)
+        version = self.global_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(customer=self.customer, room=self.room, check_in_date=monday,
+                                   check_out_date=monday + timedelta(days=2), status='confirmed',
+                                   total_price=Decimal('2000'))
+            self.assertIsNone(cache.get(week_key))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(week_key), 1)
+        self.assertEqual(self.global_version(), version)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ChessLiveUpdatesTests(TestCase):
+    """Под WSGI поток событий не открывается: шахматка опрашивает версию данных"""
+
+    def setUp(self):
+        Room.objects.create(room_number='101', room_type=make_room_type(), floor=1)
+
+    @override_settings(CHESS_LIVE_UPDATES=False)
+    def test_polling_without_asgi(self):
+        for mode in ('', 'virtual'):
+            response = self.client.get(reverse('chess_table'), {'mode': mode})
+            self.assertNotContains(response, reverse('api_chess_events'))
+            self.assertContains(response, reverse('api_chess_version'))
+        self.assertEqual(self.client.get(reverse('api_chess_events')).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_chess_version')).json(),
+                         {'version': chess_tiles.current_version()})
+
+    @override_settings(CHESS_LIVE_UPDATES=True)
+    def test_event_source_with_asgi(self):
+        for mode in ('', 'virtual'):
+            response = self.client.get(reverse('chess_table'), {'mode': mode})
+            self.assertContains(response, reverse('api_chess_events'))
+            self.assertNotContains(response, reverse('api_chess_version'))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TableModifiedTests(TestCase):
+    def test_delete_changes_state_without_count(self):
+        room = Room.objects.create(room_number='101', room_type=make_room_type(), floor=1)
+        booking = Booking.objects.create(customer=make_customer(), room=room, check_in_date=date.today(),
+                                         check_out_date=date.today() + timedelta(days=1), status='confirmed',
+                                         total_price=Decimal('1000'))
+        with self.assertNumQueries(1):
+            state = table_modified(Booking)
+        self.assertEqual(state[0], booking.updated_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(pk=booking.pk).delete()
+        self.assertNotEqual(table_modified(Booking), state)
+
+
+def brute_force_totals(rooms, bookings, date_range):
+    """Итоги этажей по дням прямым перебором «день × бронирование» — эталон для build_grid"""
+    floors = defaultdict(set)
+    for room in rooms:
+        floors[room.floor].add(room.id)
+    active = [b for b in bookings if b.status != 'cancelled']
+    result = []
+    for floor, room_ids in floors.items():
+        floor_bookings = [b for b in active if b.room_id in room_ids]
+        days = []
+        for d in date_range:
+            occupied = len({b.room_id for b in floor_bookings if b.check_in_date <= d < b.check_out_date})
+            days.append({
+                'occupied': occupied,
+                'free': len(room_ids) - occupied,
+                'arrivals': sum(1 for b in floor_bookings if b.check_in_date == d),
+                'departures': sum(1 for b in floor_bookings if b.check_out_date == d),
+            })
+        result.append(days)
+    return result
+
+
+class GridTotalsTests(SimpleTestCase):
+    """Итоги build_grid по этажам и по всей сетке совпадают с перебором на случайных данных в памяти"""
+    SEEDS = 50
+
+    def test_totals_match_brute_force(self):
+        for seed in range(self.SEEDS):
+            rng = random.Random(seed)
+            rooms, bookings, start = synthetic_data(rng.randint(1, 40), rng.randint(1, 45), seed=seed)
+            days = rng.randint(1, 45)
+            window_start = start + timedelta(days=rng.randint(-5, 5))
+            date_range = [window_start + timedelta(days=i) for i in range(days)]
+            date_range_rich = [{'date': d, 'date_str': d.strftime('%Y-%m-%d'), 'is_weekend': d.weekday() >= 5}
+                               for d in date_range]
+            customer_colors = {b.customer.id: CUSTOMER_COLORS[0] for b in bookings}
+
+            grid = build_grid(rooms, bookings, date_range_rich, customer_colors)
+            expected = brute_force_totals(rooms, bookings, date_range)
+            overall = [{key: sum(floor[i][key] for floor in expected) for key in expected[0][i]}
+                       for i in range(days)]
+            with self.subTest(seed=seed):
+                self.assertEqual([floor['totals'] for floor in grid], expected)
+                self.assertEqual(grid_totals(grid), overall)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BookingCountersTests(TestCase):
+    """Счетчики стойки регистрации — один запрос на промах кэша, в том числе внутри страниц"""
+
+    def setUp(self):
+        cache.clear()
+        room = Room.objects.create(room_number='101', room_type=make_room_type(), floor=1)
+        customer = make_customer()
+        today = date.today()
+        for offset, status in enumerate(['confirmed', 'checked_in', 'awaiting_payment', 'cancelled']):
+            Booking.objects.create(customer=customer, room=room, check_in_date=today + timedelta(days=offset * 3),
+                                   check_out_date=today + timedelta(days=offset * 3 + 2), status=status,
+                                   total_price=Decimal('2000'))
+
+    def test_counters_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = counters.booking_counters()
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(stats['status_cancelled'], 1)
+        with self.assertNumQueries(0):
+            counters.booking_counters()
+
+    def test_invalidated_after_commit(self):
+        counters.booking_counters()
+        key = counters._key(date.today())
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.filter(status='cancelled').first().delete()
+            self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(counters.booking_counters()['total'], 3)
+
+    def test_pages_spend_one_query_on_counters(self):
+        for name in ('booking_list', 'booking_dashboard', 'analytics_dashboard'):
+            url = reverse(name)
+            with self.subTest(page=name):
+                self.assertEqual(self.client.get(url).status_code, 200)
+                with CaptureQueriesContext(connection) as warm:
+                    self.client.get(url)
+                cache.delete(counters._key(date.today()))
+                with self.assertNumQueries(len(warm) + 1):
+                    self.client.get(url)
+
+
+class BookingKeysetTests(TestCase):
+    """Страницы списка бронирований по фамилии клиента: однофамильцы не теряются и не повторяются"""
+
+    @classmethod
+    def setUpTestData(cls):
+        room = Room.objects.create(room_number='101', room_type=make_room_type(), floor=1)
+        customers = [make_customer(last_name=last_name, first_name=str(i))
+                     for i, last_name in enumerate(['Петров', 'Иванов', 'Петров', 'Иванов', 'Петров'])]
+        first_day = date.today() - timedelta(days=60)
+        Booking.objects.bulk_create(
+            Booking(customer=customers[i % len(customers)], room=room,
+                    check_in_date=first_day + timedelta(days=2 * i),
+                    check_out_date=first_day + timedelta(days=2 * i + 1),
+                    status='checked_out', total_price=Decimal('1000'))
+            for i in range(17)
+        )
+
+    def test_pages_by_last_name(self):
+        bookings = Booking.objects.select_related('customer')
+        for sort in ('customer__last_name', '-customer__last_name'):
+            expected = list(bookings.order_by(sort, sort.replace('customer__last_name', 'customer_id'),
+                                              '-id' if sort.startswith('-') else 'id'))
+            with self.subTest(sort=sort):
+                pages, cursor = [], None
+                while True:
+                    page = keyset.paginate(bookings, sort, cursor, {}, per_page=4, tiebreakers=['customer_id'])
+                    pages.append(page)
+                    if not page.next_cursor:
+                        break
+                    cursor = page.next_cursor
+                self.assertEqual([booking for page in pages for booking in page], expected)
+
+                # Назад от последней страницы — те же страницы
+                back = keyset.paginate(bookings, sort, pages[-1].previous_cursor, {}, per_page=4,
+                                       tiebreakers=['customer_id'])
+                self.assertEqual(list(back), list(pages[-2]))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CustomerStatsTests(TestCase):
+    def test_new_customer_listed_before_commit(self):
+        # Без выполнения on_commit: строка итогов создается в той же транзакции, что и клиент
+        customer = make_customer()
+        listed = with_stats(Customer.objects.all()).get(pk=customer.pk)
+        self.assertEqual((listed.booking_count, listed.total_spent), (0, 0))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CustomerProfileTests(TestCase):
+    """Карточка клиента собирается за PROFILE_QUERIES запросов при любом числе проживаний"""
+    STAYS = 60
+    SERVICE_BOOKINGS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        room_types = [make_room_type(), make_room_type(name='Люкс', price=Decimal('5000'))]
+        rooms = [Room.objects.create(room_number=f'{i + 1}01', room_type=room_types[i % 2], floor=i + 1)
+                 for i in range(4)]
+        cls.newcomer = make_customer(last_name='Петров')
+        cls.regular = make_customer(last_name='Сидоров')
+        first_day = date.today() - timedelta(days=2 * cls.STAYS)
+        Booking.objects.bulk_create(
+            Booking(customer=cls.regular, room=rooms[i % len(rooms)],
+                    check_in_date=first_day + timedelta(days=2 * i),
+                    check_out_date=first_day + timedelta(days=2 * i + 1),
+                    status='checked_out', total_price=Decimal('1000'))
+            for i in range(cls.STAYS)
+        )
+
+        category = ServiceCategory.objects.create(name='СПА')
+        services = [
+            Service.objects.create(name=name, category=category, description='', short_description='',
+                                   price=Decimal('1500'))
+            for name in ('Массаж', 'Сауна')
+        ]
+        ServiceBooking.objects.bulk_create(
+            ServiceBooking(customer=cls.regular, service=services[i % 2],
+                           booking_date=date.today() - timedelta(days=i), start_time='10:00', end_time='11:00',
+                           status='completed', total_price=Decimal('1500'))
+            for i in range(cls.SERVICE_BOOKINGS)
+        )
+
+    def test_profile_queries_do_not_grow_with_stays(self):
+        for customer, stays in ((self.newcomer, 0), (self.regular, self.STAYS)):
+            with self.subTest(stays=stays), self.assertNumQueries(PROFILE_QUERIES):
+                profile = build_profile(customer)
+            self.assertEqual(profile['total_bookings'], stays)
+
+        self.assertEqual(profile['total_spent'], Decimal('1000') * self.STAYS)
+        self.assertEqual(profile['total_service_bookings'], self.SERVICE_BOOKINGS)
+        self.assertEqual(profile['favorite_service']['count'], self.SERVICE_BOOKINGS // 2)
+        self.assertEqual(len(profile['recent_service_bookings']), 5)
+
+    def test_detail_page_queries_do_not_grow_with_stays(self):
+        # Клиент по pk и сборка профиля; шаблон в базу не ходит
+        for customer in (self.newcomer, self.regular):
+            with self.subTest(customer=customer.last_name), self.assertNumQueries(PROFILE_QUERIES + 1):
+                response = self.client.get(reverse('customer_detail', args=[customer.pk]))
+            self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RoomTypeDeleteTests(TestCase):
+    """
+    Удаление типа каскадом удаляет его правила цен, номера и бронирования; их сигналы
+    не должны заново записывать календари удаляемого типа (иначе FK упадет при фиксации)
+    """
+
+    def setUp(self):
+        self.room_type = make_room_type()
+        self.kept_type = make_room_type(name='Люкс')
+        self.day = timezone.localdate() + timedelta(days=5)
+
+    def delete_room_type(self):
+        type_id = self.room_type.pk
+        self.room_type.delete()
+        # Отложенные проверки FK выполняются при фиксации — в тесте проверяем их явно
+        connection.check_constraints()
+        self.assertFalse(DailyRate.objects.filter(room_type_id=type_id).exists())
+        self.assertFalse(RoomTypeAvailability.objects.filter(room_type_id=type_id).exists())
+        self.assertTrue(DailyRate.objects.filter(room_type=self.kept_type).exists())
+
+    def test_delete_room_type_with_rate_rules(self):
+        Season.objects.create(name='Лето', room_type=self.room_type, start_date=self.day,
+                              end_date=self.day + timedelta(days=3), multiplier=Decimal('1.5'))
+        WeekdayRate.objects.create(room_type=self.room_type, weekday=5, multiplier=Decimal('1.2'))
+        RateOverride.objects.create(room_type=self.room_type, date=self.day, price=Decimal('700'))
+        self.delete_room_type()
+
+    def test_delete_room_type_with_rooms_and_bookings(self):
+        customer = make_customer()
+        for number in ('101', '102'):
+            room = Room.objects.create(room_number=number, room_type=self.room_type, floor=1)
+            Booking.objects.create(customer=customer, room=room, check_in_date=self.day,
+                                   check_out_date=self.day + timedelta(days=2), status='confirmed',
+                                   total_price=Decimal('2000'))
+        self.delete_room_type()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AnalyticsFreshnessTests(TestCase):
+    """Правка платежа или типа номера без изменения числа строк меняет ETag аналитики"""
+
+    def setUp(self):
+        self.room_type = make_room_type()
+        room = Room.objects.create(room_number='101', room_type=self.room_type, floor=1)
+        booking = Booking.objects.create(customer=make_customer(), room=room, check_in_date=date.today(),
+                                         check_out_date=date.today() + timedelta(days=1), status='confirmed',
+                                         total_price=Decimal('1000'))
+        self.payment = Payment.objects.create(booking=booking, amount=Decimal('1000'), status='completed')
+
+    def etag(self):
+        return self.client.get(reverse('analytics_dashboard'))['ETag']
+
+    def test_edits_change_etag(self):
+        etag = self.etag()
+        self.payment.status = 'refunded'
+        self.payment.save()
+        self.assertNotEqual(self.etag(), etag)
+
+        etag = self.etag()
+        self.room_type.price_per_night = Decimal('1500')
+        self.room_type.save()
+        self.assertNotEqual(self.etag(), etag)
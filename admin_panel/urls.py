@@ -5,9 +5,13 @@ from .views import (room_edit, room_type_edit, room_list,
                     booking_create_with_customer, booking_list, booking_edit,
                     booking_dashboard, booking_delete, index, search_customers, get_customer_details)
 from .views import (customer_edit, customer_list, customer_detail, booking_status_update,
-                    booking_pdf)
+                    booking_pdf, availability_calendar, booking_group_create, room_search,
+                    room_assignment)
 from service.views import customer_service_bookings, customer_service_booking_add
-from .chess_table import ChessTableView
+from .chess_table import ChessTableView, chess_export_download
+from .api import (availability_batch, availability_calendar_export, group_booking_create,
+                  room_search_results, chess_rooms, chess_tile, chess_export_status, chess_cache_stats,
+                  chess_events, chess_version, booking_move)
 
 urlpatterns = [
     path('', index, name='index'),
@@ -20,10 +24,12 @@ urlpatterns = [
     path('rooms/create/', room_create, name='room_create'),
     path('rooms/<int:pk>/edit/', room_edit, name='room_edit'),
     path('rooms/<int:pk>/delete/', room_delete, name='room_delete'),
+    path('rooms/search/', room_search, name='room_search'),
 
     path('rooms-dashboard/', rooms_dashboard, name='rooms_dashboard'),
 
     path('bookings/create-with-customer/',booking_create_with_customer, name='booking_create_with_customer'),
+    path('bookings/group/', booking_group_create, name='booking_group_create'),
     path('bookings/status-update/<int:pk>/<str:status>/',booking_status_update ,name='booking_status_update'),
     path('bookings/<int:pk>/edit/', booking_edit, name='booking_edit'),
     path('booking/<int:pk>/delete/', booking_delete, name='booking_delete'),
@@ -42,5 +48,21 @@ urlpatterns = [
     path('bookings/get-customer/<int:customer_id>/', get_customer_details, name='get_customer_details'),
 
     path('bookings/chess_table/', ChessTableView.as_view(), name='chess_table'),
+    path('bookings/chess_table/optimize/', room_assignment, name='room_assignment'),
+    path('bookings/chess_table/exports/<slug:job_id>/', chess_export_download, name='chess_export_download'),
     path('bookings/<int:booking_id>/pdf/', booking_pdf, name='booking_pdf'),
+    path('bookings/availability-calendar/', availability_calendar, name='availability_calendar'),
+
+    #API
+    path('api/availability/', availability_batch, name='api_availability'),
+    path('api/availability-calendar/', availability_calendar_export, name='api_availability_calendar'),
+    path('api/group-bookings/', group_booking_create, name='api_group_bookings'),
+    path('api/bookings/<int:pk>/move/', booking_move, name='api_booking_move'),
+    path('api/rooms/search/', room_search_results, name='api_room_search'),
+    path('api/chess/rooms/', chess_rooms, name='api_chess_rooms'),
+    path('api/chess/tiles/', chess_tile, name='api_chess_tile'),
+    path('api/chess/events/', chess_events, name='api_chess_events'),
+    path('api/chess/version/', chess_version, name='api_chess_version'),
+    path('api/chess/cache-stats/', chess_cache_stats, name='api_chess_cache_stats'),
+    path('api/chess/exports/<slug:job_id>/', chess_export_status, name='api_chess_export_status'),
 ]
\ No newline at end of file
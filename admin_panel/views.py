@@ -1,25 +1,28 @@
 from datetime import date, timedelta, datetime
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Count, Q, Sum, Max
 from django.http import JsonResponse, Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
-
-from service.models import ServiceBooking
-from .models import Room, RoomType, Booking
-from .forms import RoomForm, RoomTypeForm, CustomerForm, BookingForm, BookingEditForm, SearchForm
+from django.utils.http import urlencode
+
+from . import counters, customer_profile, customer_search, customer_stats, keyset
+from .models import Room, RoomType, Booking, CustomerStats
+from .reservations import ReservationConflict, VersionConflict, reserve, reserve_group
+from .availability import find_available_rooms, invalidate as invalidate_availability
+from .availability_calendar import CALENDAR_DAYS, calendar_grid, refresh_calendar
+from .pricing import stay_price, stay_rates
+from .room_assignment import AssignmentError, apply_plan, plan_room_type
+from .room_search import attach_prices, paginate_rooms
+from .forms import (RoomForm, RoomTypeForm, CustomerForm, BookingForm, BookingEditForm, SearchForm,
+                    GroupBookingForm)
 from .models import Room, RoomType, Customer
 from django.contrib import messages
 
 
 import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import Spacer, HRFlowable, Paragraph, Table, TableStyle, SimpleDocTemplate
 
 
 from.pdf_fonts import register_cyrillic_fonts
@@ -100,7 +103,12 @@ def room_type_delete(request, pk):
             if new_room_type_id:
                 new_room_type = get_object_or_404(RoomType, pk=new_room_type_id)
                 # Обновляем все комнаты на новый тип
-                Room.objects.filter(room_type=room_type).update(room_type=new_room_type)
+                Room.objects.filter(room_type=room_type).update(
+                    room_type=new_room_type, updated_at=timezone.now()
+                )
+                # update() не вызывает сигналы Room — обновляем матрицу и календарь вручную
+                invalidate_availability()
+                refresh_calendar([new_room_type.id])
                 room_type.delete()
                 messages.success(request,
                                  f'Тип комнаты удален. {rooms_count} комнат перемещено в тип: {new_room_type.name}')
@@ -247,6 +255,20 @@ def rooms_dashboard(request):
     return render(request, 'admin_panel/rooms_dashboard.html', context)
 
 
+OVERLAP_ERROR = 'Номер уже занят другим бронированием на выбранные даты'
+
+
+def _is_overlap_violation(error):
+    """Ошибка БД вызвана ограничением на пересечение бронирований одного номера"""
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == 'booking_room_no_overlap'
+
+
+def _occupy_room(room):
+    room.status = 'occupied'
+    room.save()
+
+
 def booking_create_with_customer(request):
     available_rooms = Room.objects.none()
 
@@ -314,28 +336,31 @@ def booking_create_with_customer(request):
                 # Валидируем только booking_form
                 if booking_form.is_valid():
                     try:
-                        with transaction.atomic():
-                            # Сохраняем бронирование
-                            booking = booking_form.save(commit=False)
-                            booking.customer = customer
-
-                            # Расчет общей стоимости
-                            nights = (booking.check_out_date - booking.check_in_date).days
-                            total_price = nights * booking.room.room_type.price_per_night
-                            booking.total_price = total_price
+                        booking = booking_form.save(commit=False)
+                        booking.customer = customer
 
-                            booking.save()
+                        # Расчет общей стоимости по календарю цен
+                        total_price = stay_price(booking.room.room_type_id, booking.check_in_date, booking.check_out_date)
+                        booking.total_price = total_price
 
-                            # Обновляем статус комнаты
-                            booking.room.status = 'occupied'
-                            booking.room.save()
+                        # Сохраняем под блокировкой номера и обновляем статус комнаты
+                        reserve(booking, after_save=lambda: _occupy_room(booking.room))
 
-                            messages.success(
-                                request,
-                                f'Бронирование успешно создано! Стоимость: {total_price} руб.'
-                            )
-                            return redirect('booking_list')
+                        messages.success(
+                            request,
+                            f'Бронирование успешно создано! Стоимость: {total_price} руб.'
+                        )
+                        return redirect('booking_list')
 
+                    except ReservationConflict:
+                        booking_form.add_error('room', OVERLAP_ERROR)
+                        customer_form = CustomerForm(instance=customer)
+                    except IntegrityError as e:
+                        if _is_overlap_violation(e):
+                            booking_form.add_error('room', OVERLAP_ERROR)
+                        else:
+                            messages.error(request, f'Ошибка при создании бронирования: {str(e)}')
+                        customer_form = CustomerForm(instance=customer)
                     except Exception as e:
                         messages.error(request, f'Ошибка при создании бронирования: {str(e)}')
                         print(f"ERROR: {str(e)}")
@@ -358,31 +383,31 @@ def booking_create_with_customer(request):
             # Проверяем обе формы
             if customer_form.is_valid() and booking_form.is_valid():
                 try:
-                    with transaction.atomic():
-                        # Сохраняем клиента
-                        customer = customer_form.save()
+                    booking = booking_form.save(commit=False)
 
-                        # Сохраняем бронирование
-                        booking = booking_form.save(commit=False)
-                        booking.customer = customer
-
-                        # Расчет общей стоимости
-                        nights = (booking.check_out_date - booking.check_in_date).days
-                        total_price = nights * booking.room.room_type.price_per_night
-                        booking.total_price = total_price
+                    # Расчет общей стоимости по календарю цен
+                    total_price = stay_price(booking.room.room_type_id, booking.check_in_date, booking.check_out_date)
+                    booking.total_price = total_price
 
-                        booking.save()
+                    def save_customer():
+                        # Клиент сохраняется в той же транзакции, что и бронирование
+                        booking.customer = customer_form.save()
 
-                        # Обновляем статус комнаты
-                        booking.room.status = 'occupied'
-                        booking.room.save()
+                    reserve(booking, before_save=save_customer, after_save=lambda: _occupy_room(booking.room))
 
-                        messages.success(
-                            request,
-                            f'Бронирование успешно создано! Стоимость: {total_price} руб.'
-                        )
-                        return redirect('booking_list')
+                    messages.success(
+                        request,
+                        f'Бронирование успешно создано! Стоимость: {total_price} руб.'
+                    )
+                    return redirect('booking_list')
 
+                except ReservationConflict:
+                    booking_form.add_error('room', OVERLAP_ERROR)
+                except IntegrityError as e:
+                    if _is_overlap_violation(e):
+                        booking_form.add_error('room', OVERLAP_ERROR)
+                    else:
+                        messages.error(request, f'Ошибка при создании бронирования: {str(e)}')
                 except Exception as e:
                     messages.error(request, f'Ошибка при создании бронирования: {str(e)}')
 
@@ -401,16 +426,48 @@ def booking_create_with_customer(request):
     }
     return render(request, 'admin_panel/booking_create_with_customer.html', context)
 
+def booking_group_create(request):
+    """Групповое бронирование: список номеров или N номеров выбранного типа одной транзакцией"""
+    if request.method == 'POST':
+        form = GroupBookingForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                bookings = reserve_group(
+                    customer=data['customer'],
+                    check_in=data['check_in'],
+                    check_out=data['check_out'],
+                    rooms=list(data['rooms']) or None,
+                    room_type=data['room_type'],
+                    count=data['rooms_count'],
+                    status=data['status'],
+                    special_requests=data['special_requests'],
+                )
+                total_price = sum(b.total_price for b in bookings)
+                messages.success(
+                    request,
+                    f'Создано бронирований: {len(bookings)}. Общая стоимость: {total_price} руб.'
+                )
+                return redirect('booking_list')
+            except ReservationConflict as e:
+                form.add_error(None, str(e))
+    else:
+        form = GroupBookingForm(initial={'customer': request.GET.get('customer_id')})
+
+    context = {
+        'form': form,
+        'title': 'Групповое бронирование',
+    }
+    return render(request, 'admin_panel/booking_group_create.html', context)
+
+
 def search_customers(request):
     #Поиск клиентов для автозаполнения
     query = request.GET.get('q', '')
     if not query:
         return JsonResponse({'results':[]})
-    customers = Customer.objects.filter(
-        Q(last_name__icontains=query) |
-        Q(phone__icontains=query) |
-        Q(email__icontains=query)
-    )[:10]
+    #Лучшие совпадения по триграммному индексу
+    customers = customer_search.autocomplete(query)
 
     results = []
     for customer in customers:
@@ -451,25 +508,108 @@ def get_available_rooms(check_in_date, check_out_date):
         check_in = date.fromisoformat(check_in_date) if isinstance(check_in_date, str) else check_in_date
         check_out = date.fromisoformat(check_out_date) if isinstance(check_out_date, str) else check_out_date
 
-        # Находим занятые комнаты в указанный период
-        occupied_rooms = Booking.objects.filter(
-            Q(check_in_date__lt=check_out) & Q(check_out_date__gt=check_in) &
-            Q(status__in=['confirmed', 'checked_in', 'awaiting_payment'])
-        ).values_list('room_id', flat=True)
-
-        # Ищем свободные комнаты
-        available_rooms = Room.objects.filter(
-            status='available'
-        ).exclude(
-            id__in=occupied_rooms
-        ).select_related('room_type')
-
-        return available_rooms
+        # Внутри горизонта — матрица занятости в памяти, дальше — журнал ночей
+        return find_available_rooms(check_in, check_out)
 
     except (ValueError, TypeError):
         return Room.objects.none()
 
 
+def room_search(request):
+    """Поиск свободных номеров по датам, типу, вместимости, этажу и особенностям"""
+    form = SearchForm(request.GET or None)
+    rooms = None
+    nights = 0
+    if form.is_valid():
+        rooms = paginate_rooms(form.search().select_related('room_type'), request.GET.get('page'))
+        nights = form.nights()
+        attach_prices(rooms, form.cleaned_data['check_in'], form.cleaned_data['check_out'])
+
+    context = {
+        'title': 'Поиск номеров',
+        'form': form,
+        'rooms': rooms,
+        'nights': nights,
+    }
+    return render(request, 'admin_panel/room_search.html', context)
+
+
+def room_assignment(request):
+    """Пробный план уплотнения шахматки по типу номера и его применение"""
+    room_types = RoomType.objects.order_by('name')
+    room_type = None
+    if request.GET.get('room_type') or request.POST.get('room_type'):
+        room_type = get_object_or_404(RoomType, pk=request.POST.get('room_type') or request.GET.get('room_type'))
+    plan = None
+
+    if room_type and request.method == 'POST':
+        expected = [
+            {'booking_id': int(booking_id), 'from_room_id': int(from_id), 'to_room_id': int(to_id)}
+            for booking_id, from_id, to_id in (
+                item.split(':') for item in request.POST.getlist('moves')
+            )
+        ]
+        try:
+            plan = apply_plan(room_type, expected_moves=expected)
+            messages.success(request, f'Переселено бронирований: {len(plan["moves"])}')
+            return redirect(f'{reverse("chess_table")}?room_type={room_type.pk}')
+        except (ReservationConflict, AssignmentError) as e:
+            messages.error(request, str(e))
+
+    if room_type:
+        try:
+            plan = plan_room_type(room_type)
+        except AssignmentError as e:
+            messages.error(request, str(e))
+
+    context = {
+        'title': 'Уплотнение шахматки',
+        'room_types': room_types,
+        'room_type': room_type,
+        'plan': plan,
+    }
+    return render(request, 'admin_panel/room_assignment.html', context)
+
+
+def availability_calendar(request):
+    """Календарь свободных номеров по типам на год вперед"""
+    # Окно календаря считается в местной дате (calendar_window), как и в API
+    today = timezone.localdate()
+    dates, types = calendar_grid(today, CALENDAR_DAYS)
+
+    MONTHS_RU_SHORT = ['янв', 'фев', 'мар', 'апр', 'май', 'июн',
+                       'июл', 'авг', 'сен', 'окт', 'ноя', 'дек']
+    months = []
+    for d in dates:
+        if not months or months[-1]['month'] != (d.year, d.month):
+            months.append({'month': (d.year, d.month), 'label': f'{MONTHS_RU_SHORT[d.month - 1]} {d.year}', 'span': 0})
+        months[-1]['span'] += 1
+
+    rows = []
+    for item in types:
+        total = item['total'] or 0
+        cells = []
+        for free in item['free']:
+            if free is None:
+                level = 'none'
+            elif free == 0:
+                level = 'full'
+            elif total and free / total < 0.3:
+                level = 'low'
+            else:
+                level = 'ok'
+            cells.append({'free': free, 'level': level})
+        rows.append({'name': item['name'], 'total': total, 'cells': cells})
+
+    context = {
+        'title': 'Календарь доступности',
+        'dates': dates,
+        'months': months,
+        'rows': rows,
+    }
+    return render(request, 'admin_panel/availability_calendar.html', context)
+
+
 def booking_list(request):
     _auto_update_statuses()
     #Получаем параметры фильтрации
@@ -494,9 +634,12 @@ def booking_list(request):
 
     if sort_by not in ALLOWED_SORT_FIELDS:
         sort_by = '-created_at'
+    #Одинаковые фамилии упорядочиваются по клиенту: начало порядка (фамилия, id клиента)
+    #совпадает с индексом customer_last_name_id_idx
+    tiebreakers = ['customer_id'] if sort_by.lstrip('-') == 'customer__last_name' else []
 
-    #Базовый запрос
-    bookings = Booking.objects.select_related('customer', 'room', 'room__room_type').order_by(sort_by)
+    #Базовый запрос (порядок задает пагинация)
+    bookings = Booking.objects.select_related('customer', 'room', 'room__room_type')
 
     #Применяем фильтры
     if status_filter:
@@ -526,40 +669,45 @@ def booking_list(request):
         except ValueError:
             date_from = ''
 
-    if date_from:
+    if date_to:
         try:
             date_to_parsed = datetime.strptime(date_to, '%Y-%m-%d').date()
             bookings = bookings.filter(check_out_date__lte=date_to_parsed)
         except ValueError:
             date_to = ''
 
-    if search_query:
-        bookings = bookings.filter(
-            Q(customer__first_name__icontains = search_query) |
-            Q(customer__last_name__icontains = search_query) |
-            Q(room__room_number__icontains=search_query) |
-            Q(customer__phone__icontains=search_query)
-        )
+    #Поиск по клиенту (ФИО, телефон, email, паспорт) и номеру комнаты
+    bookings = customer_search.search(bookings, search_query, customer='customer', room='room')
+
+    #Keyset-пагинация: курсор хранит ключ строки и отпечаток фильтров, страница 500 стоит как первая
+    filter_params = {
+        'search': search_query,
+        'status': status_filter,
+        'date': date_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+    page = keyset.paginate(bookings, sort_by, request.GET.get('cursor'), filter_params, tiebreakers=tiebreakers)
+    #Число найденных бронирований — по запросу, приблизительное и из кэша
+    found_count = keyset.approximate_count(bookings, filter_params) if request.GET.get('count') else None
 
-    #Статистика для карточек
-    total_bookings = Booking.objects.count()
-    today_checkins = Booking.objects.filter(check_in_date = date.today(),
-                                            status__in=['confirmed', 'awaiting_payment']).count()
-    today_checkouts = Booking.objects.filter(check_out_date = date.today(),
-                                            status = 'checked_in').count()
-    active_bookings = Booking.objects.filter(status__in = ['confirmed', 'awaiting_payment', 'checked_in']).count()
+    #Статистика для карточек (один запрос, кэш)
+    stats = counters.booking_counters()
 
     context = {
-        'bookings': bookings,
+        'bookings': page,
+        'sort_by': sort_by,
+        'page_query': urlencode({'sort': sort_by, **filter_params}),
+        'found_count': found_count,
         'status_filter': status_filter,
         'date_filter': date_filter,
         'date_from': date_from,
         'date_to': date_to,
         'search_query': search_query,
-        'total_bookings': total_bookings,
-        'today_checkins': today_checkins,
-        'today_checkouts': today_checkouts,
-        'active_bookings': active_bookings,
+        'total_bookings': stats['total'],
+        'today_checkins': stats['today_checkins'],
+        'today_checkouts': stats['today_checkouts'],
+        'active_bookings': stats['active'],
         'booking_statuses': Booking.BOOKING_STATUS
     }
     return render(request, 'admin_panel/booking_list.html', context=context)
@@ -571,6 +719,12 @@ def booking_edit(request, pk):
     old_status = booking.status
     old_room = booking.room
     return_to = request.POST.get('next') or request.GET.get('next')
+    # Версия бронирования, которую пользователь видел при открытии формы
+    version = request.POST.get('version') or booking.version
+    try:
+        expected_version = int(request.POST['version']) if request.method == 'POST' else None
+    except (KeyError, ValueError):
+        expected_version = None
 
     if booking.status == 'checked_out':
         messages.error(request, 'Завершенное бронирование нельзя редактировать')
@@ -583,16 +737,18 @@ def booking_edit(request, pk):
         form = BookingEditForm(request.POST, instance=booking)
         if form.is_valid():
             try:
-                with transaction.atomic():
-                    updated_booking = form.save(commit=False)
-                    new_status = updated_booking.status
-                    new_room = updated_booking.room
-                    #Пересчет стоимости при изменении дат или комнаты
-                    if any(field in form.changed_data for field in ['check_in_date', 'check_out_date', 'room']):
-                        nights = (updated_booking.check_out_date - updated_booking.check_in_date).days
-                        total_price = nights*updated_booking.room.room_type.price_per_night
-                        updated_booking.total_price = total_price
-
+                updated_booking = form.save(commit=False)
+                new_status = updated_booking.status
+                new_room = updated_booking.room
+                #Пересчет стоимости при изменении дат или комнаты
+                if any(field in form.changed_data for field in ['check_in_date', 'check_out_date', 'room']):
+                    updated_booking.total_price = stay_price(
+                        updated_booking.room.room_type_id,
+                        updated_booking.check_in_date,
+                        updated_booking.check_out_date,
+                    )
+
+                def update_room_statuses():
                     #Если изменилась комната, обноявляем статусы
                     if 'room' in form.changed_data and old_status == 'checked_in':
                         #Старую комнату обсвобождаем, если она была занята
@@ -622,17 +778,22 @@ def booking_edit(request, pk):
                             new_room.status = 'available'
                             new_room.save()
 
-                        # old_room = Room.objects.get(pk=booking.room.pk)
-                        # if booking.status == 'checked_in':
-                        #     old_room.status = 'available'
-                        #     old_room.save()
-
-                        #Новую комнату помечаем как занятую
-                    updated_booking.save()
-                    messages.success(request, 'Бронироввание успешно обновлено')
-                    if return_to == 'chess_table':
-                        return redirect('chess_table')
-                    return redirect('booking_list')
+                #Сохраняем под блокировкой старой и новой комнаты
+                reserve(updated_booking, before_save=update_room_statuses, extra_room_ids=[old_room.id],
+                        expected_version=expected_version)
+                messages.success(request, 'Бронироввание успешно обновлено')
+                if return_to == 'chess_table':
+                    return redirect('chess_table')
+                return redirect('booking_list')
+            except VersionConflict as e:
+                form.add_error(None, str(e))
+            except ReservationConflict:
+                form.add_error('room', OVERLAP_ERROR)
+            except IntegrityError as e:
+                if _is_overlap_violation(e):
+                    form.add_error('room', OVERLAP_ERROR)
+                else:
+                    messages.error(request, f'Ошибка при обновлении бонирования {str(e)}')
             except Exception as e:
                 messages.error(request, f'Ошибка при обновлении бонирования {str(e)}')
     else:
@@ -642,28 +803,16 @@ def booking_edit(request, pk):
         'booking': booking,
         'next_url': next_url,
         'return_to': return_to,
+        'version': version,
     }
     return render(request, 'admin_panel/booking_edit.html', context=context)
 
 
 def booking_dashboard(request):
     today = date.today()
-    #Статистика бронирований
-    total_bookings = Booking.objects.count()
-    active_bookings = Booking.objects.filter(status__in = ['confirmed', 'checked_in', 'awaiting_payment']).count()
-
-    #Бронирования на сегодня
-    today_checkins = Booking.objects.filter(status__in = ['confirmed', 'awaiting_payment'], check_in_date = today).count()
-    today_checkouts = Booking.objects.filter(status = 'checked_in', check_out_date = today).count()
-
-    #Предстоящие бронирования(7дней)
-    upcoming_checkins = Booking.objects.filter(
-        check_in_date__range = [today, today+timedelta(days=7)],
-        status__in = ['confirmed', 'awaiting_payment']
-    ).count()
-
-    #Статистика по статусам
-    status_stats = Booking.objects.values('status').annotate(count=Count('id')).order_by('status')
+    #Статистика бронирований, заезды/выезды на сегодня, предстоящие заезды (7 дней)
+    #и разбивка по статусам — одним запросом из общего модуля счетчиков
+    stats = counters.booking_counters(today)
 
     #Последние бронирования
     recent_bookings = Booking.objects.select_related('customer', 'room', 'room__room_type').order_by('-created_at')[:5]
@@ -674,12 +823,12 @@ def booking_dashboard(request):
         Q(check_in_date=today, status='confirmed')
     ).select_related('customer', 'room')[:3]
     context = {
-        'total_bookings':total_bookings,
-        'active_bookings':active_bookings,
-        'today_checkins':today_checkins,
-        'today_checkouts':today_checkouts,
-        'upcoming_checkins':upcoming_checkins,
-        'status_stats':status_stats,
+        'total_bookings':stats['total'],
+        'active_bookings':stats['active'],
+        'today_checkins':stats['today_checkins'],
+        'today_checkouts':stats['today_checkouts'],
+        'upcoming_checkins':stats['upcoming_checkins'],
+        'status_stats':counters.status_stats(stats),
         'recent_bookings':recent_bookings,
         'attention_bookings':attention_bookings,
         'today':today
@@ -701,46 +850,41 @@ def booking_delete(request, pk):
 #####КЛИЕНТЫ#####
 def customer_list(request):
     search_query = request.GET.get('search', '')
-    sort_by = request.GET.get('sort', '-last_booking_date')
+    #При поиске клиенты по умолчанию идут по релевантности
+    sort_by = request.GET.get('sort', 'relevance' if search_query.strip() else '-last_booking_date')
 
     ALLOWED_SORT_FIELDS = {
+        'relevance',
         '-last_booking_date', 'last_booking_date',
         '-booking_count', 'booking_count',
         '-total_spent', 'total_spent',
         '-last_name', 'last_name',
     }
-    if sort_by not in ALLOWED_SORT_FIELDS:
+    if sort_by not in ALLOWED_SORT_FIELDS or (sort_by == 'relevance' and not search_query.strip()):
         sort_by = '-last_booking_date'
 
-    customers = Customer.objects.annotate(
-        booking_count = Count('booking'),
-        total_spent = Sum('booking__total_price'),
-        last_booking_date = Max('booking__created_at')
-    ).select_related()
-    total_bookings = Booking.objects.count()
+    #Итоги берутся из CustomerStats, а не агрегируются по всем бронированиям на каждый запрос
+    customers = customer_stats.with_stats(Customer.objects.all())
     #Поиск по клиентам
-    if search_query:
-        customers = customers.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query) |
-            Q(passport_number__icontains=search_query)
-        )
+    customers = customer_search.search(customers, search_query)
+
+    #Сортировка: id делает порядок однозначным, страницы не теряют и не повторяют клиентов
+    if sort_by == 'relevance':
+        customers = customers.order_by('-rank', 'last_name', 'id')
+    else:
+        customers = customers.order_by(sort_by, '-id' if sort_by.startswith('-') else 'id')
 
-    #Сортировка
-    customers = customers.order_by(sort_by)
+    page = customer_stats.paginate_customers(customers, request.GET.get('page'))
 
     #Статистика
-    total_customers = customers.count()
-    active_customers = Customer.objects.filter(
-        booking__status__in=['confirmed', 'checked_in', 'awaiting_payment']
-    ).distinct().count()
+    total_bookings = counters.booking_counters()['total']
+    active_customers = CustomerStats.objects.filter(is_active=True).count()
 
     context = {
-        'customers': customers,
+        'customers': page,
+        'page_range': page.paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1),
         'search_query': search_query,
-        'total_customers': total_customers,
+        'total_customers': page.paginator.count,
         'active_customers': active_customers,
         'total_bookings': total_bookings,
         'sort_by': sort_by,
@@ -750,64 +894,8 @@ def customer_list(request):
 
 def customer_detail(request, pk):
     customer = get_object_or_404(Customer, pk=pk)
-
-    #Получаем все бронирования клиента
-    bookings = Booking.objects.filter(customer=customer).select_related(
-        'room'
-    ).order_by('-created_at')
-
-    #Получаем записи на услуги
-    service_bookings = ServiceBooking.objects.filter(customer=customer).select_related('service', 'created_by').order_by('-booking_date', '-start_time')
-
-
-    #Статистика по клиенту
-    total_bookings = bookings.count()
-    total_spent = bookings.aggregate(
-        total = Sum('total_price'))['total'] or 0
-    active_bookings = bookings.filter(
-        status__in = ['confirmed', 'checked_in', 'awaiting_payment']
-    ).count()
-
-    #Статистика по услугам
-    total_service_bookings = service_bookings.count()
-    active_service_bookings = service_bookings.filter(
-        status__in = ['pending', 'confirmed', 'in_progress']
-    ).count()
-    total_service_spent = service_bookings.aggregate(total=Sum('total_price'))['total'] or 0
-    #Последние 5 записей на услугу
-    recent_service_bookings = service_bookings[:5]
-
-    #Последнее бронирование
-    last_booking = bookings.first()
-
-    #Предпочтения клиенты(самый частый тип номера)
-    favorite_room_type = bookings.values(
-        'room__room_type__name',
-    ).annotate(
-        count = Count('id')
-    ).order_by('-count').first()
-
-    #Самая популярная услуга
-    favorite_service = service_bookings.values(
-        'service__name'
-    ).annotate(
-        count = Count('id')
-    ).order_by('-count').first()
-
-    context = {
-        'customer': customer,
-        'bookings': bookings,
-        'total_bookings': total_bookings,
-        'total_spent': total_spent,
-        'active_bookings': active_bookings,
-        'last_booking': last_booking,
-        'favorite_room_type': favorite_room_type,
-        'total_service_bookings': total_service_bookings,
-        'active_service_bookings': active_service_bookings,
-        'total_service_spent': total_service_spent,
-        'recent_service_bookings': recent_service_bookings,
-        'favorite_service': favorite_service
-    }
+    #Бронирования, записи на услуги и вся статистика клиента собираются за несколько запросов
+    context = customer_profile.build_profile(customer)
     return render(request, template_name='admin_panel/customer_detail.html', context=context)
 
 
@@ -869,7 +957,7 @@ def _auto_update_statuses():
 
         if not has_active:
             booking.room.status = 'available'
-            booking.room.save(update_fields=['status'])
+            booking.room.save(update_fields=['status', 'updated_at'])
 
 
 
@@ -882,6 +970,13 @@ def booking_pdf(request, booking_id):
         ).get(id=booking_id)
     except Booking.DoesNotExist:
         raise Http404
+    # reportlab нужен только здесь — не загружаем его при старте процесса
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Spacer, HRFlowable, Paragraph, Table, TableStyle, SimpleDocTemplate
+
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -960,13 +1055,21 @@ def booking_pdf(request, booking_id):
     #Детали бронирования
     story.append(Paragraph('Детали бронирования', section_style))
     nights = (booking.check_out_date - booking.check_in_date).days
+    rates = stay_rates(booking.room.room_type_id, booking.check_in_date, booking.check_out_date)
+    if not rates:
+        # Бронирование без ночей (даты до ограничения check_out > check_in) — базовая цена типа
+        nightly_price = f'{booking.room.room_type.price_per_night} руб.'
+    elif len(set(rates)) == 1:
+        nightly_price = f'{rates[0]} руб.'
+    else:
+        nightly_price = f'{min(rates)} – {max(rates)} руб. (по календарю цен)'
     booking_data = [
         ['Номер комнаты:', str(booking.room.room_number)],
         ['Тип номера:', booking.room.room_type.name],
         ['Дата заезда:', booking.check_in_date.strftime('%d.%m.%Y')],
         ['Дата выезда:', booking.check_out_date.strftime('%d.%m.%Y')],
         ['Количество ночей:', str(nights)],
-        ['Цена за ночь:', f'{booking.room.room_type.price_per_night} руб.'],
+        ['Цена за ночь:', nightly_price],
         ['Статус:', booking.get_status_display()],
     ]
     booking_table = Table(booking_data, colWidths=[4*cm, 13*cm])
@@ -5,6 +5,8 @@ from decimal import Decimal
 
 from django.db.models import Count, Sum
 
+from admin_panel.conditional import conditional_page, modified, table_modified
+from admin_panel.counters import booking_counters
 from admin_panel.models import Booking, Payment, Room, RoomType
 from service.models import ServiceBooking
 
@@ -33,9 +35,9 @@ def _bookings_for_period(start, end, room_type_id=None):
     :param room_type_id:
     :return:
     """
-    bookings = Booking.objects.filter(
-        check_in_date__lte = end,
-        check_out_date__gte = start,
+    # check_in <= end и check_out >= start через пересечение диапазонов (GiST-индекс)
+    bookings = Booking.objects.overlapping(
+        start - timedelta(days=1), end + timedelta(days=1)
     ).exclude(status='cancelled').select_related('room', 'room__room_type')
     if room_type_id:
         bookings = bookings.filter(room__room_type_id = room_type_id)
@@ -63,6 +65,25 @@ def _occ_stats(bookings, start, end, total_rooms):
     return occupied, total_room_nights, pct
 
 
+def _analytics_freshness(request):
+    """
+    Данные для условного GET страниц аналитики. Счетчики статусов и сравнение периодов
+    используют всю историю, поэтому сверяются таблицы целиком: бронирования, записи на услуги
+    и платежи — по индексу updated_at и счетчику удалений, небольшие таблицы номеров и типов
+    номеров — одним агрегатом. Статус платежа и цена типа редактируются, поэтому числа строк мало
+    """
+    return [
+        table_modified(Booking),
+        table_modified(ServiceBooking),
+        modified(Room.objects.all()),
+        table_modified(Payment),
+        modified(RoomType.objects.all()),
+        #Пресеты и заезды на сегодня/завтра зависят от текущей даты
+        date.today(),
+    ]
+
+
+@conditional_page(_analytics_freshness)
 def dashboard(request):
     """
     Главная страница аналитики - дашборд
@@ -182,10 +203,9 @@ def dashboard(request):
     donut_data.append(free_pct)
     donut_colors = donut_colors[:len(donut_labels) - 1] + ['#e2e8f0']
 
-    #Статусы бронирований
-    #Агрегируем кол-во бронирований по каждому статусу по всей бд
-    all_statuses = Booking.objects.values('status').annotate(cnt = Count('id'))
-    status_map = {s['status']: s['cnt'] for s in all_statuses}
+    #Статусы бронирований по всей бд и заезды/выезды относительно сегодняшнего дня
+    #(независимо от периода) — общие счетчики стойки, один запрос
+    counters = booking_counters(today)
 
     #Кол-во выселений за выбранный период
     checked_out_month = Booking.objects.filter(
@@ -194,25 +214,8 @@ def dashboard(request):
         check_out_date__lte=month_end,
     ).count()
 
-    #Заезды/выезды(всегда относительно сегоднящнего дня, независимо от периода)
-    tomorrow = today+timedelta(days=1)
-    weekend = today+timedelta(days=6)
-
-    #Заезды и выезды за сегодня
-    ci_today = Booking.objects.filter(check_in_date = today).exclude(status = 'cancelled').count()
-    co_today = Booking.objects.filter(check_out_date = today).exclude(status = 'cancelled').count()
-
-    #Заезды на завтра
-    ci_tomorrow = Booking.objects.filter(check_in_date = tomorrow).exclude(status = 'cancelled').count()
-
     #Общее кол-во заездов и выездов на ближ неделю
-    total_week = Booking.objects.filter(
-        check_in_date__gte = today,
-        check_in_date__lte = weekend,
-    ).exclude(status = 'cancelled').count() + Booking.objects.filter(
-        check_out_date__gte=today,
-        check_out_date__lte=weekend,
-    ).exclude(status = 'cancelled').count()
+    total_week = counters['arrivals_week'] + counters['departures_week']
 
     #Услуги за выбранный период
     #Фильтруем бронирования услуг по дате
@@ -254,14 +257,14 @@ def dashboard(request):
         'donut_labels_json': json.dumps(donut_labels),
         'donut_data_json': json.dumps(donut_data),
         'donut_colors_json': json.dumps(donut_colors),
-        'status_confirmed': status_map.get('confirmed', 0),
-        'status_checked_in': status_map.get('checked_in', 0),
-        'status_awaiting': status_map.get('awaiting_payment', 0),
-        'status_cancelled': status_map.get('cancelled', 0),
+        'status_confirmed': counters['status_confirmed'],
+        'status_checked_in': counters['status_checked_in'],
+        'status_awaiting': counters['status_awaiting_payment'],
+        'status_cancelled': counters['status_cancelled'],
         'checked_out_month': checked_out_month,
-        'ci_today': ci_today,
-        'co_today': co_today,
-        'ci_tomorrow': ci_tomorrow,
+        'ci_today': counters['arrivals_today'],
+        'co_today': counters['departures_today'],
+        'ci_tomorrow': counters['arrivals_tomorrow'],
         'total_week': total_week,
         'svc_count': svc_count,
         'svc_revenue': svc_revenue,
@@ -270,6 +273,7 @@ def dashboard(request):
     }
     return render(request, template_name='analytics/dashboard.html', context=context)
 
+@conditional_page(_analytics_freshness)
 def report(request):
     """
     Детальный аналитический отчет с расширенными метриками
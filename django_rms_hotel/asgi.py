@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Живые обновления шахматки (api/chess/events/, Server-Sent Events) работают только
+под ASGI-сервером, например: uvicorn django_rms_hotel.asgi:application.
+Брокер событий живет внутри процесса, поэтому сервер запускается с одним воркером.
+Включаются переменной окружения CHESS_LIVE_UPDATES=1 (см. settings.CHESS_LIVE_UPDATES).
 """
 
 import os
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'admin_panel',
     'users',
     'service',
@@ -85,6 +87,27 @@ DATABASES = {
     }
 }
 
+# Cache
+# Версии матрицы занятости, шахматки и календаря цен, счетчики стойки регистрации
+# должны быть видны всем процессам сервера — поэтому общий Redis, а не память процесса
+# (проверяется admin_panel.checks.shared_cache_check)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
+# Живые обновления шахматки (Server-Sent Events, api/chess/events/).
+# Включаются только при запуске через ASGI одним процессом (uvicorn django_rms_hotel.asgi:application):
+# под WSGI (runserver, gunicorn sync) каждое открытое соединение навсегда занимает воркер,
+# а брокер событий живет внутри процесса. Выключено — шахматка опрашивает версию данных
+# раз в CHESS_POLL_SECONDS секунд
+
+CHESS_LIVE_UPDATES = os.environ.get('CHESS_LIVE_UPDATES') == '1'
+CHESS_POLL_SECONDS = 15
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -119,6 +142,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Загруженные и сгенерированные файлы (готовые экспорты шахматки).
+# При нескольких серверах приложения каталог должен быть общим (NFS и т. п.)
+# или хранилище по умолчанию заменяется на сетевое через STORAGES
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
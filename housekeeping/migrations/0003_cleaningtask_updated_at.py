@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housekeeping', '0002_alter_cleaningtask_cleaning_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleaningtask',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
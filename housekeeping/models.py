@@ -77,6 +77,7 @@ class CleaningTask(models.Model):
     state = models.CharField(max_length=20, choices=STATES, default='pending', verbose_name='Состояние')
     notes = models.TextField(blank=True, verbose_name='Заметки')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
                                    related_name='created_cleaning_tasks')
     completed_at = models.DateTimeField(null=True, blank=True)
@@ -1,8 +1,10 @@
 from django.utils import timezone
 
+from django.db.models import Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from admin_panel.models import Room, Booking
+from admin_panel.signals import bookings_bulk_created, bookings_reassigned
 from .models import RoomState, CleaningTask
 
 
@@ -49,3 +51,38 @@ def sync_cleaning_task_for_booking(sender, instance, **kwargs):
             state.save()
 
 
+
+
+@receiver(bookings_bulk_created)
+def create_cleaning_tasks_for_bookings(sender, bookings, **kwargs):
+    # Пакетный аналог sync_cleaning_task_for_booking для групповых бронирований
+    by_key = {(b.room_id, b.check_in_date): b for b in bookings if b.status == 'confirmed'}
+    if not by_key:
+        return
+    existing = set(CleaningTask.objects.filter(
+        cleaning_type='move_in',
+        room_id__in={room_id for room_id, _ in by_key},
+        date__in={task_date for _, task_date in by_key},
+    ).values_list('room_id', 'date'))
+    CleaningTask.objects.bulk_create([
+        CleaningTask(
+            room_id=room_id,
+            date=task_date,
+            cleaning_type='move_in',
+            duration_min=CleaningTask.DURATIONS['move_in'],
+            notes=f'Автоматически создана для бронирования №{booking.pk}',
+        )
+        for (room_id, task_date), booking in by_key.items()
+        if (room_id, task_date) not in existing
+    ])
+
+
+@receiver(bookings_reassigned)
+def move_cleaning_tasks_for_bookings(sender, bookings, previous_rooms, **kwargs):
+    # Незапущенные уборки к заезду уходят из прежнего номера, в новом создаются заново
+    previous = Q()
+    for booking in bookings:
+        previous |= Q(room_id=previous_rooms[booking.pk], date=booking.check_in_date)
+    if previous:
+        CleaningTask.objects.filter(previous, cleaning_type='move_in', state='pending').delete()
+    create_cleaning_tasks_for_bookings(sender, bookings=bookings)
@@ -9,6 +9,7 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from admin_panel.conditional import conditional_page, modified
 from admin_panel.models import Booking,Room
 from .forms import CleaningTaskForm, CleaningTask, RepairTaskForm
 from .models import CleaningTask, Housekeeper, RepairTask, RoomState
@@ -183,8 +184,27 @@ def _ensure_current_cleanings_for_staus(target_date):
 
 
 
+def _dashboard_freshness(request):
+    """Данные рабочей даты для условного GET дашборда"""
+    target_date, _ = _resolve_target_date(request)
+    # Плановые уборки создаются до сверки, иначе ответ 304 пропустил бы их создание
+    _ensure_current_cleanings_for_staus(target_date)
+    return [
+        modified(Room.objects.all()),
+        modified(Booking.objects.filter(check_in_date__lte=target_date, check_out_date__gte=target_date)),
+        modified(CleaningTask.objects.filter(date=target_date)),
+        # У состояний номеров, ремонтов и горничных нет точного времени изменения —
+        # сверяем сами значения, это короткие выборки по двум-трем полям
+        list(RoomState.objects.order_by('room_id').values_list('room_id', 'state')),
+        list(RepairTask.objects.filter(date=target_date).order_by('id').values_list('id', 'state')),
+        list(Housekeeper.objects.filter(is_active=True).order_by('id').values_list('id', 'color')),
+        timezone.localdate(),
+    ]
+
+
 @login_required
 @staff_required
+@conditional_page(_dashboard_freshness)
 def dashboard(request):
     """
     Главная страница приложения уборки
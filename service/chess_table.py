@@ -7,6 +7,8 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.shortcuts import render
 
+from admin_panel.conditional import conditional_page, modified
+
 from .models import Service, ServiceBooking, ServiceCategory, ServiceSpecialist
 
 
@@ -57,7 +59,38 @@ def _display_name(specialist):
     return specialist.get_short_name()
 
 
+def _filter_bookings(bookings, master_filter, service_filter, status_filter):
+    if master_filter == 'none':
+        bookings = bookings.filter(specialist__isnull=True)
+    elif master_filter:
+        bookings = bookings.filter(specialist_id=master_filter)
+
+    if service_filter:
+        bookings = bookings.filter(service_id=service_filter)
+
+    if status_filter:
+        bookings = bookings.filter(status=status_filter)
+    return bookings
+
+
+def _display_freshness(request):
+    """Данные дня для условного GET: записи с учетом фильтров и справочники, из которых строится сетка"""
+    target_date, _ = _resolve_target_date(request)
+    bookings = _filter_bookings(
+        ServiceBooking.objects.filter(booking_date=target_date),
+        request.GET.get('master', ''), request.GET.get('service', ''), request.GET.get('status', ''),
+    )
+    return [
+        modified(bookings),
+        modified(Service.objects.all()),
+        ServiceCategory.objects.filter(is_active=True).count(),
+        ServiceSpecialist.objects.filter(is_active=True).count(),
+        timezone.localdate(),
+    ]
+
+
 @method_decorator([login_required, staff_required], name='dispatch')
+@method_decorator(conditional_page(_display_freshness), name='get')
 class ServiceChessTableView(View):
     SLOT_MINUTES = 30
     SLOT_WIDTH = 80
@@ -91,16 +124,7 @@ class ServiceChessTableView(View):
             'specialist__user',
         )
 
-        if master_filter == 'none':
-            bookings = bookings.filter(specialist__isnull=True)
-        elif master_filter:
-            bookings = bookings.filter(specialist_id=master_filter)
-
-        if service_filter:
-            bookings = bookings.filter(service_id=service_filter)
-
-        if status_filter:
-            bookings = bookings.filter(status=status_filter)
+        bookings = _filter_bookings(bookings, master_filter, service_filter, status_filter)
 
         bookings = list(bookings.order_by('service__category__order', 'service__order', 'service__name', 'start_time'))
         categories = list(ServiceCategory.objects.filter(is_active=True).order_by('order', 'name'))
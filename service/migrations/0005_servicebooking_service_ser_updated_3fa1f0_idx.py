@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0016_booking_booking_updated_at_idx'),
+        ('service', '0004_servicespecialist_servicebooking_specialist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicebooking',
+            index=models.Index(fields=['updated_at'], name='service_ser_updated_3fa1f0_idx'),
+        ),
+    ]
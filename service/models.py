@@ -169,7 +169,8 @@ class ServiceBooking(models.Model):
         ]
         indexes = [
             models.Index(fields=['booking_date', 'start_time']),
-            models.Index(fields=['status'])
+            models.Index(fields=['status']),
+            models.Index(fields=['updated_at']),
         ]
 
     def clean(self):
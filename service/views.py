@@ -10,9 +10,8 @@ from django.contrib import messages
 from django.db.models import Q
 from datetime import datetime, date, timedelta
 
-from pandas.io.clipboard import is_available
-
 from .models import Service, ServiceCategory, ServiceBooking, find_available_specialist
+from admin_panel import customer_search as search_index
 from admin_panel.models import Customer, Booking
 from .forms import ServiceForm, ServiceBookingForm, ServiceCategoryForm, ServiceBookingEditForm
 from django.core.paginator import Paginator
@@ -204,11 +203,7 @@ def service_booking_list(request):
     #Поиск по клиенту
     customer_search = request.GET.get('customer')
     if customer_search:
-        bookings = bookings.filter(
-            Q(customer__first_name__icontains = customer_search)|
-            Q(customer__last_name__icontains = customer_search)|
-            Q(customer__phone__icontains = customer_search)
-        )
+        bookings = search_index.search(bookings, customer_search, customer='customer')
 
     #Пагинация
     paginator = Paginator(bookings,10)
@@ -535,7 +530,7 @@ def _auto_update_service_booking_statuses():
         #Или сегодня, но время окончания прошло
         models.Q(booking_date = today, end_time__lte = current_time)
     )
-    expired.update(status = 'completed')
+    expired.update(status = 'completed', updated_at = timezone.now())
 
 
 